@@ -0,0 +1,411 @@
+import json
+import math
+import platform
+import threading
+import time
+from collections import deque
+
+from history import extract_metric
+from system_monitor import collectors_for_fields
+
+KINDS = ("threshold", "rate", "zscore")
+OPERATORS = (">", "<")
+SEVERITIES = ("info", "warning", "critical")
+
+# rate：对相邻样本的变化率做 EWMA 平滑，避免单次抖动触发
+DEFAULT_RATE_ALPHA = 0.3
+# zscore：EWMA 均值 / 方差的权重（约等于最近 2 / alpha 个样本），以及开始打分前的预热样本数
+DEFAULT_ZSCORE_ALPHA = 0.05
+DEFAULT_WARMUP = 30
+
+# /api/alerts 中保留的最近告警事件数
+EVENT_HISTORY = 100
+
+# 默认规则：与 Dashboard 原先的 80% 阈值一致，外加 CPU 异常与磁盘快速写满
+DEFAULT_RULES = [
+    {"name": "cpu-high", "metric": "cpu.usage", "op": ">", "value": 0.8, "clear": 0.7, "for": 30},
+    {"name": "memory-pressure-high", "metric": "memory.pressure", "op": ">", "value": 0.8, "clear": 0.7, "for": 30},
+    {"name": "cpu-anomaly", "metric": "cpu.usage", "kind": "zscore", "op": ">", "value": 4, "clear": 2,
+     "for": 10, "minStd": 0.05, "severity": "info"},
+    {"name": "disk-filling", "metric": "disk.used", "kind": "rate", "op": ">", "value": 100e6, "clear": 20e6,
+     "for": 300},
+]
+
+DEFAULT_WEBHOOK_TIMEOUT = 5.0
+DEFAULT_WEBHOOK_RETRIES = 3
+DEFAULT_WEBHOOK_RETRY_DELAY = 1.0
+WEBHOOK_QUEUE_SIZE = 1000
+
+
+class ThresholdSignal:
+    """阈值：得分即指标值本身"""
+
+    def update(self, timestamp, value):
+        return value
+
+    def to_dict(self):
+        return {}
+
+
+class RateSignal:
+    """变化率（每秒）：只保留上一个样本与平滑后的速率，每个样本 O(1)"""
+
+    def __init__(self, alpha=DEFAULT_RATE_ALPHA):
+        self.alpha = alpha
+        self.last = None
+        self.rate = None
+
+    def update(self, timestamp, value):
+        last, self.last = self.last, (timestamp, value)
+        if last is None or timestamp <= last[0]:
+            return None
+        rate = (value - last[1]) / (timestamp - last[0])
+        self.rate = rate if self.rate is None else self.rate + self.alpha * (rate - self.rate)
+        return self.rate
+
+    def to_dict(self):
+        return {"alpha": self.alpha}
+
+
+class ZScoreSignal:
+    """滚动 z 分数：EWMA 均值与方差增量更新，不回看历史窗口
+
+    先用更新前的均值 / 标准差给当前样本打分，再把样本并入基线；
+    预热期内只更新基线。标准差低于 min_std 时按 min_std 计算，避免平稳指标的微小波动被放大。
+    """
+
+    def __init__(self, alpha=DEFAULT_ZSCORE_ALPHA, warmup=DEFAULT_WARMUP, min_std=0.0):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.min_std = min_std
+        self.count = 0
+        self.mean = None
+        self.var = 0.0
+
+    def update(self, timestamp, value):
+        self.count += 1
+        if self.mean is None:
+            self.mean = value
+            return None
+        diff = value - self.mean
+        std = max(math.sqrt(self.var), self.min_std)
+        score = diff / std if std > 0 else 0.0
+        increment = self.alpha * diff
+        self.mean += increment
+        self.var = (1 - self.alpha) * (self.var + diff * increment)
+        return score if self.count > self.warmup else None
+
+    def to_dict(self):
+        return {"alpha": self.alpha, "warmup": self.warmup, "minStd": self.min_std}
+
+
+class Rule:
+    """一条告警规则：信号（阈值 / 变化率 / z 分数）+ 带滞回的状态机
+
+    状态为 ok → pending → firing：得分越过 value 并持续 for_seconds 秒后触发；
+    触发后得分需回到 clear 以内（">" 时为 <= clear）并持续 clear_for 秒才恢复，
+    value 与 clear 之间的波动不会来回切换。
+    """
+
+    def __init__(self, name, metric, kind="threshold", op=">", value=0.0, clear=None, for_seconds=0.0,
+                 clear_for=0.0, severity="warning", alpha=None, warmup=DEFAULT_WARMUP, min_std=0.0):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown rule kind: {kind}")
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator: {op}")
+        if severity not in SEVERITIES:
+            raise ValueError(f"Unknown severity: {severity}")
+        try:
+            self.collectors = collectors_for_fields([metric])
+        except KeyError:
+            raise ValueError(f"Unknown metric: {metric}")
+        if clear is None:
+            clear = value
+        if (op == ">" and clear > value) or (op == "<" and clear < value):
+            raise ValueError(f"Rule {name}: clear level must be on the recovered side of {value}")
+        self.name = name
+        self.metric = metric
+        self.kind = kind
+        self.op = op
+        self.value = value
+        self.clear = clear
+        self.for_seconds = for_seconds
+        self.clear_for = clear_for
+        self.severity = severity
+        if kind == "rate":
+            self.signal = RateSignal(DEFAULT_RATE_ALPHA if alpha is None else alpha)
+        elif kind == "zscore":
+            self.signal = ZScoreSignal(DEFAULT_ZSCORE_ALPHA if alpha is None else alpha, warmup, min_std)
+        else:
+            self.signal = ThresholdSignal()
+        self.state = "ok"
+        self.since = None
+        self.clear_since = None
+        self.last_value = None
+        self.last_score = None
+
+    @classmethod
+    def from_dict(cls, config):
+        """从配置字典创建规则（字段名与 DEFAULT_RULES / /api/alerts 一致）"""
+        config = dict(config)
+        try:
+            name, metric = config.pop("name"), config.pop("metric")
+        except KeyError as e:
+            raise ValueError(f"Alert rule is missing {e}")
+        fields = {"kind": "kind", "op": "op", "value": "value", "clear": "clear", "for": "for_seconds",
+                  "clearFor": "clear_for", "severity": "severity", "alpha": "alpha", "warmup": "warmup",
+                  "minStd": "min_std"}
+        unknown = set(config) - set(fields)
+        if unknown:
+            raise ValueError(f"Rule {name}: unknown fields {', '.join(sorted(unknown))}")
+        return cls(name, metric, **{fields[key]: value for key, value in config.items()})
+
+    def breached(self, score):
+        return score > self.value if self.op == ">" else score < self.value
+
+    def recovered(self, score):
+        return score <= self.clear if self.op == ">" else score >= self.clear
+
+    def evaluate(self, timestamp, value):
+        """处理一个样本；状态变为 firing 或 resolved 时返回告警事件，否则返回 None"""
+        self.last_value = value
+        score = self.signal.update(timestamp, value)
+        self.last_score = score
+        if score is None:
+            return None
+        if self.state == "firing":
+            if not self.recovered(score):
+                self.clear_since = None
+                return None
+            if self.clear_since is None:
+                self.clear_since = timestamp
+            if timestamp - self.clear_since < self.clear_for:
+                return None
+            self.state, self.clear_since = "ok", None
+            event = self.event("resolved", timestamp, value, score)
+            self.since = None
+            return event
+        if not self.breached(score):
+            self.state, self.since = "ok", None
+            return None
+        if self.state == "ok":
+            self.state, self.since = "pending", timestamp
+        if timestamp - self.since < self.for_seconds:
+            return None
+        self.state = "firing"
+        return self.event("firing", timestamp, value, score)
+
+    def describe(self):
+        if self.kind == "rate":
+            condition = f"rate of {self.metric} {self.op} {self.value:g}/s"
+        elif self.kind == "zscore":
+            condition = f"z-score of {self.metric} {self.op} {self.value:g}"
+        else:
+            condition = f"{self.metric} {self.op} {self.value:g}"
+        return condition + (f" for {self.for_seconds:g}s" if self.for_seconds else "")
+
+    def event(self, state, timestamp, value, score):
+        return {
+            "rule": self.name,
+            "metric": self.metric,
+            "kind": self.kind,
+            "severity": self.severity,
+            "state": state,
+            "time": timestamp,
+            "since": self.since,
+            "value": value,
+            "score": score,
+            "threshold": self.value,
+            "message": f"{self.name}: {self.describe()} ({'resolved' if state == 'resolved' else 'value'} {value:g})",
+        }
+
+    def to_dict(self):
+        return dict({
+            "name": self.name,
+            "metric": self.metric,
+            "kind": self.kind,
+            "op": self.op,
+            "value": self.value,
+            "clear": self.clear,
+            "for": self.for_seconds,
+            "clearFor": self.clear_for,
+            "severity": self.severity,
+            "state": self.state,
+            "since": self.since,
+            "lastValue": self.last_value,
+            "lastScore": self.last_score,
+        }, **self.signal.to_dict())
+
+
+def load_rules(path):
+    """从 JSON 文件读取规则列表"""
+    with open(path) as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"{path}: expected a list of alert rules")
+    return rules
+
+
+class AlertEngine:
+    """在 Agent 内对每份快照评估告警规则，状态变化时通知监听者（推送流、Webhook）
+
+    每条规则只在其采集项本次实际运行时评估：未到期的采集项沿用旧值，
+    重复的样本会让变化率和 z 分数失真。
+    """
+
+    def __init__(self, rules=None, host=None):
+        self.rules = [Rule.from_dict(rule) for rule in (DEFAULT_RULES if rules is None else rules)]
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Alert rule names must be unique")
+        self.host = host or platform.node()
+        self.events = deque(maxlen=EVENT_HISTORY)
+        self.fired = 0
+        # 累计产生的事件数（含 resolved），多进程模式下工作进程据此找出新事件
+        self.emitted = 0
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    @property
+    def metrics(self):
+        return sorted({rule.metric for rule in self.rules})
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def record(self, snapshot):
+        """采集器回调：评估规则，并把状态变化通知监听者"""
+        updated = snapshot.updated
+        events = []
+        with self._lock:
+            for rule in self.rules:
+                if updated is not None and not rule.collectors <= updated:
+                    continue
+                # 缺失的指标（例如 Mac 上的温度）取值为 NaN，跳过该样本，避免污染速率与均值/方差
+                value = extract_metric(snapshot.status, rule.metric)
+                if math.isnan(value):
+                    continue
+                event = rule.evaluate(snapshot.sampled_at, value)
+                if event is not None:
+                    event["host"] = self.host
+                    self.events.append(event)
+                    self.emitted += 1
+                    if event["state"] == "firing":
+                        self.fired += 1
+                    events.append(event)
+        for event in events:
+            for callback in self._listeners:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"⚠️  Alert listener failed: {e}")
+
+    def active(self):
+        """当前处于 firing 状态的告警（新订阅者连接时补发）"""
+        with self._lock:
+            return [
+                dict(rule.event("firing", rule.since, rule.last_value, rule.last_score), host=self.host)
+                for rule in self.rules if rule.state == "firing"
+            ]
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "rules": [rule.to_dict() for rule in self.rules],
+                "events": list(self.events),
+            }
+
+    def stats(self):
+        return {
+            "rules": len(self.rules),
+            "firing": sum(1 for rule in self.rules if rule.state == "firing"),
+            "fired": self.fired,
+        }
+
+
+class WebhookNotifier:
+    """把告警事件逐条 POST 到 Webhook（JSON），在后台线程中发送，不阻塞采集线程"""
+
+    def __init__(self, url, timeout=DEFAULT_WEBHOOK_TIMEOUT, retries=DEFAULT_WEBHOOK_RETRIES,
+                 retry_delay=DEFAULT_WEBHOOK_RETRY_DELAY, headers=None, client=None):
+        self.url = url
+        self.retries = max(1, retries)
+        self.retry_delay = retry_delay
+        self.headers = dict(headers or {})
+        if client is None:
+            # httpx 只在配置了 Webhook 时才导入
+            import httpx
+            client = httpx.Client(timeout=timeout)
+        self.client = client
+        self.sent = 0
+        self.failed = 0
+        self.last_error = None
+        # 队列满时丢弃最旧的事件
+        self._queue = deque(maxlen=WEBHOOK_QUEUE_SIZE)
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def notify(self, event):
+        """AlertEngine 监听者：只入队"""
+        self._queue.append(event)
+        self._wake.set()
+
+    def _send(self, event):
+        import httpx
+
+        for attempt in range(self.retries):
+            if attempt and self._stop_event.wait(self.retry_delay * 2 ** (attempt - 1)):
+                break
+            try:
+                response = self.client.post(self.url, json=event, headers=self.headers)
+            except httpx.HTTPError as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                continue
+            if response.status_code < 300:
+                self.sent += 1
+                return True
+            self.last_error = f"HTTP {response.status_code}"
+            if response.status_code < 500:
+                break
+        self.failed += 1
+        print(f"⚠️  Alert webhook failed: {self.last_error}")
+        return False
+
+    def drain(self):
+        while self._queue:
+            self._send(self._queue.popleft())
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="alert-webhook", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def close(self):
+        self.stop()
+        self.client.close()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            self.drain()
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "pending": len(self._queue),
+            "sent": self.sent,
+            "failed": self.failed,
+            "lastError": self.last_error,
+        }
@@ -1,19 +1,198 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from system_monitor import SystemMonitor
+from fastapi.responses import FileResponse, StreamingResponse
+from system_monitor import COLLECTORS, SystemMonitor, collectors_for_fields, resolve_fields
+from collector import StatusCollector
+from budget import OverheadBudget
+from processes import MAX_TOP, SORT_KEYS
+from history import (AGGREGATES, DEFAULT_AGGREGATES, PINNED_METRICS, BlockHistory, MetricHistory, default_step,
+                     merge_results)
+from rollups import RollupHistory
+from stream import StatusBroadcaster
+from encoding import COLUMNAR, JSON, MSGPACK, encode, negotiate
+from response_cache import ResponseCache, choose_encoding, etag_matches
+from prometheus import CONTENT_TYPES, OPENMETRICS, PROMETHEUS_TEXT
+from instrumentation import LoopLagMonitor, ProcessUsage, RouteTimingMiddleware, Timings
+from alerts import AlertEngine
+from shared import WORKER_HISTORY_CAPACITY, SharedCollector
+import msgpack
+import psutil
+from storage import SegmentStore
+import asyncio
+import functools
+import json
+import math
 import platform
+import time
 import os
 
-def create_app():
+# Dashboard 目录候选：新的目录结构（agent/python → client/web），以及旧的 dashboard 目录
+_AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DASHBOARD_DIRS = (
+    os.path.join(os.path.dirname(os.path.dirname(_AGENT_DIR)), 'client', 'web'),
+    os.path.join(os.path.dirname(_AGENT_DIR), 'dashboard'),
+    os.path.join(os.path.dirname(os.path.dirname(_AGENT_DIR)), 'dashboard'),
+)
+
+@functools.lru_cache(maxsize=None)
+def find_dashboard_dir():
+    """首次访问 Dashboard 时才查找目录，结果缓存；找不到时返回 None"""
+    for directory in DASHBOARD_DIRS:
+        if os.path.isdir(directory):
+            return directory
+    print(f"⚠️  Warning: Dashboard directory not found at {DASHBOARD_DIRS[0]}")
+    return None
+
+class LazyStaticFiles:
+    """首次请求时才创建 StaticFiles；只请求 API 的客户端不会触发任何目录查找"""
+    
+    def __init__(self):
+        self.app = None
+    
+    async def __call__(self, scope, receive, send):
+        if self.app is None:
+            directory = find_dashboard_dir()
+            if directory is None:
+                raise HTTPException(status_code=404, detail="Dashboard not found")
+            self.app = StaticFiles(directory=directory)
+        await self.app(scope, receive, send)
+
+def create_app(sample_interval=1.0, net_smoothing=None, history_capacity=None,
+               data_dir=None, retention=7 * 86400, delta_thresholds=None,
+               collector_intervals=None, disabled_collectors=(), exporter=None,
+               cpu_budget=None, battery_saver=True, alert_rules=None, alert_webhook=None, publisher=None,
+               discovery=None, shared=None, pinned_metrics=PINNED_METRICS):
     app = FastAPI(
         title="Mac Monitor Agent",
         description="System monitoring agent for Mac computers",
         version="1.0.0"
     )
     
-    monitor = SystemMonitor()
+    # Agent 自身的耗时直方图：采集项、编码、路由与事件循环延迟
+    timings = Timings()
+    app.state.timings = timings
+    if shared is None:
+        # 采样在后台线程中进行，请求只读取最新快照
+        # 网络速率每个采样周期计算一次，所有客户端读到同一组数值
+        monitor = SystemMonitor(cpu_interval=None, net_window=sample_interval, net_smoothing=net_smoothing)
+        # 各采集项按需运行：只有被订阅 / 近期被请求 / 历史需要的采集项才会采样
+        # cpu_budget 为 Agent 占单核的比例上限；超出预算或使用电池时拉长进程扫描、传感器等采集项的间隔
+        budget = OverheadBudget(cpu_budget, battery_saver) if cpu_budget is not None or battery_saver else None
+        collector = StatusCollector(
+            monitor, interval=sample_interval, intervals=collector_intervals,
+            disabled=disabled_collectors, on_demand=True, timings=timings, budget=budget
+        )
+        process_table = monitor.processes
+        cores = psutil.cpu_count()
+    else:
+        # 多进程模式：采样只在采样进程中进行（见 shared.create_sampler），快照、进程表与采集器统计
+        # 从共享内存读取，需求写回共享内存；本进程不调用 psutil
+        collector = SharedCollector(shared, interval=sample_interval, timings=timings)
+        process_table = collector.processes
+        cores = shared.cores
+        # 发现服务只在采样进程中运行，各工作进程返回同一份 Agent 列表
+        if discovery is None:
+            discovery = collector.peers
+    app.state.collector = collector
+    
+    # 内存历史（默认 24 小时 @ 1 秒）；多进程模式下每个工作进程各保存一份，默认只保留最近 1 小时，
+    # 更早的数据由降采样层级与磁盘存储提供
+    if history_capacity is None:
+        history_capacity = 86400 if shared is None else WORKER_HISTORY_CAPACITY
+    history = MetricHistory(capacity=history_capacity, resolution=sample_interval)
+    collector.add_listener(history.record)
+    # 只有常驻指标的采集项一直运行，温度、电量等随其他需求采集
+    collector.acquire(collectors_for_fields(pinned_metrics))
+    app.state.history = history
+    
+    # 按核 CPU 使用率：(时间 × 核) 二维块，仅保存在内存中
+    core_history = BlockHistory("cpu.perCore", cores, capacity=history_capacity, resolution=sample_interval)
+    collector.add_listener(core_history.record)
+    app.state.core_history = core_history
+    
+    # 可选的磁盘持久化存储，与内存历史共用同一个快照源
+    # 多进程模式下由采样进程写入，工作进程只读
+    store = None
+    if data_dir:
+        store = SegmentStore(data_dir, history.metrics, retention=retention, resolution=sample_interval,
+                             readonly=shared is not None)
+        if shared is None:
+            collector.add_listener(store.record)
+    app.state.store = store
+    
+    # 多分辨率降采样层级（10s / 1m / 1h），查询时自动选择合适的数据源
+    rollups = RollupHistory([history, store], history.metrics)
+    collector.add_listener(rollups.record)
+    app.state.rollups = rollups
+    
+    # 告警规则在 Agent 内对每份快照评估（alert_rules 为 None 时使用默认规则，[] 表示不启用），
+    # 状态变化通过推送流与可选的 Webhook 发出；多进程模式下规则只在采样进程中评估，这里读取共享的告警状态
+    if shared is None:
+        alert_engine = AlertEngine(alert_rules)
+        collector.add_listener(alert_engine.record)
+        collector.acquire(set().union(*(rule.collectors for rule in alert_engine.rules)))
+    else:
+        alert_engine = collector.alerts
+    if alert_webhook is not None:
+        alert_engine.add_listener(alert_webhook.notify)
+    app.state.alerts = alert_engine
+    
+    # 实时推送：每份快照推送给所有 SSE / WebSocket 订阅者
+    broadcaster = StatusBroadcaster(collector, delta_thresholds=delta_thresholds, timings=timings, alerts=alert_engine)
+    app.state.broadcaster = broadcaster
+    
+    # 每个快照 generation 只序列化 / 压缩一次
+    response_cache = ResponseCache(timings=timings)
+    app.state.response_cache = response_cache
+    
+    # 可选的推送导出（网络不稳定、无法被拉取的设备），导出完整快照
+    if exporter is not None:
+        collector.add_listener(exporter.record)
+        collector.acquire(COLLECTORS)
+    app.state.exporter = exporter
+    
+    # 可选的 Bonjour 发布（在事件循环上异步注册），TXT 中的负载分档取自快照
+    if publisher is not None:
+        collector.add_listener(publisher.record)
+    app.state.publisher = publisher
+    
+    # 可选的局域网发现服务：持续浏览 Bonjour，缓存其他 Agent 并定期探测 /health
+    app.state.discovery = discovery
+    
+    loop_lag = LoopLagMonitor(timings)
+    usage = ProcessUsage()
+    started_at = time.time()
+    
+    @app.on_event("startup")
+    async def start_collector():
+        collector.start()
+        loop_lag.start()
+        if exporter is not None:
+            exporter.start()
+        if alert_webhook is not None:
+            alert_webhook.start()
+        if publisher is not None:
+            await publisher.async_start()
+        if discovery is not None:
+            await discovery.start()
+    
+    @app.on_event("shutdown")
+    async def stop_collector():
+        await loop_lag.stop()
+        if publisher is not None:
+            await publisher.async_stop()
+        if discovery is not None:
+            await discovery.stop()
+        collector.stop()
+        # 停止导出会等待后台线程并同步发送剩余快照（含重试），放到线程池中，不阻塞事件循环
+        if exporter is not None:
+            await run_in_threadpool(exporter.stop)
+        if alert_webhook is not None:
+            await run_in_threadpool(alert_webhook.stop)
+        if store is not None:
+            store.close()
     
     # 允许跨域
     app.add_middleware(
@@ -22,36 +201,307 @@ def create_app():
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(RouteTimingMiddleware, timings=timings)
     
-    # 获取 dashboard 目录路径
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    # 新的目录结构：从 agent/python 到 client/web
-    dashboard_dir = os.path.join(os.path.dirname(os.path.dirname(current_dir)), 'client', 'web')
+    # Dashboard 静态文件：目录在首次请求时才查找并挂载
+    app.mount("/dashboard", LazyStaticFiles(), name="dashboard")
     
-    # 兼容旧的目录结构
-    if not os.path.exists(dashboard_dir):
-        dashboard_dir = os.path.join(os.path.dirname(current_dir), 'dashboard')
-    if not os.path.exists(dashboard_dir):
-        dashboard_dir = os.path.join(os.path.dirname(os.path.dirname(current_dir)), 'dashboard')
+    @app.get("/")
+    async def serve_dashboard():
+        """提供 Dashboard 主页"""
+        directory = find_dashboard_dir()
+        index_path = os.path.join(directory, "index.html") if directory else None
+        if index_path and os.path.exists(index_path):
+            return FileResponse(index_path)
+        return {"message": "Dashboard not found"}
     
-    # 挂载静态文件目录
-    if os.path.exists(dashboard_dir):
-        app.mount("/dashboard", StaticFiles(directory=dashboard_dir), name="dashboard")
-        
-        @app.get("/")
-        async def serve_dashboard():
-            """提供 Dashboard 主页"""
-            index_path = os.path.join(dashboard_dir, "index.html")
-            if os.path.exists(index_path):
-                return FileResponse(index_path)
-            return {"message": "Dashboard not found"}
-    else:
-        print(f"⚠️  Warning: Dashboard directory not found at {dashboard_dir}")
+    def parse_fields(fields):
+        """解析 ?fields=，返回 (顶层字段集合, 采集项集合)；未指定时为 (None, 全部采集项)"""
+        if not fields:
+            return None, set(COLLECTORS)
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        try:
+            keys = resolve_fields(names)
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {e.args[0]}")
+        return keys, collectors_for_fields(keys)
+    
+    def choose_format(accept, offered):
+        media_type = negotiate(accept, offered)
+        if media_type is None:
+            raise HTTPException(status_code=406, detail=f"Supported formats: {', '.join(offered)}")
+        return media_type
+    
+    async def current_snapshot(names):
+        """包含 names 中各采集项的最新快照"""
+        missing = collector.missing(names)
+        snapshot = collector.latest()
+        # 快照中还没有这些采集项（首次请求或采集项此前停止）时，在线程池中立即补采一次；
+        # names 为空（例如 ?fields=timestamp 或只涉及已禁用的采集项）时只需要有一份快照
+        if missing or snapshot is None:
+            snapshot = await run_in_threadpool(collector.sample, missing)
+        if snapshot is None:
+            raise HTTPException(status_code=503, detail="No snapshot available yet")
+        return snapshot
     
     @app.get("/api/status")
-    async def get_status():
-        """获取系统实时状态"""
-        return monitor.get_status()
+    async def get_status(
+        fields: str = None,
+        accept: str = Header(None),
+        accept_encoding: str = Header(None),
+        if_none_match: str = Header(None)
+    ):
+        """获取系统实时状态（最新快照），支持 fields 字段过滤、JSON / MessagePack、gzip 压缩与 ETag"""
+        media_type = choose_format(accept, [JSON, MSGPACK])
+        keys, names = parse_fields(fields)
+        # 轮询会让相关采集项在一段时间内保持运行
+        collector.touch(names)
+        snapshot = await current_snapshot(names)
+        cached = response_cache.get(snapshot, media_type, choose_encoding(accept_encoding), fields=keys)
+        headers = {
+            "ETag": cached.etag,
+            "X-Sample-Age": f"{time.time() - snapshot.sampled_at:.3f}",
+            "Cache-Control": "no-cache",
+            "Vary": "Accept, Accept-Encoding"
+        }
+        if etag_matches(if_none_match, cached.etag):
+            return Response(status_code=304, headers=headers)
+        if cached.content_encoding:
+            headers["Content-Encoding"] = cached.content_encoding
+        return Response(content=cached.body, media_type=media_type, headers=headers)
+    
+    @app.get("/metrics")
+    async def get_metrics(accept: str = Header(None), accept_encoding: str = Header(None)):
+        """Prometheus 文本格式 / OpenMetrics 指标（含按核、按磁盘、按网卡序列），每个快照只渲染一次"""
+        media_type = choose_format(accept, [PROMETHEUS_TEXT, OPENMETRICS])
+        names = set(COLLECTORS)
+        collector.touch(names)
+        snapshot = await current_snapshot(names)
+        # Agent 自身的统计随快照一起渲染，同一快照内的抓取共用同一份
+        def payload():
+            return dict(snapshot.status, sampledAt=snapshot.sampled_at, agent=agent_stats())
+        
+        cached = response_cache.get(snapshot, media_type, choose_encoding(accept_encoding), payload=payload)
+        headers = {
+            "Content-Type": CONTENT_TYPES[media_type],
+            "ETag": cached.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept, Accept-Encoding"
+        }
+        if cached.content_encoding:
+            headers["Content-Encoding"] = cached.content_encoding
+        return Response(content=cached.body, headers=headers)
+    
+    def agent_stats():
+        snapshot = collector.latest()
+        return {
+            "process": usage.read(),
+            "uptime": time.time() - started_at,
+            "snapshotAge": time.time() - snapshot.sampled_at if snapshot else None,
+            "generation": snapshot.generation if snapshot else 0,
+            "loopLag": loop_lag.last,
+            "queues": {
+                "streamSubscribers": len(broadcaster.subscribers),
+                "streamPending": sum(1 for s in broadcaster.subscribers if s.pending is not None),
+                "exporterPending": exporter.stats()["pending"] if exporter is not None else 0,
+                "exporterSpooled": len(exporter.spool) if exporter is not None else 0,
+            },
+            "collector": collector.stats(),
+            "stream": broadcaster.stats(),
+            "responseCache": {"hits": response_cache.hits, "misses": response_cache.misses,
+                              "reused": response_cache.reused},
+            "processTable": process_table.stats(),
+            "exporter": exporter.stats() if exporter is not None else None,
+            "discovery": discovery.stats() if discovery is not None else None,
+            "alerts": dict(alert_engine.stats(), webhook=alert_webhook.stats() if alert_webhook is not None else None),
+            "timings": timings.to_dict(),
+        }
+    
+    @app.get("/api/agent/stats")
+    async def get_agent_stats():
+        """Agent 自身的开销：CPU / RSS、事件循环延迟、快照新鲜度、队列深度与各环节耗时直方图"""
+        return agent_stats()
+    
+    @app.get("/api/peers")
+    async def get_peers():
+        """局域网内发现的其他 Agent（带 TTL 的缓存）：健康状态、延迟、最近出现时间与 TXT 提示"""
+        peers = discovery.to_dict() if discovery is not None else None
+        if peers is None:
+            raise HTTPException(status_code=503, detail="Peer discovery is disabled")
+        return peers
+    
+    @app.get("/api/alerts")
+    async def get_alerts():
+        """告警规则及其当前状态（ok / pending / firing）与最近的告警事件"""
+        return alert_engine.to_dict()
+    
+    @app.get("/api/processes")
+    async def get_processes(top: int = 20, sort: str = "cpu"):
+        """占用最高的进程（sort: cpu / rss / threads / io），数据来自 processes 采集项维护的进程表"""
+        if sort not in SORT_KEYS:
+            raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+        if not 1 <= top <= MAX_TOP:
+            raise HTTPException(status_code=400, detail=f"'top' must be between 1 and {MAX_TOP}")
+        if "processes" not in collector.enabled:
+            raise HTTPException(status_code=503, detail="Process collector is disabled")
+        collector.touch(["processes"])
+        if collector.missing(["processes"]):
+            await run_in_threadpool(collector.sample, ["processes"])
+        return dict(process_table.stats(), sort=sort, processes=process_table.top(top, sort))
+    
+    @app.get("/api/history")
+    async def get_history(
+        metrics: str = None,
+        start: float = Query(None, alias="from"),
+        end: float = Query(None, alias="to"),
+        step: float = None,
+        aggs: str = None,
+        accept: str = Header(None)
+    ):
+        """查询指标历史，按 step 秒降采样为 min/max/avg 等聚合桶；支持 JSON / MessagePack / 列式二进制"""
+        media_type = choose_format(accept, [JSON, MSGPACK, COLUMNAR])
+        names = metrics.split(",") if metrics else history.metrics
+        unknown = [name for name in names if name not in history.columns and name != core_history.path]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}")
+        aggregates = aggs.split(",") if aggs else DEFAULT_AGGREGATES
+        unknown = [name for name in aggregates if name not in AGGREGATES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown aggregates: {', '.join(unknown)}")
+        # nan / inf 能通过下面的比较，却会在降采样取整时失败
+        if any(value is not None and not math.isfinite(value) for value in (start, end, step)):
+            raise HTTPException(status_code=400, detail="'from', 'to' and 'step' must be finite numbers")
+        if end is None:
+            end = time.time()
+        if start is None:
+            start = end - 3600
+        if start >= end:
+            raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'")
+        if step is None or step <= 0:
+            step = default_step(start, end)
+        # 由查询规划选择满足 step 的最粗层级；内存历史覆盖不到的原始数据从磁盘读取
+        scalar = [name for name in names if name != core_history.path]
+        result = None
+        if scalar:
+            result = await run_in_threadpool(rollups.query, scalar, start, end, step, aggregates)
+        if core_history.path in names:
+            block = await run_in_threadpool(core_history.query, start, end, step, aggregates)
+            result = block if result is None else merge_results(result, block)
+        return Response(content=encode(result, media_type), media_type=media_type, headers={"Vary": "Accept"})
+    
+    def check_stream_mode(mode):
+        if mode not in ("full", "delta"):
+            raise HTTPException(status_code=400, detail=f"Unknown stream mode: {mode}")
+    
+    @app.get("/api/stream")
+    async def stream_status(
+        fields: str = None,
+        interval: float = 0.0,
+        limit: int = None,
+        mode: str = "full",
+        since: int = None,
+        alerts: bool = True,
+        last_event_id: int = Header(None)
+    ):
+        """以 Server-Sent Events 推送实时状态
+
+        interval 为最小推送间隔（秒），limit 为推送条数上限；mode=delta 时先发关键帧、
+        之后只发变化字段，可用 since（或断线重连时的 Last-Event-ID）从指定 seq 续传。
+        告警状态变化以 alert 事件推送（alerts=false 时不推送），不计入 limit。
+        """
+        check_stream_mode(mode)
+        keys, _ = parse_fields(fields)
+        if since is None:
+            since = last_event_id
+        subscription = broadcaster.subscribe(keys, interval, mode, since, alerts=alerts)
+        event_type = "delta" if mode == "delta" else "status"
+        
+        async def events():
+            try:
+                count = 0
+                async for snapshot in subscription:
+                    message = subscription.message(snapshot)
+                    if isinstance(snapshot, dict):
+                        # 告警事件不带 id，不影响断线续传的 Last-Event-ID
+                        yield f"event: alert\ndata: {message}\n\n"
+                        continue
+                    event_id = subscription.last_seq if mode == "delta" else snapshot.generation
+                    yield f"id: {event_id}\nevent: {event_type}\ndata: {message}\n\n"
+                    count += 1
+                    if limit and count >= limit:
+                        break
+            finally:
+                broadcaster.unsubscribe(subscription)
+        
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    @app.websocket("/api/stream")
+    async def stream_status_ws(
+        websocket: WebSocket,
+        fields: str = None,
+        interval: float = 0.0,
+        mode: str = "full",
+        since: int = None,
+        alerts: bool = False,
+        fmt: str = Query(None, alias="format")
+    ):
+        """以 WebSocket 推送实时状态；delta 模式下客户端可发送 {"resync": seq} 请求重新同步
+
+        format=msgpack（或握手请求的 Accept 为 application/msgpack）时以二进制帧发送 MessagePack。
+        alerts=true 时告警事件以 {"alert": {...}} 帧推送（默认关闭，旧客户端会把它当作状态帧）。
+        """
+        await websocket.accept()
+        if fmt:
+            media_type = {"json": JSON, "msgpack": MSGPACK}.get(fmt)
+        else:
+            media_type = negotiate(websocket.headers.get("accept"), [JSON, MSGPACK])
+        try:
+            keys, _ = parse_fields(fields)
+        except HTTPException:
+            keys = media_type = None
+        if mode not in ("full", "delta") or media_type is None:
+            await websocket.close(code=1008)
+            return
+        subscription = broadcaster.subscribe(keys, interval, mode, since, media_type, alerts)
+        
+        async def receive_messages():
+            # 同时负责感知客户端断开（只推送不接收时无法发现连接已关闭）
+            try:
+                while True:
+                    data = await websocket.receive()
+                    if data["type"] == "websocket.disconnect":
+                        raise WebSocketDisconnect(data.get("code", 1000))
+                    try:
+                        if data.get("bytes") is not None:
+                            message = msgpack.unpackb(data["bytes"])
+                        else:
+                            message = json.loads(data.get("text") or "")
+                    except ValueError:
+                        continue
+                    if isinstance(message, dict) and "resync" in message:
+                        subscription.resync(message["resync"])
+            except WebSocketDisconnect:
+                broadcaster.unsubscribe(subscription)
+        
+        receiver = asyncio.create_task(receive_messages())
+        try:
+            async for snapshot in subscription:
+                if isinstance(snapshot, dict):
+                    snapshot = {"alert": snapshot}
+                message = subscription.message(snapshot)
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiver.cancel()
+            broadcaster.unsubscribe(subscription)
     
     @app.get("/api/info")
     async def get_info():
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /api/status throughput and latency under concurrent clients
+
+Drives the agent's FastAPI app with N concurrent keep-alive clients, both
+in-process through httpx's ASGI transport (framework + handler cost only) and
+over TCP against a real uvicorn server running in a separate process. The TCP
+load uses a minimal asyncio HTTP/1.1 client: httpx's connection pool costs
+more CPU per request than the server itself and would cap the numbers.
+
+    python3 benchmarks/bench_api.py [--concurrency 1,16,64] [--requests 2000] [--json]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import create_app
+
+
+async def load(client, path, concurrency, requests):
+    """concurrency 个客户端共发送 requests 个请求，返回每个请求的延迟"""
+    latencies = []
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+def summarize(transport, path, concurrency, latencies, elapsed):
+    latencies.sort()
+    return {
+        "transport": transport,
+        "path": path,
+        "concurrency": concurrency,
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+async def run_asgi(app, path, levels, requests):
+    results = []
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://agent") as client:
+            await client.get(path)
+            for concurrency in levels:
+                latencies, elapsed = await load(client, path, concurrency, requests)
+                results.append(summarize("asgi", path, concurrency, latencies, elapsed))
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+def serve(port):
+    """子进程：运行 uvicorn，避免与压测客户端争用 GIL"""
+    uvicorn.run(create_app(), host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def start_uvicorn():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = multiprocessing.Process(target=serve, args=(port,), daemon=True)
+    server.start()
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return server, port
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline or not server.is_alive():
+            server.terminate()
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+
+
+async def http_worker(port, path, state, latencies):
+    """最小化的 HTTP/1.1 keep-alive 客户端：httpx 的连接池在高并发下自身就会成为瓶颈"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = f"GET {path} HTTP/1.1\r\nHost: agent\r\n\r\n".encode()
+    try:
+        while state["remaining"] > 0:
+            state["remaining"] -= 1
+            started = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            status_line, _, headers = head.partition(b"\r\n")
+            if b" 200 " not in status_line:
+                raise RuntimeError(f"{path} returned {status_line.decode()}")
+            length = 0
+            for line in headers.split(b"\r\n"):
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+async def run_uvicorn_load(port, path, levels, requests):
+    results = []
+    for concurrency in levels:
+        latencies = []
+        state = {"remaining": requests}
+        started = time.perf_counter()
+        await asyncio.gather(*(http_worker(port, path, state, latencies) for _ in range(concurrency)))
+        results.append(summarize("uvicorn", path, concurrency, latencies, time.perf_counter() - started))
+    return results
+
+
+def run(levels=(1, 16, 64), requests=2000, paths=("/api/status",), transports=("asgi", "uvicorn")):
+    results = []
+    for path in paths:
+        if "asgi" in transports:
+            results.extend(asyncio.run(run_asgi(create_app(), path, levels, requests)))
+        if "uvicorn" in transports:
+            server, port = start_uvicorn()
+            try:
+                results.extend(asyncio.run(run_uvicorn_load(port, path, levels, requests)))
+            finally:
+                server.terminate()
+                server.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", default="1,16,64", help="comma-separated concurrent client counts")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument("--path", action="append", help="request path (default /api/status), repeatable")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run([int(n) for n in args.concurrency.split(",")], args.requests, args.path or ("/api/status",))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'transport':<9} {'path':<24} {'clients':>7} {'req/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for r in results:
+        print(f"{r['transport']:<9} {r['path']:<24} {r['concurrency']:>7} {r['requests_per_sec']:>9.0f} "
+              f"{r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
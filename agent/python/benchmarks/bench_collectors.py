@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cost of each SystemMonitor collector and of a full sample
+
+Times every collector through SystemMonitor.collect (after a warm-up call,
+so incremental collectors such as the process table are measured in their
+steady state), get_status end-to-end and one StatusCollector.sample().
+
+    python3 benchmarks/bench_collectors.py [--repeat 20] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collector import StatusCollector
+from system_monitor import COLLECTORS, SystemMonitor
+
+
+def measure(func, repeat):
+    func()
+    wall, cpu = [], []
+    for _ in range(repeat):
+        started, cpu_started = time.perf_counter(), time.process_time()
+        func()
+        wall.append(time.perf_counter() - started)
+        cpu.append(time.process_time() - cpu_started)
+    wall.sort()
+    return {
+        "p50_ms": statistics.median(wall) * 1000,
+        "p95_ms": wall[min(len(wall) - 1, int(len(wall) * 0.95))] * 1000,
+        "cpu_ms": statistics.mean(cpu) * 1000,
+    }
+
+
+def run(repeat=20):
+    monitor = SystemMonitor(cpu_interval=None)
+    results = []
+    for name in COLLECTORS:
+        results.append(dict(measure(lambda: monitor.collect(name), repeat), collector=name))
+    results.append(dict(measure(monitor.get_status, repeat), collector="get_status"))
+    collector = StatusCollector(monitor, intervals=dict.fromkeys(COLLECTORS, 0))
+    results.append(dict(measure(collector.sample, repeat), collector="sample"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="measured calls per collector")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'collector':<12} {'p50 (ms)':>10} {'p95 (ms)':>10} {'cpu (ms)':>10}")
+    for r in results:
+        print(f"{r['collector']:<12} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['cpu_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: encode time and size of /api/status and /api/history payloads
+
+Compares the previous FastAPI path (jsonable_encoder + JSONResponse) with
+compact JSON, MessagePack and the packed columnar format.
+
+    python3 benchmarks/bench_encoding.py [--points 1440] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from encoding import encode_columnar, encode_json, encode_msgpack
+from system_monitor import SystemMonitor
+
+
+def fastapi_json(payload):
+    return JSONResponse(content=jsonable_encoder(payload)).body
+
+
+def history_payload(points, metrics=("cpu.usage", "memory.pressure")):
+    start = 1_700_000_000.0
+    return {
+        "from": start,
+        "to": start + points * 60,
+        "step": 60,
+        "timestamps": [start + i * 60 for i in range(points)],
+        "series": {
+            name: {
+                "min": [0.1 + (i % 50) / 100 for i in range(points)],
+                "max": [0.6 + (i % 30) / 100 for i in range(points)],
+                "avg": [0.35 + (i % 40) / 100 for i in range(points)],
+            }
+            for name in metrics
+        },
+    }
+
+
+def measure(encoder, payload, repeat=5):
+    number = max(1, int(0.2 / max(timeit.timeit(lambda: encoder(payload), number=1), 1e-7)))
+    best = min(timeit.repeat(lambda: encoder(payload), number=number, repeat=repeat)) / number
+    return best, len(encoder(payload))
+
+
+def run(points=1440):
+    status = dict(SystemMonitor(cpu_interval=None).get_status(), sampledAt=0.0)
+    history = history_payload(points)
+    samples = points * sum(len(aggs) for aggs in history["series"].values())
+
+    cases = [
+        ("status", "fastapi-json", fastapi_json, status, 1),
+        ("status", "json", encode_json, status, 1),
+        ("status", "msgpack", encode_msgpack, status, 1),
+        ("history", "fastapi-json", fastapi_json, history, samples),
+        ("history", "json", encode_json, history, samples),
+        ("history", "msgpack", encode_msgpack, history, samples),
+        ("history", "columnar", encode_columnar, history, samples),
+    ]
+    results = []
+    for payload_name, format_name, encoder, payload, count in cases:
+        seconds, size = measure(encoder, payload)
+        results.append({
+            "payload": payload_name,
+            "format": format_name,
+            "encode_us": seconds * 1e6,
+            "bytes": size,
+            "bytes_per_sample": size / count,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=1440, help="history points per series")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.points)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'payload':<8} {'format':<13} {'encode (µs)':>12} {'bytes':>9} {'bytes/sample':>13}")
+    for r in results:
+        print(f"{r['payload']:<8} {r['format']:<13} {r['encode_us']:>12.1f} {r['bytes']:>9} {r['bytes_per_sample']:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark: fleet aggregator polling many agents from one process
+
+Starts lightweight stub agents (one listening socket each, in a separate
+process) and measures how long one concurrent poll round takes and how much
+CPU the aggregator spends per round.
+
+    python3 benchmarks/bench_fleet.py [--agents 100,500] [--rounds 5] [--json]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoding import encode_msgpack
+from fleet import FleetAggregator
+
+
+def raise_fd_limit():
+    # 每个 Agent 需要监听 socket + 两端的连接，默认 1024 不够用
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def stub_status():
+    return {
+        "timestamp": "2026-01-01T00:00:00",
+        "cpu": {"usage": 0.42, "coreCount": 8, "frequency": 3.2, "perCore": [0.4] * 8},
+        "memory": {"total": 17179869184, "used": 8589934592, "free": 8589934592, "pressure": 0.5},
+        "disk": {"total": 500000000000, "used": 250000000000, "free": 250000000000},
+        "network": {"bytesIn": 12500, "bytesOut": 3400, "packetsIn": 100, "packetsOut": 80},
+        "uptime": 86400,
+        "processCount": 420,
+        "threadCount": 1800,
+        "batteryLevel": 0.8,
+        "isCharging": False,
+        "sampledAt": 0.0,
+    }
+
+
+def run_stubs(count, ports, ready):
+    """子进程：启动 count 个最小化的 HTTP/1.1 Agent，把端口号写回 ports"""
+    raise_fd_limit()
+    body = encode_msgpack(stub_status())
+    response = (
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/msgpack\r\nETag: \"stub\"\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+
+    async def handle(reader, writer):
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve():
+        servers = [await asyncio.start_server(handle, "127.0.0.1", 0) for _ in range(count)]
+        for server in servers:
+            ports.append(server.sockets[0].getsockname()[1])
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def measure(ports, rounds):
+    aggregator = FleetAggregator([("127.0.0.1", port) for port in ports], timeout=10)
+    # 第一轮建立连接，不计入结果
+    await aggregator.poll_once()
+    durations = []
+    cpu = []
+    succeeded = 0
+    for _ in range(rounds):
+        wall, process = time.perf_counter(), time.process_time()
+        succeeded = await aggregator.poll_once()
+        durations.append(time.perf_counter() - wall)
+        cpu.append(time.process_time() - process)
+    encode_started = time.perf_counter()
+    size = len(aggregator.encoded())
+    encode_seconds = time.perf_counter() - encode_started
+    await aggregator.stop()
+    return {
+        "agents": len(ports),
+        "succeeded": succeeded,
+        "round_ms_p50": statistics.median(durations) * 1000,
+        "round_ms_max": max(durations) * 1000,
+        "cpu_ms_per_round": statistics.mean(cpu) * 1000,
+        "fleet_status_bytes": size,
+        "fleet_status_encode_ms": encode_seconds * 1000,
+    }
+
+
+def run(agent_counts=(100, 500), rounds=5):
+    raise_fd_limit()
+    results = []
+    for count in agent_counts:
+        manager = multiprocessing.Manager()
+        ports = manager.list()
+        ready = manager.Event()
+        stubs = multiprocessing.Process(target=run_stubs, args=(count, ports, ready), daemon=True)
+        stubs.start()
+        try:
+            ready.wait(30)
+            results.append(asyncio.run(measure(list(ports), rounds)))
+        finally:
+            stubs.terminate()
+            stubs.join()
+            manager.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", default="100,500", help="comma-separated agent counts")
+    parser.add_argument("--rounds", type=int, default=5, help="measured poll rounds per count")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run([int(n) for n in args.agents.split(",")], args.rounds)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'agents':>6} {'ok':>5} {'round p50 (ms)':>15} {'round max (ms)':>15} {'cpu/round (ms)':>15} {'status bytes':>13}")
+    for r in results:
+        print(f"{r['agents']:>6} {r['succeeded']:>5} {r['round_ms_p50']:>15.1f} {r['round_ms_max']:>15.1f} "
+              f"{r['cpu_ms_per_round']:>15.1f} {r['fleet_status_bytes']:>13}")
+
+
+if __name__ == "__main__":
+    main()
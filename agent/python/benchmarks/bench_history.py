@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /api/history range queries at various history sizes
+
+Fills the raw in-memory history (1 s resolution) and the rollup tiers with
+synthetic samples, then times default-step queries over 1 h, 6 h and 24 h
+windows ending at the newest sample, against both the raw store and the
+rollup planner.
+
+    python3 benchmarks/bench_history.py [--sizes 3600,86400] [--json]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collector import Snapshot
+from history import DEFAULT_METRICS, MetricHistory
+from rollups import RollupHistory
+
+WINDOWS = (("1h", 3600), ("6h", 6 * 3600), ("24h", 24 * 3600))
+QUERY_METRICS = ["cpu.usage", "memory.pressure"]
+START = 1_700_000_000.0
+
+
+def synthetic_status(i):
+    return {
+        "cpu": {"usage": 0.3 + 0.2 * math.sin(i / 300)},
+        "memory": {"pressure": 0.5 + 0.1 * math.cos(i / 900), "used": 8e9 + i},
+        "disk": {"used": 2e11},
+        "network": {"bytesIn": float(i % 5000), "bytesOut": float(i % 3000)},
+        "temperature": 50.0,
+        "batteryLevel": 0.8,
+    }
+
+
+def fill(points):
+    history = MetricHistory(DEFAULT_METRICS, capacity=max(points, 1))
+    rollups = RollupHistory([history], history.metrics)
+    for i in range(points):
+        snapshot = Snapshot(i + 1, START + i, synthetic_status(i))
+        history.record(snapshot)
+        rollups.record(snapshot)
+    return history, rollups
+
+
+def measure(query, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        query()
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def run(sizes=(3600, 86400), repeat=20):
+    results = []
+    for points in sizes:
+        history, rollups = fill(points)
+        end = START + points
+        for window, seconds in WINDOWS:
+            for source, store in (("raw", history), ("rollup", rollups)):
+                result = store.query(QUERY_METRICS, end - seconds, end)
+                seconds_taken = measure(lambda: store.query(QUERY_METRICS, end - seconds, end), repeat)
+                results.append({
+                    "points": points,
+                    "window": window,
+                    "source": source,
+                    "query_ms": seconds_taken * 1000,
+                    "buckets": len(result["timestamps"]),
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="3600,86400", help="comma-separated history sizes (points)")
+    parser.add_argument("--repeat", type=int, default=20, help="queries per case (median reported)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(tuple(int(size) for size in args.sizes.split(",")), args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'points':>7} {'window':<6} {'source':<7} {'query (ms)':>11} {'buckets':>8}")
+    for r in results:
+        print(f"{r['points']:>7} {r['window']:<6} {r['source']:<7} {r['query_ms']:>11.2f} {r['buckets']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /metrics rendering cost as label cardinality grows
+
+Renders synthetic snapshots with more cores, disks, mountpoints and network
+interfaces and reports the cost per series; also measures a cached scrape
+(same snapshot generation) through ResponseCache.
+
+    python3 benchmarks/bench_metrics.py [--scales 8,64,512] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collector import Snapshot
+from prometheus import PROMETHEUS_TEXT, render
+from response_cache import ResponseCache
+
+
+def synthetic_status(scale):
+    io = {"readBytes": 4096, "writeBytes": 8192, "readOps": 1.5, "writeOps": 2.5, "serviceTime": 0.4}
+    nic = {"bytesIn": 12500, "bytesOut": 3400, "packetsIn": 123456, "packetsOut": 65432}
+    return {
+        "timestamp": "2026-01-01T00:00:00",
+        "cpu": {"usage": 0.42, "coreCount": scale, "frequency": 3.2, "perCore": [0.4] * scale,
+                "times": {"user": 0.3, "system": 0.1, "idle": 0.6, "iowait": 0.0, "steal": None}},
+        "memory": {"total": 17179869184, "used": 8589934592, "free": 8589934592, "pressure": 0.5},
+        "disk": {"total": 500, "used": 250, "free": 250, "volumes": [
+            {"mountpoint": f"/Volumes/v{i}", "device": f"/dev/disk{i}s1", "fstype": "apfs",
+             "total": 500, "used": 250, "free": 250} for i in range(scale)
+        ]},
+        "diskIO": dict(io, disks={f"disk{i}": io for i in range(scale)}),
+        "network": dict(nic, interfaces={f"en{i}": nic for i in range(scale)}),
+        "uptime": 86400.0,
+        "processCount": 420,
+        "threadCount": 1800,
+        "batteryLevel": 0.8,
+        "isCharging": False,
+        "sampledAt": 1700000000.0,
+    }
+
+
+def run(scales=(8, 64, 512), number=50):
+    results = []
+    for scale in scales:
+        status = synthetic_status(scale)
+        body = render(status)
+        series = sum(1 for line in body.splitlines() if not line.startswith(b"#"))
+        render_seconds = timeit.timeit(lambda: render(status), number=number) / number
+        cache = ResponseCache()
+        snapshot = Snapshot(1, status["sampledAt"], status)
+        cache.get(snapshot, PROMETHEUS_TEXT)
+        cached_seconds = timeit.timeit(lambda: cache.get(snapshot, PROMETHEUS_TEXT), number=number * 100) / (number * 100)
+        results.append({
+            "scale": scale,
+            "series": series,
+            "bytes": len(body),
+            "render_ms": render_seconds * 1000,
+            "render_us_per_series": render_seconds * 1e6 / series,
+            "cached_us": cached_seconds * 1e6,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", default="8,64,512", help="comma-separated cores/disks/NICs per snapshot")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run([int(n) for n in args.scales.split(",")])
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scale':>6} {'series':>7} {'bytes':>8} {'render (ms)':>12} {'us/series':>10} {'cached (us)':>12}")
+    for r in results:
+        print(f"{r['scale']:>6} {r['series']:>7} {r['bytes']:>8} {r['render_ms']:>12.2f} "
+              f"{r['render_us_per_series']:>10.2f} {r['cached_us']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark: agent startup time and import cost
+
+Runs each measurement in a fresh interpreter and reports medians:
+interpreter start-up alone, `import main` (with a per-package self-time
+breakdown from `python -X importtime`), create_app(), and the wall time
+from spawning `main.py` until the first 200 response on /health.
+
+    python3 benchmarks/bench_startup.py [--repeat 5] [--top 8] [--json]
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CREATE_APP = """
+import time
+from api_server import create_app
+started = time.perf_counter()
+create_app()
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def python(*args, **kwargs):
+    return subprocess.run([sys.executable, *args], cwd=AGENT_DIR, capture_output=True, text=True, check=True, **kwargs)
+
+
+def parse_importtime(output):
+    """解析 -X importtime 输出，返回 [(模块, 自身 us, 累计 us, 深度)]"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def package_times(entries):
+    """按顶层包汇总自身耗时（毫秒）"""
+    totals = {}
+    for name, self_us, _, _ in entries:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0.0) + self_us / 1000
+    return totals
+
+
+def measure_imports(repeat, top):
+    totals, samples = [], []
+    for _ in range(repeat):
+        entries = parse_importtime(python("-X", "importtime", "-c", "import main").stderr)
+        totals.append(next(cumulative for name, _, cumulative, _ in entries if name == "main") / 1000)
+        samples.append(package_times(entries))
+    # 每个包取各次运行的中位数，只列出最大的 top 个，其余合并为 other
+    medians = {package: statistics.median(sample.get(package, 0.0) for sample in samples)
+               for package in set().union(*samples)}
+    ranked = sorted(medians.items(), key=lambda item: item[1], reverse=True)
+    packages = dict(ranked[:top])
+    packages["other"] = sum(ms for _, ms in ranked[top:])
+    return statistics.median(totals), packages
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def first_200(timeout=30.0):
+    """启动 main.py，轮询 /health 直到返回 200，返回耗时（毫秒）"""
+    port = free_port()
+    started = time.perf_counter()
+    agent = subprocess.Popen([sys.executable, "main.py", "--port", str(port)], cwd=AGENT_DIR,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                connection.request("GET", "/health")
+                if connection.getresponse().status == 200:
+                    return (time.perf_counter() - started) * 1000
+            except OSError:
+                pass
+            if agent.poll() is not None:
+                raise RuntimeError(f"main.py exited with {agent.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("main.py did not answer /health")
+            time.sleep(0.005)
+    finally:
+        agent.send_signal(signal.SIGINT)
+        try:
+            agent.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            agent.kill()
+            agent.wait()
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def run(repeat=5, top=8):
+    interpreter = statistics.median(timed(lambda: python("-c", "pass")) for _ in range(repeat))
+    import_main, packages = measure_imports(repeat, top)
+    create_app = statistics.median(float(python("-c", CREATE_APP).stdout.split()[-1]) for _ in range(repeat))
+    health = statistics.median(first_200() for _ in range(repeat))
+    results = [
+        {"stage": "interpreter", "wall_ms": interpreter},
+        {"stage": "import_main", "wall_ms": import_main},
+        {"stage": "create_app", "wall_ms": create_app},
+        {"stage": "first_200_health", "wall_ms": health},
+    ]
+    results.extend({"stage": "import", "module": package, "self_ms": ms} for package, ms in packages.items())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument("--top", type=int, default=8, help="packages listed in the import breakdown")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.top)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'stage':<20} {'ms':>10}")
+    for r in results:
+        label = f"import {r['module']}" if "module" in r else r["stage"]
+        print(f"{label:<20} {r.get('wall_ms', r.get('self_ms')):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: run the agent benchmarks, store results as JSON, flag regressions
+
+Runs the collector, API, encoding, history, /metrics and startup benchmarks
+(the fleet benchmarks are opt-in), flattens every row into named metrics such as
+"api/transport=uvicorn,path=/api/status,concurrency=16/p99_ms" and writes
+them with run metadata to benchmarks/results/<time>-<commit>.json.
+
+A metric's direction comes from its name: *_per_sec is higher-is-better,
+names containing ms / us / bytes are lower-is-better, anything else is
+informational. With --baseline the run fails (exit 1) when a metric is
+worse than the baseline by more than --threshold (relative; doubled for
+p95/p99/max tail latencies), ignoring timing changes below a small
+absolute noise floor.
+
+    python3 benchmarks/suite.py [--bench api --bench history] [--baseline results/old.json]
+    python3 benchmarks/suite.py --compare old.json new.json [--threshold 0.25]
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# 名称 -> (模块, 作为标签的字段, run() 参数)；标签之外的数值字段都作为指标记录
+BENCHMARKS = {
+    "collectors": ("bench_collectors", ("collector",), {}),
+    "api": ("bench_api", ("transport", "path", "concurrency"), {"requests": 1000}),
+    "encoding": ("bench_encoding", ("payload", "format"), {}),
+    "history": ("bench_history", ("points", "window", "source"), {}),
+    "metrics": ("bench_metrics", ("scale",), {}),
+    "fleet": ("bench_fleet", ("agents",), {}),
+    "fleet_query": ("bench_fleet_query", ("hosts",), {}),
+    "startup": ("bench_startup", ("stage", "module"), {}),
+}
+DEFAULT_BENCHMARKS = ("collectors", "api", "encoding", "history", "metrics", "startup")
+
+DEFAULT_THRESHOLD = 0.25
+
+# 计时类指标的绝对噪声下限：变化小于此值时不算回归（亚毫秒级的抖动很常见）
+NOISE_FLOOR = {"ms": 0.5, "us": 50.0}
+
+# 尾部延迟（p95 / p99 / max）波动更大，阈值放宽为 TAIL_FACTOR 倍
+TAIL_METRICS = {"p95", "p99", "max"}
+TAIL_FACTOR = 2
+
+
+def direction(metric):
+    """'higher' / 'lower' / None（仅记录，不参与回归判断）"""
+    tokens = metric.rsplit("/", 1)[-1].replace(".", "_").split("_")
+    if tokens[-2:] == ["per", "sec"]:
+        return "higher"
+    if {"ms", "us", "bytes"} & set(tokens):
+        return "lower"
+    return None
+
+
+def metric_threshold(metric, threshold):
+    tokens = set(metric.rsplit("/", 1)[-1].replace(".", "_").split("_"))
+    return threshold * TAIL_FACTOR if tokens & TAIL_METRICS else threshold
+
+
+def noise_floor(metric):
+    tokens = set(metric.rsplit("/", 1)[-1].replace(".", "_").split("_"))
+    for unit, floor in NOISE_FLOOR.items():
+        if unit in tokens:
+            return floor
+    return 0.0
+
+
+def flatten(name, rows, labels):
+    """把 run() 的结果（行列表或单个 dict，可嵌套）展开为 {指标名: 数值}"""
+    metrics = {}
+    for row in rows if isinstance(rows, list) else [rows]:
+        key = ",".join(f"{label}={row[label]}" for label in labels if label in row)
+        prefix = f"{name}/{key}/" if key else f"{name}/"
+        stack = [("", {k: v for k, v in row.items() if k not in labels})]
+        while stack:
+            path, values = stack.pop()
+            for field, value in values.items():
+                if isinstance(value, dict):
+                    stack.append((f"{path}{field}.", value))
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metrics[f"{prefix}{path}{field}"] = value
+    return dict(sorted(metrics.items()))
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """对比两次运行的指标，返回 (回归列表, 改进列表)；只比较两边都有且有方向的指标"""
+    regressions, improvements = [], []
+    for metric, new in current.items():
+        old = baseline.get(metric)
+        better = direction(metric)
+        if old is None or better is None or old == new:
+            continue
+        if abs(new - old) < noise_floor(metric):
+            continue
+        change = (new - old) / abs(old) if old else float("inf")
+        worse = change > 0 if better == "lower" else change < 0
+        entry = {"metric": metric, "baseline": old, "current": new, "change": change}
+        if abs(change) > metric_threshold(metric, threshold):
+            (regressions if worse else improvements).append(entry)
+    key = lambda entry: -abs(entry["change"])
+    return sorted(regressions, key=key), sorted(improvements, key=key)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(names=DEFAULT_BENCHMARKS):
+    report = {
+        "meta": {
+            "time": time.time(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "benchmarks": {},
+        "metrics": {},
+    }
+    for name in names:
+        module, labels, kwargs = BENCHMARKS[name]
+        started = time.perf_counter()
+        rows = importlib.import_module(module).run(**kwargs)
+        report["benchmarks"][name] = rows
+        report["metrics"].update(flatten(name, rows, labels))
+        print(f"{name}: {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return report
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def print_comparison(regressions, improvements, threshold):
+    for title, entries in (("Regressions", regressions), ("Improvements", improvements)):
+        if not entries:
+            continue
+        print(f"{title} (> {threshold:.0%}):")
+        for entry in entries:
+            print(f"  {entry['metric']:<72} {entry['baseline']:>12.4g} -> {entry['current']:>12.4g} "
+                  f"({entry['change']:+.0%})")
+    if not regressions:
+        print(f"No regressions beyond {threshold:.0%}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bench", action="append", choices=sorted(BENCHMARKS),
+                        help=f"benchmark to run, repeatable (default: {', '.join(DEFAULT_BENCHMARKS)})")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--baseline", help="previous result file to check for regressions")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two existing result files without running anything")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change counted as a regression (default 0.25)")
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = (load(path)["metrics"] for path in args.compare)
+    else:
+        report = run(args.bench or DEFAULT_BENCHMARKS)
+        output = args.output
+        if output is None:
+            os.makedirs(RESULTS_DIR, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(report["meta"]["time"]))
+            output = os.path.join(RESULTS_DIR, f"{stamp}-{report['meta']['commit'] or 'unknown'}.json")
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"{len(report['metrics'])} metrics written to {output}")
+        if not args.baseline:
+            return
+        baseline, current = load(args.baseline)["metrics"], report["metrics"]
+
+    regressions, improvements = compare(baseline, current, args.threshold)
+    print_comparison(regressions, improvements, args.threshold)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,201 @@
-from zeroconf import ServiceInfo, Zeroconf
+import asyncio
+import importlib
+import ipaddress
 import socket
+import time
+
+import psutil
+
+SERVICE_TYPE = "_macmonitor._tcp.local."
+DEFAULT_PORT = 8080
+
+# TXT 中声明的接口能力与响应格式，浏览方无需 HTTP 请求即可判断
+CAPABILITIES = "status,history,stream,ws,delta,metrics,alerts"
+FORMATS = "json,msgpack"
+
+# 负载分档：cpu.usage 每 0.25 一档，0（空闲）~ 3（繁忙）
+LOAD_BUCKETS = 4
+
+# TXT 更新的最小间隔（秒）：每次更新都会触发一轮组播公告
+DEFAULT_TXT_INTERVAL = 60
+# 检查网卡地址变化的间隔（秒）
+DEFAULT_REFRESH_INTERVAL = 30
+
+
+def usable_addresses(if_addrs, if_stats):
+    """从 psutil.net_if_addrs / net_if_stats 中选出可发布的地址 / Pick addresses worth advertising
+
+    已启用网卡上的 IPv4 与 IPv6 地址，排除回环和链路本地地址；都没有时（离线）退回回环地址，
+    不会访问任何外部地址。
+    """
+    addresses, loopback = set(), set()
+    for nic, entries in if_addrs.items():
+        stats = if_stats.get(nic)
+        if stats is not None and not stats.isup:
+            continue
+        for entry in entries:
+            if entry.family not in (socket.AF_INET, socket.AF_INET6):
+                continue
+            try:
+                address = ipaddress.ip_address(entry.address.split("%")[0])
+            except ValueError:
+                continue
+            if address.is_loopback:
+                loopback.add(address)
+            elif not address.is_link_local:
+                addresses.add(address)
+    chosen = addresses or loopback or {ipaddress.ip_address("127.0.0.1")}
+    return [str(address) for address in sorted(chosen, key=lambda address: (address.version, address))]
+
+
+def local_addresses():
+    return usable_addresses(psutil.net_if_addrs(), psutil.net_if_stats())
+
+
+def load_bucket(usage):
+    return min(max(int(usage * LOAD_BUCKETS), 0), LOAD_BUCKETS - 1)
+
 
 class BonjourPublisher:
-    def __init__(self, port):
+    """发布 _macmonitor._tcp 服务 / Publish the _macmonitor._tcp service
+
+    async_start 在 Agent 的事件循环上使用 AsyncZeroconf 发布，不阻塞启动（zeroconf 也在后台任务中才导入）；
+    后台任务定期检查网卡地址，变化时重新注册，并按 txt_interval 限频更新 TXT 中的负载分档。
+    start / stop 为同步版本，只发布一次。
+    """
+
+    def __init__(self, port, txt_interval=DEFAULT_TXT_INTERVAL, refresh_interval=DEFAULT_REFRESH_INTERVAL,
+                 address_source=local_addresses):
         self.port = port
+        self.txt_interval = txt_interval
+        self.refresh_interval = refresh_interval
+        self.address_source = address_source
+        self.hostname = socket.gethostname()
         self.zeroconf = None
         self.info = None
-    
+        self.addresses = []
+        self.load = None
+        self.registrations = 0
+        self._published_load = None
+        self._txt_updated = 0.0
+        self._task = None
+
+    def properties(self):
+        properties = {
+            "version": "1.0",
+            "platform": "python",
+            "api": CAPABILITIES,
+            "fmt": FORMATS,
+        }
+        if self.load is not None:
+            properties["load"] = str(self.load)
+        return properties
+
+    def build_info(self):
+        from zeroconf import ServiceInfo
+
+        self._published_load = self.load
+        self._txt_updated = time.monotonic()
+        return ServiceInfo(
+            SERVICE_TYPE,
+            f"{self.hostname}.{SERVICE_TYPE}",
+            parsed_addresses=self.addresses,
+            port=self.port,
+            properties=self.properties(),
+            server=f"{self.hostname}.local."
+        )
+
+    def ip_version(self):
+        from zeroconf import IPVersion
+
+        return IPVersion.All if any(":" in address for address in self.addresses) else IPVersion.V4Only
+
+    def record(self, snapshot):
+        """采集器回调：只记录负载分档，TXT 由后台任务限频更新"""
+        usage = (snapshot.status.get("cpu") or {}).get("usage")
+        if usage is not None:
+            self.load = load_bucket(usage)
+
     def start(self):
         """启动 Bonjour 服务发布 / Start Bonjour service publishing"""
+        from zeroconf import Zeroconf
+
         try:
-            self.zeroconf = Zeroconf()
-            
-            hostname = socket.gethostname()
-            
-            # 获取本机 IP 地址 / Get local IP address
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            try:
-                s.connect(("8.8.8.8", 80))
-                ip_address = s.getsockname()[0]
-            except Exception:
-                ip_address = "127.0.0.1"
-            finally:
-                s.close()
-            
-            # 注册服务
-            self.info = ServiceInfo(
-                "_macmonitor._tcp.local.",
-                f"{hostname}._macmonitor._tcp.local.",
-                addresses=[socket.inet_aton(ip_address)],
-                port=self.port,
-                properties={
-                    "version": "1.0",
-                    "platform": "python"
-                },
-                server=f"{hostname}.local."
-            )
-            
+            self.addresses = self.address_source()
+            self.zeroconf = Zeroconf(ip_version=self.ip_version())
+            self.info = self.build_info()
             self.zeroconf.register_service(self.info)
-            print(f"✅ Bonjour service published: {hostname} at {ip_address}:{self.port}")
+            self.registrations += 1
+            print(f"✅ Bonjour service published: {self.hostname} at {', '.join(self.addresses)}:{self.port}")
         except Exception as e:
             print(f"❌ Failed to publish Bonjour service: {e}")
-    
+
     def stop(self):
         """停止 Bonjour 服务 / Stop Bonjour service"""
         if self.zeroconf and self.info:
             self.zeroconf.unregister_service(self.info)
             self.zeroconf.close()
             print("Bonjour service stopped")
+
+    async def async_start(self):
+        """在当前事件循环上发布，注册与后续刷新都在后台任务中进行 / Publish without blocking startup"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def async_stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._unregister()
+
+    async def _run(self):
+        try:
+            await self._register()
+        except Exception as e:
+            print(f"❌ Failed to publish Bonjour service: {e}")
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️  Bonjour refresh failed: {e}")
+
+    async def _register(self):
+        # 首次注册时在线程中导入 zeroconf，不占用事件循环
+        zeroconf_asyncio = await asyncio.to_thread(importlib.import_module, "zeroconf.asyncio")
+        self.addresses = self.address_source()
+        self.zeroconf = zeroconf_asyncio.AsyncZeroconf(ip_version=self.ip_version())
+        self.info = self.build_info()
+        try:
+            await (await self.zeroconf.async_register_service(self.info))
+        except Exception:
+            # 注册失败时关闭，下一次 refresh 重新尝试
+            zeroconf, self.zeroconf = self.zeroconf, None
+            await zeroconf.async_close()
+            raise
+        self.registrations += 1
+        print(f"✅ Bonjour service published: {self.hostname} at {', '.join(self.addresses)}:{self.port}")
+
+    async def _unregister(self):
+        if self.zeroconf is None:
+            return
+        zeroconf, self.zeroconf = self.zeroconf, None
+        try:
+            if self.info is not None:
+                await (await zeroconf.async_unregister_service(self.info))
+        finally:
+            await zeroconf.async_close()
+
+    async def refresh(self):
+        """地址变化时重新注册（新建 AsyncZeroconf 以绑定新网卡）；否则按限频更新 TXT / Re-register or update TXT"""
+        if self.zeroconf is None or self.address_source() != self.addresses:
+            await self._unregister()
+            await self._register()
+            return
+        if self.load != self._published_load and time.monotonic() - self._txt_updated >= self.txt_interval:
+            self.info = self.build_info()
+            await (await self.zeroconf.async_update_service(self.info))
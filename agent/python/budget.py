@@ -0,0 +1,131 @@
+import time
+from collections import deque
+
+# 可以被拉长间隔的采集项：开销大或变化慢（进程扫描、传感器、卷容量）
+ADAPTIVE_COLLECTORS = ("processes", "temperature", "disk", "battery")
+
+DEFAULT_WINDOW = 10.0
+MAX_STRETCH = 8
+
+# 开销低于预算的一半时才逐步恢复，避免在预算附近来回切换
+RELAX_RATIO = 0.5
+
+# 使用电池时的拉长倍数；电量低于 LOW_BATTERY 时进一步拉长
+BATTERY_STRETCH = 2
+LOW_BATTERY = 0.2
+LOW_BATTERY_STRETCH = 4
+
+# stats 中保留的最近间隔调整记录数
+HISTORY_SIZE = 20
+
+
+class OverheadBudget:
+    """Agent 开销预算：按窗口测量自身 CPU，超出预算时拉长开销最大的采集项的间隔
+
+    cpu_budget 为占单核的比例（例如 0.005 表示 0.5%），None 表示不限制；
+    battery_saver 为 True 时，未接电源 / 电量低时额外拉长可调整采集项的间隔。
+    每个窗口最多调整一个采集项（翻倍或减半），倍数不超过 max_stretch。
+    """
+
+    def __init__(self, cpu_budget=None, battery_saver=True, window=DEFAULT_WINDOW, max_stretch=MAX_STRETCH,
+                 adaptive=ADAPTIVE_COLLECTORS):
+        self.cpu_budget = cpu_budget
+        self.battery_saver = battery_saver
+        self.window = window
+        self.max_stretch = max_stretch
+        self.adaptive = tuple(adaptive)
+        self.stretch = dict.fromkeys(self.adaptive, 1)
+        self.power_stretch = 1
+        self.on_battery = None
+        self.battery_level = None
+        self.usage = None
+        self.cpu_seconds = {}
+        self.changes = deque(maxlen=HISTORY_SIZE)
+        self._window_started = None
+        self._window_cpu = None
+        self._window_costs = {}
+
+    def factor(self, name):
+        """采集项当前的间隔倍数"""
+        if name not in self.stretch:
+            return 1
+        return max(self.stretch[name], self.power_stretch)
+
+    def charge(self, name, cpu_seconds):
+        """记录一次采集消耗的 CPU 时间（采集线程的 thread_time 差值）"""
+        self.cpu_seconds[name] = self.cpu_seconds.get(name, 0.0) + cpu_seconds
+
+    def due(self, now):
+        if self._window_started is None:
+            return True
+        return now - self._window_started >= self.window
+
+    def update(self, now, process_cpu, battery=None):
+        """窗口结束时调用：now 为单调时钟，process_cpu 为进程累计 CPU 秒数，battery 为电池采集结果"""
+        before = {name: self.factor(name) for name in self.adaptive}
+        if self.battery_saver:
+            self._update_power(battery or {})
+        if self._window_started is not None and self.cpu_budget is not None:
+            elapsed = now - self._window_started
+            if elapsed > 0:
+                self.usage = max(process_cpu - self._window_cpu, 0.0) / elapsed
+                costs = {
+                    name: self.cpu_seconds.get(name, 0.0) - self._window_costs.get(name, 0.0)
+                    for name in self.adaptive
+                }
+                self._adjust(costs)
+        self._window_started = now
+        self._window_cpu = process_cpu
+        self._window_costs = dict(self.cpu_seconds)
+        changed = []
+        for name in self.adaptive:
+            after = self.factor(name)
+            if after != before[name]:
+                change = {"time": time.time(), "collector": name, "from": before[name], "to": after,
+                          "reason": self._reason(name)}
+                self.changes.append(change)
+                changed.append(change)
+        return changed
+
+    def _update_power(self, battery):
+        self.on_battery = None if battery.get("isCharging") is None else not battery["isCharging"]
+        self.battery_level = battery.get("level")
+        if not self.on_battery:
+            self.power_stretch = 1
+        elif self.battery_level is not None and self.battery_level < LOW_BATTERY:
+            self.power_stretch = LOW_BATTERY_STRETCH
+        else:
+            self.power_stretch = BATTERY_STRETCH
+
+    def _adjust(self, costs):
+        if self.usage > self.cpu_budget:
+            # 超出预算：把本窗口内开销最大、还能再拉长的采集项翻倍
+            candidates = [name for name in self.adaptive if costs[name] > 0 and self.stretch[name] < self.max_stretch]
+            if candidates:
+                name = max(candidates, key=costs.get)
+                self.stretch[name] = min(self.stretch[name] * 2, self.max_stretch)
+        elif self.usage < self.cpu_budget * RELAX_RATIO:
+            # 远低于预算：把拉得最长的采集项减半
+            stretched = [name for name in self.adaptive if self.stretch[name] > 1]
+            if stretched:
+                name = max(stretched, key=self.stretch.get)
+                self.stretch[name] = max(self.stretch[name] // 2, 1)
+
+    def _reason(self, name):
+        if self.power_stretch > self.stretch[name]:
+            return "low battery" if self.power_stretch == LOW_BATTERY_STRETCH else "on battery"
+        if self.stretch[name] > 1:
+            return "over budget"
+        return "restored"
+
+    def stats(self):
+        return {
+            "cpuBudget": self.cpu_budget,
+            "usage": round(self.usage, 5) if self.usage is not None else None,
+            "batterySaver": self.battery_saver,
+            "onBattery": self.on_battery,
+            "batteryLevel": self.battery_level,
+            "stretch": {name: self.factor(name) for name in self.adaptive},
+            "cpuSeconds": {name: round(value, 4) for name, value in self.cpu_seconds.items()},
+            "changes": list(self.changes),
+        }
@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import namedtuple
+
+from instrumentation import Timings
+from system_monitor import COLLECTORS, assemble_status
+
+# 一次采样结果，发布后不再修改 / Immutable sample published by the collector
+#   collectors: 本快照包含的采集项集合（None 表示全部）
+#   updated: 本次采样实际运行的采集项（None 表示全部），其余字段沿用上一次的结果
+Snapshot = namedtuple("Snapshot", ["generation", "sampled_at", "status", "collectors", "updated"],
+                      defaults=(None, None))
+
+# 各采集项的默认采样间隔（秒）；比采样周期短的按采样周期运行
+DEFAULT_INTERVALS = {
+    "cpu": 1,
+    "memory": 1,
+    "network": 1,
+    "diskio": 1,
+    "uptime": 1,
+    "temperature": 5,
+    "battery": 10,
+    "processes": 10,
+    "disk": 60,
+}
+
+# /api/status 轮询产生的需求保持多久（秒）
+DEFAULT_DEMAND_TTL = 30
+
+# 调度容差：距上次运行达到间隔的 90% 即视为到期，避免因调度抖动错过一个周期
+INTERVAL_TOLERANCE = 0.9
+
+
+class StatusCollector:
+    """后台采样器：在独立线程中按固定节奏调用 SystemMonitor，发布最新快照
+
+    每个采集项有独立的开关和采样间隔，未到期的采集项沿用上一次的结果。
+    on_demand 为 True 时只运行有人需要的采集项：订阅者通过 acquire/release
+    持有需求，轮询方通过 touch 留下带过期时间的需求；无人需要的采集项完全停止，
+    其字段也不再出现在快照中。
+    """
+
+    def __init__(self, monitor, interval=1.0, intervals=None, disabled=(), on_demand=False,
+                 demand_ttl=DEFAULT_DEMAND_TTL, timings=None, budget=None):
+        self.monitor = monitor
+        # 可选的开销预算：超出预算或使用电池时拉长开销大的采集项的间隔
+        self.budget = budget
+        # 每个采集项、整次采样与快照回调的耗时直方图
+        self.timings = timings if timings is not None else Timings()
+        self.interval = interval
+        self.intervals = dict(DEFAULT_INTERVALS)
+        if intervals:
+            self.intervals.update(intervals)
+        unknown = (set(self.intervals) | set(disabled)) - set(COLLECTORS)
+        if unknown:
+            raise ValueError(f"Unknown collectors: {', '.join(sorted(unknown))}")
+        self.enabled = [name for name in COLLECTORS if name not in disabled]
+        self.on_demand = on_demand
+        self.demand_ttl = demand_ttl
+        self.runs = dict.fromkeys(self.enabled, 0)
+        self._parts = {}
+        self._last_run = {}
+        self._refs = dict.fromkeys(self.enabled, 0)
+        self._leases = {}
+        self._snapshot = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """注册快照回调，每次采样后在采集线程中调用 callback(snapshot)"""
+        self._listeners.append(callback)
+
+    def latest(self):
+        """返回最新快照，尚未采样时返回 None"""
+        return self._snapshot
+
+    def acquire(self, names):
+        """登记对采集项的持续需求（订阅者），需配对调用 release"""
+        with self._lock:
+            for name in names:
+                if name in self._refs:
+                    self._refs[name] += 1
+
+    def release(self, names):
+        with self._lock:
+            for name in names:
+                if self._refs.get(name):
+                    self._refs[name] -= 1
+
+    def touch(self, names, ttl=None):
+        """登记一段时间内的需求（轮询方）：ttl 秒内没有再次 touch 则停止采集"""
+        expires = time.monotonic() + (self.demand_ttl if ttl is None else ttl)
+        with self._lock:
+            for name in names:
+                if name in self._refs and self._leases.get(name, 0) < expires:
+                    self._leases[name] = expires
+
+    def demanded(self):
+        """当前需要运行的采集项"""
+        if not self.on_demand:
+            return set(self.enabled)
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name for name in self.enabled
+                if self._refs[name] > 0 or self._leases.get(name, 0) > now
+            }
+
+    def missing(self, names):
+        """最新快照中缺少的（已启用的）采集项"""
+        wanted = [name for name in self.enabled if name in names]
+        snapshot = self._snapshot
+        if snapshot is None:
+            return wanted
+        if snapshot.collectors is None:
+            return []
+        return [name for name in wanted if name not in snapshot.collectors]
+
+    def sample(self, only=None):
+        """采样一次并发布快照
+
+        默认运行所有到期且有人需要的采集项；only 指定时只立即运行这些采集项，
+        其余字段沿用上一次的结果。
+        """
+        started = time.perf_counter()
+        with self._sample_lock:
+            now = time.monotonic()
+            demanded = self.demanded()
+            if only is not None:
+                due = [name for name in self.enabled if name in only]
+                demanded.update(due)
+            else:
+                due = [
+                    name for name in self.enabled
+                    if name in demanded and (
+                        name not in self._last_run
+                        or now - self._last_run[name] >= self.effective_interval(name) * INTERVAL_TOLERANCE
+                    )
+                ]
+            for name in due:
+                collect_started = time.perf_counter()
+                cpu_started = time.thread_time()
+                self._parts[name] = self.monitor.collect(name)
+                self.timings.observe("collector", name, time.perf_counter() - collect_started)
+                if self.budget is not None:
+                    self.budget.charge(name, time.thread_time() - cpu_started)
+                self._last_run[name] = now
+                self.runs[name] += 1
+            if self.budget is not None and self.budget.due(now):
+                self.budget.update(now, time.process_time(), self._battery_state())
+            # 无人需要的采集项不再出现在快照中，下次需要时重新采集
+            for name in list(self._parts):
+                if name not in demanded:
+                    del self._parts[name]
+                    self._last_run.pop(name, None)
+            status = assemble_status(self._parts)
+            with self._lock:
+                self._generation += 1
+                snapshot = Snapshot(self._generation, time.time(), status, frozenset(self._parts), frozenset(due))
+                self._snapshot = snapshot
+        published = time.perf_counter()
+        self.timings.observe("snapshot", "sample", published - started)
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"⚠️  Snapshot listener failed: {e}")
+        self.timings.observe("snapshot", "listeners", time.perf_counter() - published)
+        return snapshot
+
+    def effective_interval(self, name):
+        """配置的间隔乘以开销预算给出的倍数"""
+        if self.budget is None:
+            return self.intervals[name]
+        return self.intervals[name] * self.budget.factor(name)
+
+    def _battery_state(self):
+        # 电池采集项正在运行时直接复用其结果，否则单独读一次（开销很小，每个预算窗口一次）
+        if not self.budget.battery_saver or "battery" not in self.enabled:
+            return None
+        if "battery" in self._parts:
+            return self._parts["battery"]
+        return self.monitor.collect("battery")
+
+    def stats(self):
+        stats = {
+            "enabled": list(self.enabled),
+            "active": sorted(self.demanded()),
+            "intervals": {name: self.intervals[name] for name in self.enabled},
+            "effectiveIntervals": {name: self.effective_interval(name) for name in self.enabled},
+            "runs": dict(self.runs),
+        }
+        if self.budget is not None:
+            stats["budget"] = self.budget.stats()
+        return stats
+
+    def start(self):
+        """启动后台采样线程"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="status-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台采样线程"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"❌ Failed to sample system status: {e}")
+            # 按固定节奏调度，避免采样耗时造成漂移
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()
+                delay = 0
+            self._stop_event.wait(delay)
@@ -0,0 +1,131 @@
+import importlib.util
+import json
+import os
+
+from history import DEFAULT_METRICS, PINNED_METRICS
+
+# 配置项：(配置文件中的键, 属性名, 默认值, 类型, 环境变量)
+# 优先级：默认值 < 配置文件 < 环境变量 < 命令行
+FIELDS = (
+    ("host", "host", "0.0.0.0", str, "MACMONITOR_HOST"),
+    ("port", "port", 8080, int, "MACMONITOR_PORT"),
+    ("workers", "workers", 1, int, "MACMONITOR_WORKERS"),
+    ("loop", "loop", "auto", str, "MACMONITOR_LOOP"),
+    ("http", "http", "auto", str, "MACMONITOR_HTTP"),
+    ("keepAlive", "keep_alive", 5, int, "MACMONITOR_KEEP_ALIVE"),
+    ("backlog", "backlog", 2048, int, "MACMONITOR_BACKLOG"),
+    ("limitConcurrency", "limit_concurrency", None, int, "MACMONITOR_LIMIT_CONCURRENCY"),
+    ("logLevel", "log_level", "info", str, "MACMONITOR_LOG_LEVEL"),
+    ("dataDir", "data_dir", None, str, "MACMONITOR_DATA_DIR"),
+    # 占单核的百分比，例如 0.5 表示 0.5%
+    ("cpuBudget", "cpu_budget", None, float, "MACMONITOR_CPU_BUDGET"),
+    # 逗号分隔的历史指标，其采集项始终运行；为空表示不常驻任何采集项
+    ("pinnedMetrics", "pinned_metrics", ",".join(PINNED_METRICS), str, "MACMONITOR_PINNED_METRICS"),
+)
+
+CONFIG_ENV = "MACMONITOR_CONFIG"
+
+# 事件循环与 HTTP 解析器：auto 表示已安装 uvloop / httptools 时使用它们
+LOOPS = ("auto", "asyncio", "uvloop")
+HTTP_PARSERS = ("auto", "h11", "httptools")
+LOG_LEVELS = ("critical", "error", "warning", "info", "debug", "trace")
+
+
+class ServerConfig:
+    """Agent 的运行配置：监听地址、工作进程数与 uvicorn 参数，Bonjour 发布使用同一个端口"""
+
+    def __init__(self, **values):
+        for key, attr, default, kind, env in FIELDS:
+            setattr(self, attr, values.get(attr, default))
+        self.validate()
+
+    def validate(self):
+        if not 0 <= self.port <= 65535:
+            raise ValueError(f"Invalid port: {self.port}")
+        if self.workers < 1:
+            raise ValueError("'workers' must be at least 1")
+        if self.keep_alive < 0 or self.backlog < 1:
+            raise ValueError("'keepAlive' must be >= 0 and 'backlog' >= 1")
+        if self.limit_concurrency is not None and self.limit_concurrency < 1:
+            raise ValueError("'limitConcurrency' must be at least 1")
+        if self.cpu_budget is not None and self.cpu_budget <= 0:
+            raise ValueError("'cpuBudget' must be positive")
+        unknown = set(self.pinned()) - set(DEFAULT_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown pinnedMetrics: {', '.join(sorted(unknown))} "
+                             f"(expected some of {', '.join(DEFAULT_METRICS)})")
+        for name, value, choices in (("loop", self.loop, LOOPS), ("http", self.http, HTTP_PARSERS),
+                                     ("logLevel", self.log_level, LOG_LEVELS)):
+            if value not in choices:
+                raise ValueError(f"Unknown {name}: {value} (expected one of {', '.join(choices)})")
+        # 显式指定时要求已安装，避免 uvicorn 启动到一半才失败
+        for module in (self.loop, self.http):
+            if module in ("uvloop", "httptools") and importlib.util.find_spec(module) is None:
+                raise ValueError(f"{module} is not installed")
+
+    def pinned(self):
+        """常驻采集的历史指标"""
+        return tuple(name.strip() for name in self.pinned_metrics.split(",") if name.strip())
+
+    def to_dict(self):
+        return {key: getattr(self, attr) for key, attr, *_ in FIELDS}
+
+    def uvicorn_options(self):
+        """uvicorn.Config / uvicorn.run 的参数"""
+        return {
+            "host": self.host,
+            "port": self.port,
+            "workers": self.workers,
+            "loop": self.loop,
+            "http": self.http,
+            "timeout_keep_alive": self.keep_alive,
+            "backlog": self.backlog,
+            "limit_concurrency": self.limit_concurrency,
+            "log_level": self.log_level,
+        }
+
+
+def convert(key, kind, value):
+    if value is None or isinstance(value, kind) and not isinstance(value, bool):
+        return value
+    if kind is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid value for '{key}': {value!r}")
+
+
+def add_arguments(parser):
+    """在 argparse 中加入配置文件与各配置项的命令行参数（未指定时为 None，不覆盖其他来源）"""
+    parser.add_argument("--config", metavar="FILE", help=f"JSON 配置文件（也可通过 {CONFIG_ENV} 指定）")
+    for key, attr, default, kind, env in FIELDS:
+        flag = "--" + attr.replace("_", "-")
+        parser.add_argument(flag, dest=attr, type=kind, default=None, help=f"{key}（环境变量 {env}，默认 {default}）")
+
+
+def load_config(args=None, environ=None):
+    """按 默认值 < 配置文件 < 环境变量 < 命令行 合并配置，无效配置抛出 ValueError"""
+    environ = os.environ if environ is None else environ
+    values = {}
+    path = getattr(args, "config", None) or environ.get(CONFIG_ENV)
+    if path:
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path}: expected a JSON object")
+        known = {key: (attr, kind) for key, attr, default, kind, env in FIELDS}
+        unknown = set(data) - set(known)
+        if unknown:
+            raise ValueError(f"Unknown config keys: {', '.join(sorted(unknown))}")
+        for key, value in data.items():
+            attr, kind = known[key]
+            values[attr] = convert(key, kind, value)
+    for key, attr, default, kind, env in FIELDS:
+        if environ.get(env):
+            values[attr] = convert(env, kind, environ[env])
+        if getattr(args, attr, None) is not None:
+            values[attr] = getattr(args, attr)
+    return ServerConfig(**values)
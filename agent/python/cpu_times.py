@@ -0,0 +1,68 @@
+import numpy as np
+import psutil
+
+# 对外输出的 CPU 时间拆分；平台不提供的字段输出 None
+SPLITS = ("user", "system", "idle", "iowait", "steal")
+
+# Linux 上 guest / guest_nice 已计入 user / nice，求总时间时需要排除
+GUEST_FIELDS = ("guest", "guest_nice")
+IDLE_FIELDS = ("idle", "iowait")
+
+
+class CpuTimes:
+    """按核 CPU 使用率与时间拆分
+
+    每次 update 只调用一次 psutil.cpu_times(percpu=True)，得到 (核数 × 字段数) 矩阵，
+    与上一次读数相减后用数组运算得到每个核的使用率和整体的时间占比。
+    """
+
+    def __init__(self):
+        self.fields = psutil.cpu_times(percpu=False)._fields
+        self._total_mask = np.array([field not in GUEST_FIELDS for field in self.fields])
+        self._idle_mask = np.array([field in IDLE_FIELDS for field in self.fields])
+        self._split_index = {field: self.fields.index(field) for field in SPLITS if field in self.fields}
+        self._previous = None
+        self.last = None
+
+    def read(self):
+        return np.array(psutil.cpu_times(percpu=True), dtype=np.float64)
+
+    def update(self, times=None):
+        """读取一次并返回距上次 update 的统计；首次调用（或核数变化）时只记录基线，返回 None"""
+        current = self.read() if times is None else np.asarray(times, dtype=np.float64)
+        previous, self._previous = self._previous, current
+        if previous is None or previous.shape != current.shape:
+            return None
+
+        # 计数器回绕或重置时按 0 处理
+        delta = np.clip(current - previous, 0, None)
+        total = delta[:, self._total_mask].sum(axis=1)
+        busy = total - delta[:, self._idle_mask].sum(axis=1)
+        per_core = np.divide(busy, total, out=np.zeros_like(busy), where=total > 0)
+
+        overall = total.sum()
+        split_totals = delta.sum(axis=0)
+        splits = {
+            field: (float(split_totals[self._split_index[field]] / overall) if overall > 0 else 0.0)
+            if field in self._split_index else None
+            for field in SPLITS
+        }
+        self.last = {
+            "usage": float(busy.sum() / overall) if overall > 0 else 0.0,
+            "perCore": per_core.round(4).tolist(),
+            "times": splits,
+        }
+        return self.last
+
+    def sample(self, times=None):
+        """与 update 相同，但总有结果：重新记录基线时沿用上一次的统计（尚无统计时为全零），下次采样恢复"""
+        result = self.update(times)
+        if result is not None:
+            return result
+        if self.last is not None:
+            return self.last
+        return {
+            "usage": 0.0,
+            "perCore": [0.0] * len(self._previous),
+            "times": {field: 0.0 if field in self._split_index else None for field in SPLITS},
+        }
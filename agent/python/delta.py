@@ -0,0 +1,154 @@
+import fnmatch
+from collections import OrderedDict
+
+# 默认量化阈值：变化小于阈值的数值不会出现在增量帧中（支持 fnmatch 通配符）
+DEFAULT_THRESHOLDS = {
+    "cpu.usage": 0.005,
+    "cpu.frequency": 0.05,
+    "cpu.temperature": 0.5,
+    "temperature": 0.5,
+    "memory.used": 1 << 20,
+    "memory.free": 1 << 20,
+    "memory.pressure": 0.001,
+    "disk.used": 1 << 20,
+    "disk.free": 1 << 20,
+    "uptime": 60,
+    "batteryLevel": 0.01,
+}
+
+
+def flatten(status, prefix=""):
+    """把嵌套字典展开为 {点分路径: 值}；列表等非字典值视为叶子"""
+    flat = {}
+    for key, value in status.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flat.update(flatten(value, path + "."))
+        else:
+            flat[path] = value
+    return flat
+
+
+def unflatten(flat):
+    """flatten 的逆操作"""
+    nested = {}
+    for path, value in flat.items():
+        node = nested
+        keys = path.split(".")
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = value
+    return nested
+
+
+def apply_delta(state, frame):
+    """客户端侧参考实现：把关键帧/增量帧应用到展开后的状态上"""
+    if frame["type"] == "keyframe":
+        return flatten(frame["data"])
+    state = dict(state)
+    for path in frame.get("unset", []):
+        state.pop(path, None)
+    state.update(frame.get("set", {}))
+    return state
+
+
+def in_fields(path, fields):
+    return not fields or path.split(".", 1)[0] in fields
+
+
+class DeltaEncoder:
+    """增量编码器：维护客户端应持有的参考状态，每份快照只计算一次相对上一帧的变化
+
+    所有订阅者共享同一串帧（seq 为快照 generation）。跳过若干帧的订阅者会收到
+    这些帧合并后的增量；seq 太旧或未知时返回关键帧。
+    """
+
+    def __init__(self, thresholds=None, history=64):
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        if thresholds:
+            self.thresholds.update(thresholds)
+        self.history = history
+        self.state = {}
+        self.seq = None
+        self._frames = OrderedDict()
+        self._threshold_cache = {}
+
+    def threshold(self, path):
+        """查找路径对应的量化阈值，结果按路径缓存"""
+        value = self._threshold_cache.get(path)
+        if value is None:
+            value = self.thresholds.get(path)
+            if value is None:
+                value = 0
+                for pattern, threshold in self.thresholds.items():
+                    if fnmatch.fnmatchcase(path, pattern):
+                        value = threshold
+                        break
+            self._threshold_cache[path] = value
+        return value
+
+    def update(self, seq, payload):
+        """输入一份完整状态，更新参考状态并记录增量帧"""
+        if self.seq is not None and seq <= self.seq:
+            return
+        flat = flatten(payload)
+        changed = {}
+        for path, value in flat.items():
+            if path not in self.state:
+                changed[path] = value
+                continue
+            old = self.state[path]
+            if value == old:
+                continue
+            if (
+                isinstance(value, (int, float)) and isinstance(old, (int, float))
+                and not isinstance(value, bool) and not isinstance(old, bool)
+                and abs(value - old) < self.threshold(path)
+            ):
+                continue
+            changed[path] = value
+        removed = [path for path in self.state if path not in flat]
+
+        self.state.update(changed)
+        for path in removed:
+            del self.state[path]
+        self._frames[seq] = (self.seq, changed, removed)
+        while len(self._frames) > self.history:
+            self._frames.popitem(last=False)
+        self.seq = seq
+
+    def keyframe(self, fields=None):
+        data = {path: value for path, value in self.state.items() if in_fields(path, fields)}
+        return {"type": "keyframe", "seq": self.seq, "data": unflatten(data)}
+
+    def frame_since(self, base, fields=None):
+        """返回让持有 base 帧状态的客户端追上当前状态的帧；无法增量时返回关键帧"""
+        if base is None or base not in self._frames and base != self._oldest_base():
+            return self.keyframe(fields)
+        if base == self.seq:
+            return {"type": "delta", "seq": self.seq, "base": base, "set": {}, "unset": []}
+
+        changed = {}
+        removed = set()
+        for seq, (previous, frame_changed, frame_removed) in self._frames.items():
+            if seq <= base:
+                continue
+            for path in frame_removed:
+                changed.pop(path, None)
+                removed.add(path)
+            for path, value in frame_changed.items():
+                removed.discard(path)
+                changed[path] = value
+        return {
+            "type": "delta",
+            "seq": self.seq,
+            "base": base,
+            "set": {path: value for path, value in changed.items() if in_fields(path, fields)},
+            "unset": sorted(path for path in removed if in_fields(path, fields)),
+        }
+
+    def _oldest_base(self):
+        # 最早保存的帧所基于的 seq 也可以作为增量起点
+        if not self._frames:
+            return None
+        return next(iter(self._frames.values()))[0]
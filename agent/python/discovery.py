@@ -0,0 +1,228 @@
+import asyncio
+import importlib
+import time
+
+from bonjour_service import DEFAULT_PORT, local_addresses
+
+# 多久没有被 Bonjour 公告或健康检查确认过的 Agent 从缓存中移除（秒）
+DEFAULT_TTL = 300
+DEFAULT_PROBE_INTERVAL = 30.0
+DEFAULT_PROBE_TIMEOUT = 1.0
+# 同时进行的 /health 探测数上限
+DEFAULT_PROBE_CONCURRENCY = 32
+
+
+class DiscoveredPeer:
+    """发现服务缓存中的一个 Agent"""
+
+    __slots__ = ("host", "port", "name", "source", "txt", "added", "announced", "last_seen",
+                 "last_probe", "latency", "healthy", "failures", "error")
+
+    def __init__(self, host, port, name=None, source="mdns", txt=None):
+        self.host = host
+        self.port = port
+        self.name = name or host
+        self.source = source
+        self.txt = txt or {}
+        self.added = self.announced = time.time()
+        # 最近一次被确认存在（Bonjour 公告或健康检查成功）的时间
+        self.last_seen = self.added
+        self.last_probe = None
+        self.latency = None
+        self.healthy = None
+        self.failures = 0
+        self.error = None
+
+    @property
+    def id(self):
+        return f"{self.host}:{self.port}"
+
+    @property
+    def url(self):
+        address = f"[{self.host}]" if ":" in self.host else self.host
+        return f"http://{address}:{self.port}"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "host": self.host,
+            "port": self.port,
+            "url": self.url,
+            "source": self.source,
+            "txt": self.txt,
+            "healthy": self.healthy,
+            "latency": self.latency,
+            "lastSeen": self.last_seen,
+            "lastProbe": self.last_probe,
+            "failures": self.failures,
+            "error": self.error,
+        }
+
+
+def rank(peer):
+    """排序：健康的在前，其次按 TXT 负载分档、延迟"""
+    load = peer.txt.get("load")
+    return (
+        peer.healthy is not True,
+        int(load) if load and load.isdigit() else 99,
+        peer.latency if peer.latency is not None else float("inf"),
+        peer.name,
+    )
+
+
+class DiscoveryService:
+    """Agent 内的局域网发现服务：持续浏览 _macmonitor._tcp，维护带 TTL 的 Agent 缓存
+
+    后台任务每 probe_interval 秒并发（最多 concurrency 个）探测各 Agent 的 /health，
+    记录延迟与健康状态；超过 ttl 秒未被公告或探测确认的 Agent 被移除。
+    Dashboard 通过一次 /api/peers 请求拿到整个列表，无需在浏览器里逐个探测地址。
+    zeroconf 与 httpx 都在后台任务中才导入与创建，不拖慢 Agent 启动。
+    """
+
+    def __init__(self, port=None, ttl=DEFAULT_TTL, probe_interval=DEFAULT_PROBE_INTERVAL,
+                 timeout=DEFAULT_PROBE_TIMEOUT, concurrency=DEFAULT_PROBE_CONCURRENCY, browse=True, client=None):
+        # 本 Agent 的端口，用于在列表中标出自身
+        self.port = port
+        self.ttl = ttl
+        self.probe_interval = probe_interval
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.peers = {}
+        self.browse = browse
+        self.browser = None
+        self.rounds = 0
+        self.probed_at = None
+        self.expired = 0
+        # 传入 client 时使用它（测试中使用 MockTransport）
+        self.client = client
+        self._own_client = client is None
+        self._task = None
+
+    def add_peer(self, host, port=DEFAULT_PORT, name=None, source="mdns", txt=None):
+        """FleetBrowser 回调（也可用于静态加入）：新增或刷新一个 Agent"""
+        peer = self.peers.get(f"{host}:{port}")
+        if peer is None:
+            peer = DiscoveredPeer(host, port, name, source, txt)
+            self.peers[peer.id] = peer
+            return peer
+        peer.announced = peer.last_seen = time.time()
+        if name:
+            peer.name = name
+        if txt:
+            peer.txt = txt
+        return peer
+
+    def remove_peer(self, peer_id):
+        """FleetBrowser 回调：服务注销时移除"""
+        return self.peers.pop(peer_id, None)
+
+    async def probe_peer(self, peer):
+        import httpx
+
+        started = time.monotonic()
+        peer.last_probe = time.time()
+        try:
+            response = await self.client.get(peer.url + "/health", timeout=self.timeout)
+            if response.status_code != 200:
+                raise httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+        except httpx.HTTPError as e:
+            peer.healthy = False
+            peer.failures += 1
+            peer.error = str(e) or type(e).__name__
+            return False
+        peer.latency = time.monotonic() - started
+        peer.healthy = True
+        peer.failures = 0
+        peer.error = None
+        peer.last_seen = peer.last_probe
+        return True
+
+    async def probe_once(self):
+        """并发探测所有缓存中的 Agent，然后移除过期的；返回健康的数量"""
+        if self.client is None:
+            import httpx
+
+            limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=0)
+            self.client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def guarded(peer):
+            async with semaphore:
+                return await self.probe_peer(peer)
+
+        results = await asyncio.gather(*(guarded(peer) for peer in list(self.peers.values())))
+        self.expire()
+        self.rounds += 1
+        self.probed_at = time.time()
+        return sum(results)
+
+    def expire(self, now=None):
+        cutoff = (now if now is not None else time.time()) - self.ttl
+        for peer_id, peer in list(self.peers.items()):
+            if peer.last_seen < cutoff:
+                del self.peers[peer_id]
+                self.expired += 1
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.browser is not None:
+            await self.browser.stop()
+        if self._own_client and self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def start_browser(self):
+        # fleet 会连带导入 httpx 与 zeroconf（约 200ms），在线程中导入，不在 Agent 开始服务前占住事件循环
+        fleet = await asyncio.to_thread(importlib.import_module, "fleet")
+        browser = fleet.FleetBrowser(self)
+        try:
+            await browser.start()
+        except Exception as e:
+            print(f"⚠️  Bonjour browsing unavailable: {e}")
+            return
+        self.browser = browser
+
+    async def _run(self):
+        if self.browse:
+            await self.start_browser()
+        while True:
+            started = time.monotonic()
+            try:
+                await self.probe_once()
+            except Exception as e:
+                print(f"⚠️  Peer probing failed: {e}")
+            await asyncio.sleep(max(0.0, self.probe_interval - (time.monotonic() - started)))
+
+    def to_dict(self):
+        own = set(local_addresses()) | {"127.0.0.1", "::1", "localhost"} if self.port is not None else set()
+        peers = []
+        for peer in sorted(self.peers.values(), key=rank):
+            entry = peer.to_dict()
+            entry["self"] = peer.port == self.port and peer.host in own
+            peers.append(entry)
+        return {
+            "browsing": self.browser is not None,
+            "ttl": self.ttl,
+            "probedAt": self.probed_at,
+            "rounds": self.rounds,
+            "peers": peers,
+        }
+
+    def stats(self):
+        return {
+            "peers": len(self.peers),
+            "healthy": sum(1 for peer in self.peers.values() if peer.healthy),
+            "rounds": self.rounds,
+            "expired": self.expired,
+        }
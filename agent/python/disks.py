@@ -0,0 +1,122 @@
+import os
+
+import psutil
+
+from rates import CounterRate
+
+# 不统计容量的文件系统（伪文件系统、只读镜像等）
+IGNORED_FSTYPES = {"squashfs", "devfs", "autofs", "nullfs", "tmpfs", "devtmpfs"}
+
+# 磁盘 IO 计数器字段 -> 输出字段
+IO_FIELDS = (
+    ("read_bytes", "readBytes"),
+    ("write_bytes", "writeBytes"),
+    ("read_count", "readOps"),
+    ("write_count", "writeOps"),
+    ("read_time", "readTime"),
+    ("write_time", "writeTime"),
+)
+
+
+def mount_signature():
+    """挂载表的廉价指纹：变化时才需要重新枚举分区，None 表示无法判断"""
+    try:
+        # Linux：挂载表内容本身；macOS：挂载 / 卸载外接卷会修改 /Volumes
+        if os.path.exists("/proc/self/mounts"):
+            with open("/proc/self/mounts", "rb") as f:
+                return f.read()
+        if os.path.isdir("/Volumes"):
+            return os.stat("/Volumes").st_mtime_ns
+    except OSError:
+        pass
+    return None
+
+
+def is_whole_disk(name):
+    # Linux 上 /proc/diskstats 同时包含整盘和分区，/sys/block 下只有整盘
+    if os.path.isdir("/sys/block"):
+        return os.path.exists(f"/sys/block/{name}")
+    return True
+
+
+class DiskMonitor:
+    """所有挂载点的容量与磁盘 IO 速率
+
+    分区列表只在挂载表变化时重新枚举；容量由慢速的 disk 采集项读取，
+    IO 速率由快速的 diskio 采集项根据 disk_io_counters(perdisk=True) 的差值计算。
+    """
+
+    def __init__(self, io_window=1.0):
+        self.partitions = []
+        self.enumerations = 0
+        self._signature = None
+        self.io_rates = CounterRate(window=io_window)
+
+    def refresh_partitions(self):
+        """挂载表变化时重新枚举分区，返回当前分区列表"""
+        signature = mount_signature()
+        if signature is None or signature != self._signature or not self.partitions:
+            seen = set()
+            partitions = []
+            for partition in psutil.disk_partitions(all=False):
+                # 同一设备的多个挂载点（bind mount 等）只统计一次
+                if partition.fstype in IGNORED_FSTYPES or partition.device in seen:
+                    continue
+                seen.add(partition.device)
+                partitions.append(partition)
+            self.partitions = partitions
+            self._signature = signature
+            self.enumerations += 1
+        return self.partitions
+
+    def get_volumes(self):
+        volumes = []
+        for partition in self.refresh_partitions():
+            try:
+                usage = psutil.disk_usage(partition.mountpoint)
+            except OSError:
+                continue
+            volumes.append({
+                "mountpoint": partition.mountpoint,
+                "device": partition.device,
+                "fstype": partition.fstype,
+                "total": usage.total,
+                "used": usage.used,
+                "free": usage.free
+            })
+        return volumes
+
+    def get_io(self):
+        """各磁盘读写速率（字节/秒）、IOPS 与平均服务时间（毫秒）"""
+        perdisk = psutil.disk_io_counters(perdisk=True) or {}
+        counters = {}
+        for disk, io in perdisk.items():
+            for field, name in IO_FIELDS:
+                counters[(disk, name)] = getattr(io, field)
+        rates = self.io_rates.update(counters)
+
+        disks = {}
+        totals = {name: 0.0 for _, name in IO_FIELDS}
+        for disk in perdisk:
+            values = {name: rates.get((disk, name), 0.0) for _, name in IO_FIELDS}
+            # 总量只累加整盘，避免与分区重复计算
+            if is_whole_disk(disk):
+                for name, value in values.items():
+                    totals[name] += value
+            disks[disk] = io_summary(values)
+        summary = io_summary(totals)
+        summary["disks"] = disks
+        return summary
+
+
+def io_summary(values):
+    # 同一窗口内的速率之比等于增量之比：服务时间 = Δ读写耗时 / Δ读写次数
+    ops = values["readOps"] + values["writeOps"]
+    busy = values["readTime"] + values["writeTime"]
+    return {
+        "readBytes": int(values["readBytes"]),
+        "writeBytes": int(values["writeBytes"]),
+        "readOps": round(values["readOps"], 2),
+        "writeOps": round(values["writeOps"], 2),
+        "serviceTime": round(busy / ops, 3) if ops else 0.0
+    }
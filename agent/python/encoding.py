@@ -0,0 +1,127 @@
+import json
+import math
+import struct
+
+import msgpack
+
+from prometheus import OPENMETRICS, PROMETHEUS_TEXT, encode_openmetrics, encode_prometheus
+
+# 支持的响应格式 / Supported wire formats
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+COLUMNAR = "application/x-macmonitor-columnar"
+
+# 兼容常见的别名
+ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+# 列式格式：定长文件头 + float64 时间戳列 + 每个序列一列 float64
+#   header: magic, version, 序列数, 点数, 保留, from, to, step
+COLUMNAR_MAGIC = b"MMC1"
+COLUMNAR_VERSION = 1
+COLUMNAR_HEADER = struct.Struct("<4sHHII3d")
+NAN = float("nan")
+
+
+def parse_qvalues(header):
+    """把 Accept / Accept-Encoding 头解析为 [(小写的值, q)]，无效的 q 值按 0 处理"""
+    result = []
+    for part in header.split(","):
+        pieces = part.strip().split(";")
+        q = 1.0
+        for param in pieces[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        result.append((pieces[0].strip().lower(), q))
+    return result
+
+
+def negotiate(accept, offered):
+    """按 Accept 头（含 q 值）从 offered 中选择响应格式；没有可接受的格式时返回 None"""
+    if not accept:
+        return offered[0]
+    best, best_q = None, 0.0
+    for media_type, q in parse_qvalues(accept):
+        media_type = ALIASES.get(media_type, media_type)
+        if q <= best_q:
+            continue
+        if media_type in ("*/*", "application/*"):
+            candidate = offered[0]
+        elif media_type in offered:
+            candidate = media_type
+        else:
+            continue
+        best, best_q = candidate, q
+    return best
+
+
+def encode_json(payload):
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def encode_msgpack(payload):
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def encode_columnar(result):
+    """把 /api/history 的查询结果编码为定长列式二进制格式"""
+    timestamps = result["timestamps"]
+    columns = []
+    for metric, aggregates in result["series"].items():
+        for aggregate, values in aggregates.items():
+            columns.append((f"{metric}:{aggregate}", values))
+
+    count = len(timestamps)
+    parts = [
+        COLUMNAR_HEADER.pack(
+            COLUMNAR_MAGIC, COLUMNAR_VERSION, len(columns), count, 0,
+            result["from"], result["to"], result["step"]
+        ),
+        struct.pack(f"<{count}d", *timestamps),
+    ]
+    for name, values in columns:
+        encoded = name.encode()
+        # 名称按 8 字节对齐，保证后面的 float64 列可以直接映射为数组
+        padding = -(2 + len(encoded)) % 8
+        parts.append(struct.pack("<H", len(encoded)) + encoded + b"\0" * padding)
+        parts.append(struct.pack(f"<{count}d", *(NAN if v is None else v for v in values)))
+    return b"".join(parts)
+
+
+def decode_columnar(data):
+    """encode_columnar 的逆操作（供客户端和测试使用）；NaN 还原为 None"""
+    magic, version, n_columns, count, _, start, end, step = COLUMNAR_HEADER.unpack_from(data)
+    if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+        raise ValueError("Not a columnar payload")
+    offset = COLUMNAR_HEADER.size
+    timestamps = list(struct.unpack_from(f"<{count}d", data, offset))
+    offset += count * 8
+    series = {}
+    for _ in range(n_columns):
+        (length,) = struct.unpack_from("<H", data, offset)
+        name = data[offset + 2:offset + 2 + length].decode()
+        offset += 2 + length + (-(2 + length) % 8)
+        values = struct.unpack_from(f"<{count}d", data, offset)
+        offset += count * 8
+        metric, _, aggregate = name.rpartition(":")
+        series.setdefault(metric, {})[aggregate] = [None if math.isnan(v) else v for v in values]
+    return {"from": start, "to": end, "step": step, "timestamps": timestamps, "series": series}
+
+
+ENCODERS = {
+    JSON: encode_json,
+    MSGPACK: encode_msgpack,
+    COLUMNAR: encode_columnar,
+    PROMETHEUS_TEXT: encode_prometheus,
+    OPENMETRICS: encode_openmetrics,
+}
+
+
+def encode(payload, media_type):
+    return ENCODERS[media_type](payload)
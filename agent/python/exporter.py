@@ -0,0 +1,401 @@
+import gzip
+import json
+import os
+import platform
+import struct
+import threading
+import time
+from collections import deque
+
+import httpx
+
+# 推送格式：NDJSON（每行一份快照）或 InfluxDB line protocol
+FORMATS = ("json", "line")
+CONTENT_TYPES = {"json": "application/x-ndjson", "line": "text/plain; charset=utf-8"}
+
+DEFAULT_BATCH_SIZE = 30
+DEFAULT_FLUSH_INTERVAL = 10.0
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_DELAY = 1.0
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+# 这些状态码表示暂时不可用，其余 4xx 说明批次本身被拒绝，重试也没有意义
+RETRYABLE_STATUS = (408, 425, 429)
+
+# 积压文件格式 / Spool file layout
+#
+#   [0, 16)     文件头：magic + 队首偏移（uint64）
+#   [16, ...)   记录：uint32 长度 + 已压缩的批次
+#
+# 重放成功后只前移队首偏移；文件达到大小上限时才整理（丢弃已重放的部分）。
+SPOOL_MAGIC = b"MMSPOOL1"
+SPOOL_HEADER = struct.Struct("<8sQ")
+RECORD_HEADER = struct.Struct("<I")
+
+# line protocol 中不作为字段输出的键：按网卡 / 磁盘 / 卷 / 核的数值单独成行
+NESTED_KEYS = ("interfaces", "disks", "volumes", "perCore")
+
+
+def escape_tag(value):
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+
+def line_fields(values, prefix=""):
+    """把嵌套字典展开为 line protocol 字段（cpu.usage -> cpu_usage=0.42）"""
+    fields = []
+    for key, value in values.items():
+        if key in NESTED_KEYS or value is None:
+            continue
+        name = prefix + key
+        if isinstance(value, dict):
+            fields.extend(line_fields(value, name + "_"))
+        elif isinstance(value, bool):
+            fields.append(f"{escape_tag(name)}={'true' if value else 'false'}")
+        elif isinstance(value, int):
+            fields.append(f"{escape_tag(name)}={value}i")
+        elif isinstance(value, float):
+            fields.append(f"{escape_tag(name)}={value!r}")
+    return fields
+
+
+def encode_line(host, timestamp, status):
+    """一份快照 -> 若干行 line protocol（整机一行，每个网卡 / 磁盘 / 卷 / 核各一行）"""
+    tags = f"host={escape_tag(host)}"
+    stamp = int(timestamp * 1e9)
+    lines = []
+    fields = line_fields({key: value for key, value in status.items() if key not in ("timestamp", "sampledAt")})
+    if fields:
+        lines.append(f"macmonitor,{tags} {','.join(fields)} {stamp}")
+    for nic, io in sorted(((status.get("network") or {}).get("interfaces") or {}).items()):
+        lines.append(f"macmonitor_net,{tags},interface={escape_tag(nic)} {','.join(line_fields(io))} {stamp}")
+    for disk, io in sorted(((status.get("diskIO") or {}).get("disks") or {}).items()):
+        lines.append(f"macmonitor_disk,{tags},disk={escape_tag(disk)} {','.join(line_fields(io))} {stamp}")
+    for volume in (status.get("disk") or {}).get("volumes") or ():
+        fields = line_fields(volume)
+        if fields:
+            mountpoint = escape_tag(volume.get("mountpoint"))
+            lines.append(f"macmonitor_volume,{tags},mountpoint={mountpoint} {','.join(fields)} {stamp}")
+    for core, usage in enumerate((status.get("cpu") or {}).get("perCore") or ()):
+        lines.append(f"macmonitor_core,{tags},core={core} usage={float(usage)!r} {stamp}")
+    return lines
+
+
+def encode_batch(entries, fmt, host):
+    """[(sampled_at, status), ...] -> 未压缩的请求体"""
+    if fmt == "line":
+        lines = [line for timestamp, status in entries for line in encode_line(host, timestamp, status)]
+    else:
+        lines = [json.dumps(dict(status, host=host, sampledAt=timestamp), separators=(",", ":"))
+                 for timestamp, status in entries]
+    return ("\n".join(lines) + "\n").encode()
+
+
+class MemorySpool:
+    """未配置积压文件时的内存积压队列，总大小同样受 max_bytes 限制"""
+
+    def __init__(self, max_bytes=DEFAULT_SPOOL_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._records = deque()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def append(self, body):
+        self._records.append(body)
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes and self._records:
+            self._bytes -= len(self._records.popleft())
+            self.dropped += 1
+
+    def peek(self):
+        return self._records[0] if self._records else None
+
+    def pop(self):
+        self._bytes -= len(self._records.popleft())
+
+    def close(self):
+        pass
+
+
+class FileSpool:
+    """磁盘积压队列：推送失败的批次按顺序追加，恢复后按顺序重放
+
+    文件大小（含已重放但尚未整理的部分）不超过 max_bytes，超出时丢弃最旧的批次。
+    Agent 重启后从文件头记录的队首继续重放；写入中断留下的残缺记录在打开时截掉。
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_SPOOL_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._offsets = deque()
+        self._file = None
+        self._head = SPOOL_HEADER.size
+        self._end = SPOOL_HEADER.size
+        self._open()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        mode = "r+b" if os.path.exists(self.path) else "w+b"
+        self._file = open(self.path, mode)
+        header = self._file.read(SPOOL_HEADER.size)
+        if len(header) == SPOOL_HEADER.size and header[:8] == SPOOL_MAGIC:
+            self._head = max(SPOOL_HEADER.size, SPOOL_HEADER.unpack(header)[1])
+        else:
+            if header:
+                print(f"⚠️  Discarding unreadable export spool {self.path}")
+            self._head = SPOOL_HEADER.size
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.write(SPOOL_HEADER.pack(SPOOL_MAGIC, self._head))
+        self._scan()
+
+    def _scan(self):
+        size = os.fstat(self._file.fileno()).st_size
+        offset = self._head
+        while offset + RECORD_HEADER.size <= size:
+            self._file.seek(offset)
+            (length,) = RECORD_HEADER.unpack(self._file.read(RECORD_HEADER.size))
+            if offset + RECORD_HEADER.size + length > size:
+                break
+            self._offsets.append((offset, length))
+            offset += RECORD_HEADER.size + length
+        if offset != size:
+            self._file.truncate(offset)
+        self._end = offset
+
+    def __len__(self):
+        return len(self._offsets)
+
+    @property
+    def bytes(self):
+        return self._end - self._head
+
+    def append(self, body):
+        size = RECORD_HEADER.size + len(body)
+        if SPOOL_HEADER.size + size > self.max_bytes:
+            # 单个批次就超过上限，无法保存
+            self.dropped += 1
+            return
+        while self._offsets and self.bytes + size > self.max_bytes - SPOOL_HEADER.size:
+            self.pop()
+            self.dropped += 1
+        if self._end + size > self.max_bytes:
+            self._compact()
+        self._file.seek(self._end)
+        self._file.write(RECORD_HEADER.pack(len(body)) + body)
+        self._file.flush()
+        self._offsets.append((self._end, len(body)))
+        self._end += size
+
+    def peek(self):
+        if not self._offsets:
+            return None
+        offset, length = self._offsets[0]
+        self._file.seek(offset + RECORD_HEADER.size)
+        return self._file.read(length)
+
+    def pop(self):
+        offset, length = self._offsets.popleft()
+        self._head = offset + RECORD_HEADER.size + length
+        if not self._offsets:
+            # 积压已清空：直接截断
+            self._head = self._end = SPOOL_HEADER.size
+            self._file.truncate(self._end)
+        self._write_head()
+
+    def _write_head(self):
+        self._file.seek(0)
+        self._file.write(SPOOL_HEADER.pack(SPOOL_MAGIC, self._head))
+        self._file.flush()
+
+    def _compact(self):
+        """把未重放的记录移到文件头之后，释放已重放部分占用的空间"""
+        if self._head == SPOOL_HEADER.size:
+            return
+        self._file.seek(self._head)
+        live = self._file.read(self._end - self._head)
+        temp = self.path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(SPOOL_HEADER.pack(SPOOL_MAGIC, SPOOL_HEADER.size))
+            f.write(live)
+        self._file.close()
+        os.replace(temp, self.path)
+        self._file = open(self.path, "r+b")
+        shift = self._head - SPOOL_HEADER.size
+        self._offsets = deque((offset - shift, length) for offset, length in self._offsets)
+        self._head = SPOOL_HEADER.size
+        self._end -= shift
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class PushExporter:
+    """推送导出：把快照攒成批次，压缩后 POST 到 HTTP / line protocol 接收端
+
+    采集器回调只把快照放进内存队列；后台线程在批次攒满或 flush_interval 到期时发送。
+    每个批次最多尝试 retries 次（指数退避），仍失败则写入积压队列；
+    积压中的批次总是先于新批次按顺序重放，保证接收端看到的数据有序。
+    """
+
+    def __init__(self, url, format="json", batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 retries=DEFAULT_RETRIES, retry_delay=DEFAULT_RETRY_DELAY, timeout=DEFAULT_TIMEOUT,
+                 spool_path=None, spool_max_bytes=DEFAULT_SPOOL_MAX_BYTES, compress=True,
+                 host=None, headers=None, client=None):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown export format: {format}")
+        self.url = url
+        self.format = format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = max(1, retries)
+        self.retry_delay = retry_delay
+        self.compress = compress
+        self.host = host or platform.node()
+        self.headers = {"Content-Type": CONTENT_TYPES[format]}
+        if compress:
+            self.headers["Content-Encoding"] = "gzip"
+        self.headers.update(headers or {})
+        self.client = client or httpx.Client(timeout=timeout)
+        self.spool = FileSpool(spool_path, spool_max_bytes) if spool_path else MemorySpool(spool_max_bytes)
+        self.sent = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_error = None
+        self.last_success = None
+        # 内存中最多保留一个积压上限的快照数，接收端长时间不可用时不会无限增长
+        self._pending = deque(maxlen=max(batch_size, 1) * 100)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def record(self, snapshot):
+        """采集器回调：只入队，不做网络 IO"""
+        with self._lock:
+            self._pending.append((snapshot.sampled_at, snapshot.status))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _take_batch(self):
+        with self._lock:
+            count = min(self.batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _send(self, body):
+        """发送一个批次：True 成功，False 可重试的失败，None 被接收端拒绝"""
+        for attempt in range(self.retries):
+            if attempt:
+                if self._stop_event.wait(self.retry_delay * 2 ** (attempt - 1)):
+                    return False
+            try:
+                response = self.client.post(self.url, content=body, headers=self.headers)
+            except httpx.HTTPError as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                continue
+            if response.status_code < 300:
+                self.sent += 1
+                self.last_success = time.time()
+                return True
+            self.last_error = f"HTTP {response.status_code}"
+            if response.status_code < 500 and response.status_code not in RETRYABLE_STATUS:
+                self.rejected += 1
+                print(f"⚠️  Export sink rejected batch: HTTP {response.status_code}")
+                return None
+        self.failed += 1
+        return False
+
+    def _replay(self):
+        """按顺序重放积压；返回积压是否已清空"""
+        while True:
+            body = self.spool.peek()
+            if body is None:
+                return True
+            if self._send(body) is False:
+                return False
+            self.spool.pop()
+
+    def flush(self, everything=False):
+        """发送攒下的快照（everything=True 时不等批次攒满）；接收端不可用时写入积压"""
+        with self._flush_lock:
+            drained = self._replay()
+            while True:
+                with self._lock:
+                    ready = len(self._pending) >= self.batch_size or (everything and len(self._pending) > 0)
+                if not ready:
+                    return
+                body = encode_batch(self._take_batch(), self.format, self.host)
+                if self.compress:
+                    body = gzip.compress(body, compresslevel=6)
+                # 积压未清空时直接排到积压末尾，保证顺序
+                if not drained or self._send(body) is False:
+                    drained = False
+                    self.spool.append(body)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="push-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._wake.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self._thread = None
+        # 退出前把剩余快照写出（或写入积压），下次启动时重放
+        self.flush(everything=True)
+
+    def close(self):
+        self.stop()
+        self.spool.close()
+        self.client.close()
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop_event.is_set():
+            self._wake.wait(max(0.0, deadline - time.monotonic()))
+            self._wake.clear()
+            if self._stop_event.is_set():
+                break
+            due = time.monotonic() >= deadline
+            try:
+                self.flush(everything=due)
+            except Exception as e:
+                print(f"⚠️  Export flush failed: {e}")
+            if due:
+                deadline = time.monotonic() + self.flush_interval
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "url": self.url,
+            "format": self.format,
+            "pending": pending,
+            "sent": self.sent,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "spooled": len(self.spool),
+            "spoolBytes": self.spool.bytes,
+            "spoolDropped": self.spool.dropped,
+            "lastError": self.last_error,
+            "lastSuccess": self.last_success,
+        }
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import random
+import time
+
+import httpx
+import msgpack
+from zeroconf import ServiceStateChange
+from zeroconf.asyncio import AsyncServiceBrowser, AsyncServiceInfo, AsyncZeroconf
+
+from bonjour_service import DEFAULT_PORT, SERVICE_TYPE
+from encoding import JSON, MSGPACK, encode_json
+
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_TIMEOUT = 2.0
+# 同时进行的请求数上限
+DEFAULT_CONCURRENCY = 200
+# 每个 AsyncClient 负责的 Agent 数：httpcore 分配连接的开销与池中连接数成正比，
+# 一个池里放几百个连接时每轮轮询的 CPU 开销会按平方增长，因此按 Agent 分片到多个连接池
+HOSTS_PER_CLIENT = 8
+# 连续失败后的退避：BACKOFF_BASE * 2^(失败次数-1)，不超过 BACKOFF_MAX 秒
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# 优先让 Agent 返回 MessagePack，旧版本 Agent 返回 JSON
+STATUS_ACCEPT = f"{MSGPACK}, {JSON};q=0.5"
+
+
+def parse_peer(value, default_port=DEFAULT_PORT):
+    """解析 "host[:port]"（IPv6 地址写作 "[addr]:port"）"""
+    value = value.strip()
+    if value.startswith("["):
+        host, _, rest = value[1:].partition("]")
+        port = rest.lstrip(":")
+    elif value.count(":") == 1:
+        host, _, port = value.partition(":")
+    else:
+        host, port = value, ""
+    return host, int(port) if port else default_port
+
+
+class Peer:
+    """一个被聚合的 Agent 及其最近一次轮询结果"""
+
+    __slots__ = ("host", "port", "name", "source", "txt", "url", "status", "etag", "last_seen",
+                 "latency", "error", "failures", "next_attempt", "shard")
+
+    def __init__(self, host, port, name=None, source="static", txt=None):
+        self.host = host
+        self.port = port
+        self.name = name or host
+        self.source = source
+        # Bonjour TXT 记录（负载分档、能力），静态配置的 Agent 为空
+        self.txt = txt or {}
+        address = f"[{host}]" if ":" in host else host
+        self.url = f"http://{address}:{port}/api/status"
+        self.status = None
+        self.etag = None
+        self.last_seen = None
+        self.latency = None
+        self.error = None
+        self.failures = 0
+        self.next_attempt = 0.0
+        self.shard = 0
+
+    @property
+    def id(self):
+        return f"{self.host}:{self.port}"
+
+    @property
+    def online(self):
+        return self.status is not None and self.failures == 0
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "host": self.host,
+            "port": self.port,
+            "source": self.source,
+            "txt": self.txt,
+            "online": self.online,
+            "lastSeen": self.last_seen,
+            "latency": self.latency,
+            "failures": self.failures,
+            "error": self.error,
+            "status": self.status,
+        }
+
+
+class FleetAggregator:
+    """并发轮询多个 Agent 的 /api/status，合并为舰队视图
+
+    请求通过带连接池的 httpx.AsyncClient 发出（keep-alive，每 HOSTS_PER_CLIENT 个 Agent 共用一个），
+    并发数受 concurrency 限制；
+    每个请求有独立超时，连续失败的 Agent 按指数退避（带随机抖动）降低轮询频率。
+    轮询时带上 If-None-Match，Agent 快照未变化时只返回 304。
+    """
+
+    def __init__(self, peers=(), interval=DEFAULT_POLL_INTERVAL, timeout=DEFAULT_TIMEOUT,
+                 concurrency=DEFAULT_CONCURRENCY, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 client=None, history=None):
+        self.interval = interval
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.peers = {}
+        # 可选的舰队历史（FleetHistory），每次成功轮询写入一次
+        self.history = history
+        self.rounds = 0
+        self.round_seconds = 0.0
+        # 传入 client 时所有 Agent 共用它（测试中使用 MockTransport）
+        self.client = client
+        self._clients = {}
+        self._added = 0
+        self._task = None
+        self._encoded = None
+        self._encoded_round = None
+        for peer in peers:
+            host, port = parse_peer(peer) if isinstance(peer, str) else peer
+            self.add_peer(host, port)
+
+    def add_peer(self, host, port=DEFAULT_PORT, name=None, source="static", txt=None):
+        peer = Peer(host, port, name, source, txt)
+        existing = self.peers.get(peer.id)
+        if existing is not None:
+            if name:
+                existing.name = name
+            if txt:
+                existing.txt = txt
+            return existing
+        peer.shard = self._added // HOSTS_PER_CLIENT
+        self._added += 1
+        self.peers[peer.id] = peer
+        return peer
+
+    def remove_peer(self, peer_id):
+        peer = self.peers.pop(peer_id, None)
+        # 离开舰队的主机不再出现在 top / 分位数中，行留给新主机复用
+        if peer is not None and self.history is not None:
+            self.history.remove(peer_id)
+        return peer
+
+    def _get_client(self, shard):
+        if self.client is not None:
+            return self.client
+        client = self._clients.get(shard)
+        if client is None:
+            limits = httpx.Limits(max_connections=HOSTS_PER_CLIENT, max_keepalive_connections=HOSTS_PER_CLIENT)
+            client = self._clients[shard] = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        return client
+
+    async def poll_peer(self, peer):
+        headers = {"Accept": STATUS_ACCEPT}
+        if peer.etag:
+            headers["If-None-Match"] = peer.etag
+        started = time.monotonic()
+        try:
+            response = await self._get_client(peer.shard).get(peer.url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                pass
+            elif response.status_code == 200:
+                if response.headers.get("content-type", "").startswith(MSGPACK):
+                    peer.status = msgpack.unpackb(response.content)
+                else:
+                    peer.status = json.loads(response.content)
+                peer.etag = response.headers.get("etag")
+            else:
+                raise httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+        except (httpx.HTTPError, ValueError, msgpack.UnpackException) as e:
+            peer.failures += 1
+            peer.error = str(e) or type(e).__name__
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (peer.failures - 1))
+            peer.next_attempt = time.monotonic() + delay * (0.5 + random.random() / 2)
+            return False
+        peer.latency = time.monotonic() - started
+        peer.last_seen = time.time()
+        # 轮询期间被移除的 Agent 不再写入历史
+        if self.history is not None and self.peers.get(peer.id) is peer:
+            self.history.record(peer.id, peer.last_seen, peer.status)
+        peer.failures = 0
+        peer.error = None
+        peer.next_attempt = 0.0
+        return True
+
+    async def poll_once(self):
+        """轮询一轮所有到期的 Agent，返回成功的数量"""
+        started = time.monotonic()
+        due = [peer for peer in list(self.peers.values()) if peer.next_attempt <= started]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def guarded(peer):
+            async with semaphore:
+                return await self.poll_peer(peer)
+
+        results = await asyncio.gather(*(guarded(peer) for peer in due))
+        self.rounds += 1
+        self.round_seconds = time.monotonic() - started
+        return sum(results)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients = {}
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print(f"❌ Fleet poll failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def snapshot(self):
+        peers = [peer.to_dict() for peer in self.peers.values()]
+        online = sum(1 for peer in peers if peer["online"])
+        return {
+            "generatedAt": time.time(),
+            "round": self.rounds,
+            "roundSeconds": self.round_seconds,
+            "total": len(peers),
+            "online": online,
+            "offline": len(peers) - online,
+            "hosts": peers,
+        }
+
+    def encoded(self):
+        """JSON 编码的舰队视图，每轮轮询只编码一次"""
+        if self._encoded is None or self._encoded_round != (self.rounds, len(self.peers)):
+            self._encoded = encode_json(self.snapshot())
+            self._encoded_round = (self.rounds, len(self.peers))
+        return self._encoded
+
+
+def decode_txt(properties):
+    """Bonjour TXT 记录（bytes -> bytes）解码为字符串字典，没有值的键跳过"""
+    return {
+        key.decode(errors="replace"): value.decode(errors="replace")
+        for key, value in (properties or {}).items() if value is not None
+    }
+
+
+class FleetBrowser:
+    """通过 Bonjour 浏览 _macmonitor._tcp 服务，把发现的 Agent 加入聚合器
+
+    aggregator 只需提供 add_peer(host, port, name=, source=, txt=) 与 remove_peer(peer_id)，
+    也用于 Agent 的发现服务（discovery.DiscoveryService）。
+    """
+
+    def __init__(self, aggregator, service_type=SERVICE_TYPE):
+        self.aggregator = aggregator
+        self.service_type = service_type
+        self.zeroconf = None
+        self.browser = None
+        self._names = {}
+        self._tasks = set()
+
+    async def start(self):
+        self.zeroconf = AsyncZeroconf()
+        self.browser = AsyncServiceBrowser(self.zeroconf.zeroconf, [self.service_type], handlers=[self._on_change])
+
+    def _on_change(self, zeroconf, service_type, name, state_change):
+        if state_change is ServiceStateChange.Removed:
+            peer_id = self._names.pop(name, None)
+            if peer_id is not None:
+                self.aggregator.remove_peer(peer_id)
+            return
+        task = asyncio.ensure_future(self._resolve(service_type, name))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, service_type, name):
+        info = AsyncServiceInfo(service_type, name)
+        if not await info.async_request(self.zeroconf.zeroconf, 3000):
+            return
+        addresses = info.parsed_addresses()
+        if not addresses:
+            return
+        # 优先使用 IPv4 地址
+        host = next((address for address in addresses if ":" not in address), addresses[0])
+        peer = self.aggregator.add_peer(host, info.port, name=name.split(".")[0], source="mdns",
+                                        txt=decode_txt(info.properties))
+        previous = self._names.get(name)
+        if previous is not None and previous != peer.id:
+            self.aggregator.remove_peer(previous)
+        self._names[name] = peer.id
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self.browser is not None:
+            await self.browser.async_cancel()
+        if self.zeroconf is not None:
+            await self.zeroconf.async_close()
@@ -0,0 +1,234 @@
+import math
+import threading
+
+import numpy as np
+
+from history import extract_metric
+
+# 聚合器默认保存的指标与分辨率：10 秒 × 1 天
+DEFAULT_FLEET_METRICS = ("cpu.usage", "memory.pressure")
+DEFAULT_RESOLUTION = 10
+DEFAULT_CAPACITY = 8640
+
+# top-k 与逐行计算时每次处理的主机数，限制临时数组大小
+HOST_CHUNK = 256
+
+TOP_AGGREGATES = ("avg", "max", "last")
+
+
+def sorted_quantiles(values, counts, qs):
+    """对最后一维已排序（NaN 在末尾）的数组按有效个数 counts 做线性插值分位数
+
+    values: (..., n)，counts: (...)，qs: 0-100；返回 (..., len(qs))，没有有效值时为 NaN。
+    """
+    qs = np.asarray(qs, dtype=np.float64) / 100.0
+    counts = np.asarray(counts)
+    position = np.maximum(counts[..., None] - 1, 0) * qs
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(counts[..., None] - 1, 0))
+    fraction = position - lower
+    low = np.take_along_axis(values, lower, axis=-1).astype(np.float64)
+    high = np.take_along_axis(values, upper, axis=-1).astype(np.float64)
+    result = low + (high - low) * fraction
+    result[counts == 0] = np.nan
+    return result
+
+
+class FleetHistory:
+    """舰队历史：每个指标一个 (主机 × 时间) 的 float32 矩阵，时间轴为环形缓冲区
+
+    每个时间列对应一个 resolution 秒的桶，同一桶内后写入的值覆盖先写入的值；
+    时间推进时跳过的列会被清空，因此环中的列总是连续的最近 capacity 个桶，
+    查询窗口最多对应两段连续切片（视图，不拷贝）。新主机加入时按行扩容；
+    离开舰队的主机（remove）的行被清空并放入空闲列表，由之后加入的主机复用。
+    """
+
+    def __init__(self, metrics=DEFAULT_FLEET_METRICS, resolution=DEFAULT_RESOLUTION,
+                 capacity=DEFAULT_CAPACITY, initial_hosts=64):
+        self.metrics = list(metrics)
+        self.resolution = resolution
+        self.capacity = capacity
+        # 按行排列的主机名，已移除主机的行为 None
+        self.hosts = []
+        self.index = {}
+        self._free = []
+        self.data = {name: np.full((initial_hosts, capacity), np.nan, dtype=np.float32) for name in self.metrics}
+        self._latest = None
+        self._lock = threading.Lock()
+
+    @property
+    def memory_bytes(self):
+        return sum(block.nbytes for block in self.data.values())
+
+    def _row(self, host):
+        row = self.index.get(host)
+        if row is None and self._free:
+            row = self._free.pop()
+            self.hosts[row] = host
+            self.index[host] = row
+        elif row is None:
+            row = len(self.hosts)
+            rows = next(iter(self.data.values())).shape[0] if self.data else 0
+            if row >= rows:
+                for name, block in self.data.items():
+                    grown = np.full((max(1, rows) * 2, self.capacity), np.nan, dtype=np.float32)
+                    grown[:rows] = block
+                    self.data[name] = grown
+            self.hosts.append(host)
+            self.index[host] = row
+        return row
+
+    def remove(self, host):
+        """移除离开舰队的主机：清空它的行并留给之后加入的主机复用；返回是否存在"""
+        with self._lock:
+            row = self.index.pop(host, None)
+            if row is None:
+                return False
+            for block in self.data.values():
+                block[row] = np.nan
+            self.hosts[row] = None
+            self._free.append(row)
+            return True
+
+    def _advance(self, bucket):
+        """推进到 bucket，清空中间跳过的列；返回 False 表示 bucket 已滑出环形缓冲区"""
+        if self._latest is None:
+            self._latest = bucket
+            for block in self.data.values():
+                block[:, bucket % self.capacity] = np.nan
+            return True
+        if bucket <= self._latest:
+            return bucket > self._latest - self.capacity
+        first = max(self._latest + 1, bucket - self.capacity + 1)
+        for start, stop in self._slices(first, bucket + 1):
+            for block in self.data.values():
+                block[:, start:stop] = np.nan
+        self._latest = bucket
+        return True
+
+    def record(self, host, timestamp, status):
+        """写入一台主机在 timestamp 时的状态"""
+        bucket = int(timestamp // self.resolution)
+        with self._lock:
+            if not self._advance(bucket):
+                return
+            row = self._row(host)
+            column = bucket % self.capacity
+            for name in self.metrics:
+                self.data[name][row, column] = extract_metric(status, name)
+
+    def _slices(self, first, stop):
+        """桶区间 [first, stop) 在环中的列切片（最多两段）"""
+        if stop <= first:
+            return []
+        begin = first % self.capacity
+        end = begin + (stop - first)
+        if end <= self.capacity:
+            return [(begin, end)]
+        return [(begin, self.capacity), (0, end - self.capacity)]
+
+    def window(self, start, end):
+        """查询窗口 [start, end) 对应的 (首个桶, 桶数, 列切片)"""
+        if self._latest is None:
+            return 0, 0, []
+        first = max(math.ceil(start / self.resolution), self._latest - self.capacity + 1)
+        stop = min(math.ceil(end / self.resolution), self._latest + 1)
+        return first, max(0, stop - first), self._slices(first, stop)
+
+    def _views(self, metric, start, end):
+        """(首个桶, 桶数, [主机 × 列 视图...])；只包含已登记的主机行"""
+        if metric not in self.data:
+            raise KeyError(metric)
+        first, count, slices = self.window(start, end)
+        block = self.data[metric][:len(self.hosts)]
+        return first, count, [block[:, a:b] for a, b in slices]
+
+    def percentiles(self, metric, start, end, qs=(50, 95, 99)):
+        """窗口内所有主机、所有时间点的分位数"""
+        with self._lock:
+            _, _, views = self._views(metric, start, end)
+            values = np.concatenate([view[~np.isnan(view)] for view in views]) if views else np.empty(0)
+        if values.size == 0:
+            return {"count": 0, "percentiles": {str(q): None for q in qs}}
+        result = np.percentile(values, qs)
+        return {"count": int(values.size), "percentiles": {str(q): float(v) for q, v in zip(qs, result)}}
+
+    def percentile_series(self, metric, start, end, qs=(50, 95, 99), step=None):
+        """按时间分桶（step 秒，默认为 resolution）计算跨主机的分位数序列"""
+        group = max(1, int(round((step or self.resolution) / self.resolution)))
+        with self._lock:
+            first, count, views = self._views(metric, start, end)
+            block = np.concatenate(views, axis=1) if views else np.empty((len(self.hosts), 0), dtype=np.float32)
+        hosts = block.shape[0]
+        # 对齐到 step 的整数倍：首尾不足一组的部分用 NaN 补齐
+        offset = first % group
+        groups = math.ceil((offset + count) / group)
+        padded = np.full((hosts, groups * group), np.nan, dtype=np.float32)
+        padded[:, offset:offset + count] = block
+        # (主机, 组, 组内列) -> (组, 主机 × 组内列)，每组一次排序
+        cells = padded.reshape(hosts, groups, group).transpose(1, 0, 2).reshape(groups, hosts * group)
+        cells.sort(axis=1)
+        counts = np.count_nonzero(~np.isnan(cells), axis=1)
+        quantiles = sorted_quantiles(cells, counts, qs) if cells.size else np.full((groups, len(qs)), np.nan)
+        keep = counts > 0
+        timestamps = ((first - offset) // group * group + np.arange(groups) * group) * self.resolution
+        return {
+            "from": start,
+            "to": end,
+            "step": group * self.resolution,
+            "timestamps": timestamps[keep].astype(np.float64).tolist(),
+            "percentiles": {str(q): quantiles[keep, i].tolist() for i, q in enumerate(qs)},
+        }
+
+    def top(self, metric, start, end, k=10, aggregate="avg"):
+        """按窗口内的 aggregate（avg / max / last）选出最高的 k 台主机
+
+        按 HOST_CHUNK 行分块扫描，每块只计算每台主机的一个得分并与当前候选合并，
+        不会把所有序列拼接成一个大数组。
+        """
+        if aggregate not in TOP_AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {aggregate}")
+        best_scores = np.empty(0)
+        best_rows = np.empty(0, dtype=np.int64)
+        with self._lock:
+            _, _, views = self._views(metric, start, end)
+            hosts = list(self.hosts)
+            for row in range(0, len(hosts), HOST_CHUNK):
+                scores = chunk_scores([view[row:row + HOST_CHUNK] for view in views], aggregate)
+                if scores is None:
+                    continue
+                valid = ~np.isnan(scores)
+                scores = np.concatenate([best_scores, scores[valid]])
+                rows = np.concatenate([best_rows, np.flatnonzero(valid) + row])
+                if len(scores) > k:
+                    keep = np.argpartition(scores, -k)[-k:]
+                    scores, rows = scores[keep], rows[keep]
+                best_scores, best_rows = scores, rows
+        order = np.argsort(-best_scores, kind="stable")
+        return [{"host": hosts[best_rows[i]], "value": float(best_scores[i])} for i in order]
+
+
+def chunk_scores(views, aggregate):
+    """一组主机在窗口内的得分；views 为按时间顺序排列的 (主机 × 列) 切片"""
+    if not views or not views[0].shape[0]:
+        return None
+    if aggregate == "last":
+        scores = np.full(views[0].shape[0], np.nan)
+        # 从最新的切片往前找每台主机最后一个有效值
+        for view in reversed(views):
+            if not view.shape[1]:
+                continue
+            valid = ~np.isnan(view)
+            pending = np.isnan(scores) & valid.any(axis=1)
+            if pending.any():
+                last = view.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+                scores[pending] = view[pending, last[pending]]
+        return scores
+    if aggregate == "max":
+        with np.errstate(invalid="ignore"):
+            maxima = [np.fmax.reduce(view, axis=1) for view in views if view.shape[1]]
+        return np.fmax.reduce(maxima).astype(np.float64) if maxima else None
+    totals = sum(np.nansum(view, axis=1, dtype=np.float64) for view in views)
+    counts = sum(np.count_nonzero(~np.isnan(view), axis=1) for view in views)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
@@ -0,0 +1,129 @@
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from encoding import JSON, MSGPACK, encode_msgpack, negotiate
+from fleet import DEFAULT_POLL_INTERVAL, DEFAULT_TIMEOUT, FleetAggregator, FleetBrowser
+from fleet_history import DEFAULT_FLEET_METRICS, TOP_AGGREGATES, FleetHistory
+import math
+import time
+
+
+def create_fleet_app(peers=(), browse=True, interval=DEFAULT_POLL_INTERVAL, timeout=DEFAULT_TIMEOUT,
+                     aggregator=None, metrics=DEFAULT_FLEET_METRICS):
+    """聚合器模式：并发轮询多个 Agent，对外提供合并后的 /api/fleet/status"""
+    app = FastAPI(
+        title="Mac Monitor Aggregator",
+        description="Fleet aggregator for Mac Monitor agents",
+        version="1.0.0"
+    )
+
+    if aggregator is None:
+        aggregator = FleetAggregator(peers, interval=interval, timeout=timeout)
+    # 舰队历史（主机 × 时间，10 秒 × 1 天），供分位数与 top-k 查询
+    if aggregator.history is None:
+        aggregator.history = FleetHistory(metrics)
+    history = aggregator.history
+    app.state.aggregator = aggregator
+    # 静态列表之外，通过 Bonjour 自动发现局域网内的 Agent
+    browser = FleetBrowser(aggregator) if browse else None
+    app.state.browser = browser
+
+    @app.on_event("startup")
+    async def start_aggregator():
+        await aggregator.start()
+        if browser is not None:
+            try:
+                await browser.start()
+            except Exception as e:
+                print(f"⚠️  Bonjour browsing unavailable: {e}")
+
+    @app.on_event("shutdown")
+    async def stop_aggregator():
+        if browser is not None:
+            await browser.stop()
+        await aggregator.stop()
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.get("/api/fleet/status")
+    async def get_fleet_status(accept: str = Header(None)):
+        """所有 Agent 的最新状态（含在线情况、延迟与错误），每轮轮询只编码一次"""
+        media_type = negotiate(accept, [JSON, MSGPACK])
+        if media_type is None:
+            raise HTTPException(status_code=406, detail=f"Supported formats: {JSON}, {MSGPACK}")
+        if media_type == MSGPACK:
+            body = encode_msgpack(aggregator.snapshot())
+        else:
+            body = aggregator.encoded()
+        return Response(content=body, media_type=media_type, headers={"Cache-Control": "no-cache", "Vary": "Accept"})
+
+    def query_window(metric, start, end):
+        if metric not in history.metrics:
+            raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}. Available: {', '.join(history.metrics)}")
+        if any(value is not None and not math.isfinite(value) for value in (start, end)):
+            raise HTTPException(status_code=400, detail="'from' and 'to' must be finite numbers")
+        if end is None:
+            end = time.time()
+        if start is None:
+            start = end - 3600
+        if start >= end:
+            raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'")
+        return start, end
+
+    @app.get("/api/fleet/percentiles")
+    async def get_fleet_percentiles(
+        metric: str = "cpu.usage",
+        start: float = Query(None, alias="from"),
+        end: float = Query(None, alias="to"),
+        q: str = "50,95,99",
+        step: float = None
+    ):
+        """跨主机的分位数：不指定 step 时为整个窗口（所有主机 × 所有时间点）的一组数值，
+        指定 step 时为按时间分桶的分位数序列"""
+        start, end = query_window(metric, start, end)
+        try:
+            qs = [float(value) for value in q.split(",")]
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid percentiles: {q}")
+        if not all(0 <= value <= 100 for value in qs):
+            raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+        qs = [int(value) if value.is_integer() else value for value in qs]
+        if step is not None and not math.isfinite(step):
+            raise HTTPException(status_code=400, detail="'step' must be a finite number")
+        if step:
+            result = await run_in_threadpool(history.percentile_series, metric, start, end, qs, step)
+        else:
+            result = await run_in_threadpool(history.percentiles, metric, start, end, qs)
+        return dict(result, metric=metric, hosts=len(history.index))
+
+    @app.get("/api/fleet/top")
+    async def get_fleet_top(
+        metric: str = "cpu.usage",
+        start: float = Query(None, alias="from"),
+        end: float = Query(None, alias="to"),
+        k: int = 10,
+        agg: str = "avg"
+    ):
+        """窗口内 agg（avg / max / last）最高的 k 台主机"""
+        start, end = query_window(metric, start, end)
+        if agg not in TOP_AGGREGATES:
+            raise HTTPException(status_code=400, detail=f"Unknown aggregate: {agg}")
+        if not 1 <= k <= 1000:
+            raise HTTPException(status_code=400, detail="'k' must be between 1 and 1000")
+        top = await run_in_threadpool(history.top, metric, start, end, k, agg)
+        for entry in top:
+            peer = aggregator.peers.get(entry["host"])
+            entry["name"] = peer.name if peer is not None else entry["host"]
+        return {"metric": metric, "aggregate": agg, "from": start, "to": end, "hosts": top}
+
+    @app.get("/health")
+    async def health_check():
+        """健康检查"""
+        return {"status": "ok", "peers": len(aggregator.peers)}
+
+    return app
@@ -0,0 +1,330 @@
+import math
+import threading
+from array import array
+
+import numpy as np
+
+# 默认记录的指标（点分路径对应 get_status 返回的字段）
+DEFAULT_METRICS = [
+    "cpu.usage",
+    "memory.pressure",
+    "memory.used",
+    "disk.used",
+    "network.bytesIn",
+    "network.bytesOut",
+    "temperature",
+    "batteryLevel",
+]
+
+# 默认常驻的历史指标：只有这些指标的采集项因历史记录而始终运行，
+# 其余列（温度、电量）仅在其他消费方（订阅者、请求、告警规则）运行对应采集项时才有值
+PINNED_METRICS = (
+    "cpu.usage",
+    "memory.pressure",
+    "memory.used",
+    "disk.used",
+    "network.bytesIn",
+    "network.bytesOut",
+)
+
+# 不指定 step 时，返回的桶数量上限
+DEFAULT_MAX_POINTS = 600
+
+# 查询可返回的聚合值，默认只返回前三项
+AGGREGATES = ("min", "max", "avg", "last", "count")
+DEFAULT_AGGREGATES = ("min", "max", "avg")
+
+NAN = float("nan")
+
+
+def extract_metric(status, path):
+    """按点分路径从状态字典中取数值，缺失或非数值时返回 NaN"""
+    value = status
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return NAN
+        value = value.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return NAN
+    return float(value)
+
+
+class RingBuffer:
+    """定长 float64 环形缓冲区（array('d')），内存占用固定为 capacity * 8 字节"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = array("d", [NAN]) * capacity
+
+    def segments(self, head, size, start, stop):
+        """返回逻辑区间 [start, stop) 对应的物理切片（最多两段，已拷贝）"""
+        first = (head - size) % self.capacity
+        begin = (first + start) % self.capacity
+        end = begin + (stop - start)
+        if end <= self.capacity:
+            return [self.data[begin:end]]
+        return [self.data[begin:], self.data[:end - self.capacity]]
+
+    def slice(self, head, size, start, stop):
+        parts = self.segments(head, size, start, stop)
+        if len(parts) == 1:
+            return parts[0]
+        return parts[0] + parts[1]
+
+    def bisect(self, head, size, value):
+        """在逻辑顺序上二分查找第一个 >= value 的位置（要求数据单调递增）"""
+        data = self.data
+        first = (head - size) % self.capacity
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if data[(first + mid) % self.capacity] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+class MetricHistory:
+    """内存中的列式指标历史：每个指标一个环形缓冲区，时间戳单独一列"""
+
+    def __init__(self, metrics=None, capacity=86400, resolution=1.0):
+        self.metrics = list(metrics or DEFAULT_METRICS)
+        self.capacity = capacity
+        self.resolution = resolution
+        self.timestamps = RingBuffer(capacity)
+        self.columns = {name: RingBuffer(capacity) for name in self.metrics}
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def memory_bytes(self):
+        return (len(self.columns) + 1) * self.capacity * 8
+
+    def record(self, snapshot):
+        """采集器回调：把快照写入历史"""
+        status = snapshot.status
+        self.append(snapshot.sampled_at, {name: extract_metric(status, name) for name in self.metrics})
+
+    def append(self, timestamp, values):
+        """追加一个采样点；时间戳需单调递增"""
+        with self._lock:
+            index = self._head
+            self.timestamps.data[index] = timestamp
+            for name, column in self.columns.items():
+                value = values.get(name)
+                column.data[index] = NAN if value is None else value
+            self._head = (index + 1) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+
+    def oldest(self):
+        """最早的采样时间，无数据时返回 None"""
+        with self._lock:
+            if self._size == 0:
+                return None
+            return self.timestamps.data[(self._head - self._size) % self.capacity]
+
+    def range(self, metrics, start, end):
+        """返回 [start, end) 区间的原始数据：(timestamps, {metric: values})"""
+        with self._lock:
+            lo = self.timestamps.bisect(self._head, self._size, start)
+            hi = self.timestamps.bisect(self._head, self._size, end)
+            times = self.timestamps.slice(self._head, self._size, lo, hi)
+            values = {name: self.columns[name].slice(self._head, self._size, lo, hi) for name in metrics}
+        return times, values
+
+    def query(self, metrics, start, end, step=None, aggregates=DEFAULT_AGGREGATES):
+        """按 step 秒分桶降采样，每个桶给出 aggregates 指定的聚合值"""
+        if step is None or step <= 0:
+            step = default_step(start, end)
+        times, values = self.range(metrics, start, end)
+        return downsample(times, values, start, end, step, aggregates)
+
+
+def default_step(start, end, max_points=DEFAULT_MAX_POINTS):
+    """未指定 step 时按目标点数选择整数秒步长"""
+    return max(1, math.ceil((end - start) / max_points))
+
+
+def downsample(times, values, start, end, step, aggregates=DEFAULT_AGGREGATES):
+    """把原始序列按 step 分桶；空桶不输出，桶内无有效值的指标输出 None"""
+    buckets = []
+    bucket_index = {}
+    for t in times:
+        bucket = int((t - start) // step)
+        if bucket not in bucket_index:
+            bucket_index[bucket] = len(buckets)
+            buckets.append(bucket)
+
+    series = {}
+    for name, column in values.items():
+        mins = [None] * len(buckets)
+        maxs = [None] * len(buckets)
+        sums = [0.0] * len(buckets)
+        lasts = [None] * len(buckets)
+        counts = [0] * len(buckets)
+        for t, v in zip(times, column):
+            if v != v:  # NaN
+                continue
+            i = bucket_index[int((t - start) // step)]
+            if counts[i] == 0:
+                mins[i] = maxs[i] = v
+            else:
+                if v < mins[i]:
+                    mins[i] = v
+                if v > maxs[i]:
+                    maxs[i] = v
+            sums[i] += v
+            lasts[i] = v
+            counts[i] += 1
+        series[name] = select_aggregates(aggregates, mins, maxs, sums, lasts, counts)
+
+    return {
+        "from": start,
+        "to": end,
+        "step": step,
+        "timestamps": [start + b * step for b in buckets],
+        "series": series,
+    }
+
+
+def select_aggregates(aggregates, mins, maxs, sums, lasts, counts):
+    """按请求的聚合名组装单个指标的输出"""
+    result = {}
+    for name in aggregates:
+        if name == "min":
+            result["min"] = mins
+        elif name == "max":
+            result["max"] = maxs
+        elif name == "avg":
+            result["avg"] = [s / c if c else None for s, c in zip(sums, counts)]
+        elif name == "last":
+            result["last"] = lasts
+        elif name == "count":
+            result["count"] = counts
+    return result
+
+
+class BlockHistory:
+    """二维 (时间 × 列) 历史块：数组字段（如 cpu.perCore）每次采样写入一行
+
+    数据保存在 float32 的 numpy 数组中，查询时按列输出为 "<path>.<列号>" 序列。
+    """
+
+    def __init__(self, path, width, capacity=86400, resolution=1.0):
+        self.path = path
+        self.width = width
+        self.capacity = capacity
+        self.resolution = resolution
+        self.names = [f"{path}.{i}" for i in range(width)]
+        self.timestamps = np.full(capacity, np.nan)
+        self.data = np.full((capacity, width), np.nan, dtype=np.float32)
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def memory_bytes(self):
+        return self.timestamps.nbytes + self.data.nbytes
+
+    def record(self, snapshot):
+        """采集器回调：取出数组字段写入一行；缺失时整行为 NaN，长度不符时截断或补 NaN"""
+        value = snapshot.status
+        for key in self.path.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        row = np.full(self.width, np.nan, dtype=np.float32)
+        if isinstance(value, (list, tuple)):
+            count = min(len(value), self.width)
+            row[:count] = [NAN if v is None else v for v in value[:count]]
+        self.append(snapshot.sampled_at, row)
+
+    def append(self, timestamp, row):
+        with self._lock:
+            self.timestamps[self._head] = timestamp
+            self.data[self._head] = row
+            self._head = (self._head + 1) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+
+    def oldest(self):
+        with self._lock:
+            if self._size == 0:
+                return None
+            return float(self.timestamps[(self._head - self._size) % self.capacity])
+
+    def range(self, start, end):
+        """返回 [start, end) 区间的 (timestamps, 二维数据块)，均为拷贝"""
+        with self._lock:
+            first = (self._head - self._size) % self.capacity
+            order = (first + np.arange(self._size)) % self.capacity
+            times = self.timestamps[order]
+            lo, hi = np.searchsorted(times, [start, end])
+            rows = order[lo:hi]
+            return times[lo:hi], self.data[rows]
+
+    def query(self, start, end, step=None, aggregates=DEFAULT_AGGREGATES):
+        if step is None or step <= 0:
+            step = default_step(start, end)
+        times, block = self.range(start, end)
+        return downsample_block(times, block, self.names, start, end, step, aggregates)
+
+
+def downsample_block(times, block, names, start, end, step, aggregates=DEFAULT_AGGREGATES):
+    """按 step 分桶聚合二维数据块的每一列（numpy reduceat，不逐行循环）"""
+    series = {}
+    if len(times) == 0:
+        empty = select_aggregates(aggregates, [], [], [], [], [])
+        return {"from": start, "to": end, "step": step, "timestamps": [],
+                "series": {name: dict(empty) for name in names}}
+
+    buckets = ((times - start) // step).astype(np.int64)
+    # times 单调递增，每个桶在数组中是连续的一段
+    unique, starts = np.unique(buckets, return_index=True)
+    valid = ~np.isnan(block)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    sums = np.add.reduceat(np.where(valid, block, 0).astype(np.float64), starts, axis=0)
+    mins = np.fmin.reduceat(block, starts, axis=0).astype(np.float64)
+    maxs = np.fmax.reduceat(block, starts, axis=0).astype(np.float64)
+    # 每个桶内最后一个有效值的行号
+    rows = np.where(valid, np.arange(len(times))[:, None], -1)
+    last_rows = np.maximum.reduceat(rows, starts, axis=0)
+    lasts = block[np.clip(last_rows, 0, None), np.arange(block.shape[1])].astype(np.float64)
+
+    def column(values, i):
+        return [round(v, 6) if c else None for v, c in zip(values[:, i].tolist(), counts[:, i].tolist())]
+
+    for i, name in enumerate(names):
+        series[name] = select_aggregates(
+            aggregates, column(mins, i), column(maxs, i), np.round(sums[:, i], 6).tolist(),
+            column(lasts, i), counts[:, i].tolist()
+        )
+    return {
+        "from": start,
+        "to": end,
+        "step": step,
+        "timestamps": (start + unique * step).tolist(),
+        "series": series,
+    }
+
+
+def merge_results(first, second):
+    """合并两份相同 from/to/step 的查询结果，按时间戳对齐，缺失的桶填 None"""
+    timestamps = sorted(set(first["timestamps"]) | set(second["timestamps"]))
+    series = {}
+    for result in (first, second):
+        index = {t: i for i, t in enumerate(result["timestamps"])}
+        positions = [index.get(t) for t in timestamps]
+        for name, aggregates in result["series"].items():
+            series[name] = {
+                aggregate: [(0 if aggregate == "count" else None) if p is None else values[p] for p in positions]
+                for aggregate, values in aggregates.items()
+            }
+    return dict(first, timestamps=timestamps, series=series)
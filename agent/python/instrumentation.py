@@ -0,0 +1,190 @@
+import asyncio
+import bisect
+import os
+import threading
+import time
+
+import psutil
+
+# 耗时直方图的桶上界（秒）：100 微秒 ~ 5 秒，按 1-2.5-5 递增
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+DEFAULT_LAG_INTERVAL = 0.5
+
+
+class Histogram:
+    """固定桶的耗时直方图：observe 只做一次二分查找和几次加法"""
+
+    __slots__ = ("counts", "sum", "count", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        """按桶估计分位数（桶内线性插值），没有数据时返回 None"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        with self._lock:
+            counts, total, count, maximum = list(self.counts), self.sum, self.count, self.max
+        cumulative = []
+        running = 0
+        for value in counts[:-1]:
+            running += value
+            cumulative.append(running)
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "max": round(maximum, 6),
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip((str(b) for b in BUCKETS), cumulative)),
+        }
+
+
+class Timings:
+    """按 (类别, 名称) 分组的耗时直方图，例如 ("collector", "cpu")、("route", "GET /api/status")"""
+
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, kind, name):
+        key = (kind, name)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, kind, name, seconds):
+        self.histogram(kind, name).observe(seconds)
+
+    def to_dict(self):
+        result = {}
+        for (kind, name), histogram in sorted(self.histograms.items()):
+            result.setdefault(kind, {})[name] = histogram.to_dict()
+        return result
+
+
+class RouteTimingMiddleware:
+    """ASGI 中间件：记录每个路由从收到请求到开始响应的耗时
+
+    以路由模板（如 GET /api/history）分组，未匹配的请求记为 other；
+    SSE 等流式响应只计到开始推送为止。
+    """
+
+    def __init__(self, app, timings):
+        self.app = app
+        self.timings = timings
+        self._paths = None
+
+    def route_name(self, scope):
+        if self._paths is None:
+            router = scope.get("router")
+            if router is None:
+                return "other"
+            self._paths = {route.endpoint: route.path for route in router.routes if hasattr(route, "endpoint")}
+        path = self._paths.get(scope.get("endpoint"))
+        return f"{scope['method']} {path}" if path else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        recorded = False
+
+        async def timed_send(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                self.timings.observe("route", self.route_name(scope), time.perf_counter() - started)
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+
+class LoopLagMonitor:
+    """事件循环延迟：定期 sleep(interval)，实际唤醒比预期晚的时间即为延迟"""
+
+    def __init__(self, timings, interval=DEFAULT_LAG_INTERVAL):
+        self.timings = timings
+        self.interval = interval
+        self.last = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.last = max(0.0, loop.time() - started - self.interval)
+            self.timings.observe("loop", "lag", self.last)
+
+
+class ProcessUsage:
+    """Agent 自身的 CPU（占单核比例）、RSS 与线程数
+
+    CPU 按至少 window 秒的窗口计算：多个调用方（/metrics、/api/agent/stats）交替读取时，
+    窗口不足的读取沿用上一次的结果，不会把基准挪到只隔几毫秒的位置。首次读取为启动以来的平均值。
+    """
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self.process = psutil.Process(os.getpid())
+        self._last_wall = self.process.create_time()
+        self._last_cpu = 0.0
+        self._usage = 0.0
+
+    def read(self):
+        now = time.time()
+        times = self.process.cpu_times()
+        cpu = times.user + times.system
+        elapsed = now - self._last_wall
+        if elapsed >= self.window:
+            self._usage = max(cpu - self._last_cpu, 0.0) / elapsed
+            self._last_wall, self._last_cpu = now, cpu
+        return {
+            "cpu": round(self._usage, 4),
+            "cpuSeconds": round(cpu, 3),
+            "rss": self.process.memory_info().rss,
+            "threads": self.process.num_threads(),
+        }
@@ -1,31 +1,146 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
-import signal
+import json
+import os
 from api_server import create_app
 from bonjour_service import BonjourPublisher
+from config import add_arguments, load_config
+from discovery import DiscoveryService
 
-async def main():
-    print("Starting Mac Monitor Agent (Python)...")
+# 多进程模式下传给工作进程的设置（共享内存名称与数据目录）；工作进程由 uvicorn 以 spawn 方式启动，继承环境变量
+WORKER_ENV = "MACMONITOR_WORKER"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mac Monitor Agent (Python)")
+    add_arguments(parser)
+    parser.add_argument("--aggregate", action="store_true", help="以聚合器模式运行，汇总多个 Agent")
+    parser.add_argument("--peer", action="append", default=[], metavar="HOST[:PORT]",
+                        help="聚合器模式下的静态 Agent 地址，可重复指定")
+    parser.add_argument("--no-browse", action="store_true", help="聚合器模式下不通过 Bonjour 发现 Agent")
+    args = parser.parse_args()
+    try:
+        config = load_config(args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    return args, config
+
+def create_exporter(data_dir):
+    """设置 MACMONITOR_EXPORT_URL 后启用推送导出；积压文件放在数据目录下"""
+    url = os.environ.get("MACMONITOR_EXPORT_URL")
+    if not url:
+        return None
+    from exporter import PushExporter
+    
+    spool_path = os.path.join(data_dir, "export.spool") if data_dir else None
+    return PushExporter(url, format=os.environ.get("MACMONITOR_EXPORT_FORMAT", "json"), spool_path=spool_path)
+
+def create_alerts():
+    """MACMONITOR_ALERT_RULES 为规则 JSON 文件（未设置时使用默认规则），
+    设置 MACMONITOR_ALERT_WEBHOOK 后告警同时 POST 到该地址"""
+    from alerts import WebhookNotifier, load_rules
     
-    # 启动 Bonjour 服务
-    bonjour = BonjourPublisher(port=8080)
-    bonjour.start()
+    path = os.environ.get("MACMONITOR_ALERT_RULES")
+    url = os.environ.get("MACMONITOR_ALERT_WEBHOOK")
+    return load_rules(path) if path else None, WebhookNotifier(url) if url else None
+
+def server_options(config):
+    """单进程运行时的 uvicorn 参数"""
+    options = config.uvicorn_options()
+    del options["workers"]
+    return options
+
+async def run_aggregator(config, args):
+    from fleet_server import create_fleet_app
+    
+    print("Starting Mac Monitor Aggregator (Python)...")
+    app = create_fleet_app(peers=args.peer, browse=not args.no_browse)
+    
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, **server_options(config)))
+    
+    print(f"✅ Mac Monitor Aggregator started on http://{config.host}:{config.port}")
+    await server.serve()
+
+async def run_agent(config):
+    print("Starting Mac Monitor Agent (Python)...")
     
     # 启动 API 服务器
-    app = create_app()
+    # 配置了数据目录（dataDir / MACMONITOR_DATA_DIR）后启用磁盘持久化存储
+    alert_rules, alert_webhook = create_alerts()
+    app = create_app(
+        data_dir=config.data_dir,
+        exporter=create_exporter(config.data_dir),
+        cpu_budget=config.cpu_budget / 100 if config.cpu_budget else None,
+        pinned_metrics=config.pinned(),
+        alert_rules=alert_rules,
+        alert_webhook=alert_webhook,
+        # Bonjour 随应用启动在事件循环上发布，离线时也不会阻塞启动
+        publisher=BonjourPublisher(port=config.port),
+        discovery=DiscoveryService(port=config.port)
+    )
     
     import uvicorn
-    config = uvicorn.Config(app, host="0.0.0.0", port=8080, log_level="info")
-    server = uvicorn.Server(config)
+    server = uvicorn.Server(uvicorn.Config(app, **server_options(config)))
     
-    print("✅ Mac Monitor Agent started on http://0.0.0.0:8080")
-    print("✅ Bonjour service published")
+    print(f"✅ Mac Monitor Agent started on http://{config.host}:{config.port}")
     
     try:
         await server.serve()
     except KeyboardInterrupt:
         print("\nShutting down...")
-        bonjour.stop()
+
+def run_workers(config):
+    """多进程模式：本进程只负责采样与只需运行一份的子系统（磁盘存储、导出、Webhook、Bonjour 发布与发现），
+    config.workers 个 uvicorn 工作进程共用同一个监听端口，从共享内存读取快照"""
+    from shared import SharedSnapshot, create_sampler
+    import uvicorn
+    
+    print(f"Starting Mac Monitor Agent (Python) with {config.workers} workers...")
+    shared = SharedSnapshot.create()
+    alert_rules, alert_webhook = create_alerts()
+    sampler = create_sampler(
+        shared,
+        data_dir=config.data_dir,
+        exporter=create_exporter(config.data_dir),
+        cpu_budget=config.cpu_budget / 100 if config.cpu_budget else None,
+        pinned_metrics=config.pinned(),
+        alert_rules=alert_rules,
+        alert_webhook=alert_webhook,
+        publisher=BonjourPublisher(port=config.port),
+        discovery=DiscoveryService(port=config.port)
+    )
+    os.environ[WORKER_ENV] = json.dumps({"shared": shared.name, "dataDir": config.data_dir,
+                                         "pinnedMetrics": config.pinned()})
+    sampler.start()
+    try:
+        print(f"✅ Mac Monitor Agent started on http://{config.host}:{config.port}")
+        uvicorn.run("main:create_worker_app", factory=True, **config.uvicorn_options())
+    finally:
+        sampler.stop()
+        shared.close()
+        shared.unlink()
+
+def create_worker_app():
+    """多进程模式下每个工作进程的应用工厂（uvicorn factory）"""
+    from shared import SharedSnapshot
+    
+    settings = json.loads(os.environ[WORKER_ENV])
+    # 磁盘存储以只读方式打开（由采样进程写入）；发现服务与告警的状态随共享快照提供
+    return create_app(
+        shared=SharedSnapshot.attach(settings["shared"]),
+        data_dir=settings["dataDir"],
+        pinned_metrics=settings["pinnedMetrics"]
+    )
+
+def main():
+    args, config = parse_args()
+    if args.aggregate:
+        asyncio.run(run_aggregator(config, args))
+    elif config.workers > 1:
+        run_workers(config)
+    else:
+        asyncio.run(run_agent(config))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,199 @@
+import threading
+import time
+from collections import deque
+
+import psutil
+
+# /api/processes 支持的排序方式与最多返回的进程数
+SORT_KEYS = ("cpu", "rss", "threads", "io")
+MAX_TOP = 500
+
+# 每次刷新的默认预算：最多读取的进程数与耗时（秒）
+DEFAULT_MAX_REFRESH = 2000
+DEFAULT_BUDGET = 0.1
+
+
+class ProcessEntry:
+    """进程表中的一项：复用同一个 psutil.Process，跨刷新计算 CPU / IO 增量"""
+
+    __slots__ = ("process", "pid", "name", "cpu", "rss", "threads", "io_read", "io_write",
+                 "_io_bytes", "refreshed_at")
+
+    def __init__(self, process):
+        self.process = process
+        self.pid = process.pid
+        self.name = None
+        self.cpu = None
+        self.rss = None
+        self.threads = None
+        self.io_read = None
+        self.io_write = None
+        self._io_bytes = None
+        self.refreshed_at = None
+
+    def refresh(self, now):
+        process = self.process
+        with process.oneshot():
+            if self.name is None:
+                self.name = process.name()
+            # 首次调用返回 0，之后为距上次调用的增量；换算为占用单核的比例
+            cpu = process.cpu_percent(None)
+            self.cpu = cpu / 100.0 if self.refreshed_at is not None else None
+            self.rss = process.memory_info().rss
+            self.threads = process.num_threads()
+            # macOS 上 psutil 不提供进程 IO 计数
+            if hasattr(process, "io_counters"):
+                try:
+                    io = process.io_counters()
+                except psutil.AccessDenied:
+                    io = None
+                if io is not None:
+                    if self._io_bytes is not None and now > self.refreshed_at:
+                        elapsed = now - self.refreshed_at
+                        self.io_read = max(0, io.read_bytes - self._io_bytes[0]) / elapsed
+                        self.io_write = max(0, io.write_bytes - self._io_bytes[1]) / elapsed
+                    self._io_bytes = (io.read_bytes, io.write_bytes)
+        self.refreshed_at = now
+
+    @property
+    def io(self):
+        if self.io_read is None:
+            return None
+        return self.io_read + self.io_write
+
+    def to_dict(self):
+        return {
+            "pid": self.pid,
+            "name": self.name,
+            "cpu": self.cpu,
+            "rss": self.rss,
+            "threads": self.threads,
+            "ioRead": self.io_read,
+            "ioWrite": self.io_write,
+        }
+
+
+def sort_value(row, sort):
+    """已发布的进程字典中与排序方式对应的值"""
+    if sort == "io":
+        return None if row["ioRead"] is None else row["ioRead"] + row["ioWrite"]
+    return row[sort]
+
+
+class ProcessTable:
+    """跨采样周期增量维护的进程表
+
+    以 (pid, create_time) 为键复用 psutil.Process 对象，pid 被复用时视为新进程。
+    每次刷新先用 psutil.pids() 获取进程列表，再按轮转顺序读取进程详情，
+    读取数量和耗时受 max_refresh / budget 限制，进程很多时分摊到多个周期完成。
+
+    表项只由刷新方（采集线程）修改；每次刷新结束时发布一份不可变的结果（各进程的字典与统计），
+    top() / stats() 只读取已发布的结果，不会等待正在进行的扫描。
+    """
+
+    def __init__(self, max_refresh=DEFAULT_MAX_REFRESH, budget=DEFAULT_BUDGET):
+        self.max_refresh = max_refresh
+        self.budget = budget
+        self.entries = {}
+        self.refreshed_at = None
+        self.scan_seconds = 0.0
+        self.scanned = 0
+        self.denied = 0
+        self.unregistered = 0
+        self._by_pid = {}
+        self._queue = deque()
+        # 串行化刷新；已发布的结果按引用整体替换，读方不加锁
+        self._refresh_lock = threading.Lock()
+        self._published = None
+        self._publish()
+
+    def refresh(self):
+        """刷新一次进程表，返回 (进程数, 线程数)"""
+        started = time.perf_counter()
+        now = time.monotonic()
+        pids = set(psutil.pids())
+        with self._refresh_lock:
+            # 退出的进程
+            for pid in [pid for pid in self._by_pid if pid not in pids]:
+                del self.entries[self._by_pid.pop(pid)]
+            # 新进程：放到队首，尽快完成首次读取。创建 psutil.Process 同样计入本次刷新的数量与耗时预算
+            # （首次刷新时所有进程都是新的），超出时其余进程留到之后的刷新再登记
+            deadline = started + self.budget
+            remaining = self.max_refresh
+            unregistered = 0
+            for pid in pids:
+                if pid in self._by_pid:
+                    continue
+                # 每次刷新至少登记 / 读取一个进程，保证进展
+                if remaining <= 0 or remaining < self.max_refresh and time.perf_counter() >= deadline:
+                    unregistered += 1
+                    continue
+                remaining -= 1
+                try:
+                    process = psutil.Process(pid)
+                    key = (pid, process.create_time())
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+                self.entries[key] = ProcessEntry(process)
+                self._by_pid[pid] = key
+                self._queue.appendleft(key)
+
+            scanned = denied = 0
+            for _ in range(min(len(self._queue), remaining)):
+                if scanned and time.perf_counter() >= deadline:
+                    break
+                key = self._queue.popleft()
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                try:
+                    # is_running 会比较 create_time，pid 被复用时旧表项作废
+                    if not entry.process.is_running():
+                        raise psutil.NoSuchProcess(key[0])
+                    entry.refresh(now)
+                except psutil.AccessDenied:
+                    denied += 1
+                except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                    # 进程已退出（或 pid 已被复用），下次刷新时重新登记
+                    del self.entries[key]
+                    self._by_pid.pop(key[0], None)
+                    continue
+                self._queue.append(key)
+                scanned += 1
+
+            self.refreshed_at = time.time()
+            self.scanned = scanned
+            self.denied = denied
+            self.unregistered = unregistered
+            self.scan_seconds = time.perf_counter() - started
+            threads = sum(entry.threads for entry in self.entries.values() if entry.threads)
+            self._publish()
+            return len(pids), threads
+
+    def _publish(self):
+        rows = tuple(entry.to_dict() for entry in self.entries.values())
+        stats = {
+            "total": len(rows),
+            "scanned": self.scanned,
+            "denied": self.denied,
+            "pending": max(0, len(rows) - self.scanned) + self.unregistered,
+            "scanSeconds": self.scan_seconds,
+            "refreshedAt": self.refreshed_at,
+        }
+        # 排序结果按排序方式在首次 top() 时计算并缓存在这份结果中
+        self._published = (rows, stats, {})
+
+    def top(self, n=20, sort="cpu"):
+        """按 sort 返回占用最高的 n 个进程；没有该指标的进程排在最后"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        rows, _, ranked = self._published
+        order = ranked.get(sort)
+        if order is None:
+            values = [(sort_value(row, sort), row) for row in rows]
+            values.sort(key=lambda item: (item[0] is not None, item[0] or 0), reverse=True)
+            order = ranked[sort] = [row for _, row in values]
+        return [dict(row) for row in order[:n]]
+
+    def stats(self):
+        return dict(self._published[1])
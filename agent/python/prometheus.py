@@ -0,0 +1,197 @@
+import math
+from functools import lru_cache
+
+# Prometheus 文本格式与 OpenMetrics；协商时只比较媒体类型本身，响应头带上版本参数
+PROMETHEUS_TEXT = "text/plain"
+OPENMETRICS = "application/openmetrics-text"
+CONTENT_TYPES = {
+    PROMETHEUS_TEXT: "text/plain; version=0.0.4; charset=utf-8",
+    OPENMETRICS: "application/openmetrics-text; version=1.0.0; charset=utf-8",
+}
+
+PREFIX = "macmonitor_"
+
+# 标签字符串缓存上限：网卡 / 磁盘 / 挂载点数量有限，正常情况下远达不到
+LABEL_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def format_labels(labels):
+    """((name, value), ...) -> '{name="value",...}'，按标签集合缓存，转义只做一次"""
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def section(status, key):
+    value = status.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def scalar(*path, scale=None):
+    """取嵌套字段的单个样本；字段缺失或为 None 时不输出"""
+    def extract(status):
+        value = status
+        for key in path:
+            if not isinstance(value, dict):
+                return
+            value = value.get(key)
+        if value is None:
+            return
+        yield (), value * scale if scale is not None else value
+    return extract
+
+
+def per_core(status):
+    for core, usage in enumerate(section(status, "cpu").get("perCore") or ()):
+        yield (("core", str(core)),), usage
+
+
+def cpu_times(status):
+    for mode, ratio in (section(status, "cpu").get("times") or {}).items():
+        if ratio is not None:
+            yield (("mode", mode),), ratio
+
+
+def volumes(field):
+    def extract(status):
+        for volume in section(status, "disk").get("volumes") or ():
+            labels = (("mountpoint", volume["mountpoint"]), ("device", volume["device"]), ("fstype", volume["fstype"]))
+            yield labels, volume[field]
+    return extract
+
+
+def disk_io(field, scale=None):
+    def extract(status):
+        for disk, io in sorted((section(status, "diskIO").get("disks") or {}).items()):
+            value = io[field]
+            yield (("disk", disk),), value * scale if scale is not None else value
+    return extract
+
+
+def interfaces(field):
+    def extract(status):
+        for nic, io in sorted((section(status, "network").get("interfaces") or {}).items()):
+            yield (("interface", nic),), io[field]
+    return extract
+
+
+def agent_histograms(kind, label):
+    """Agent 自身的耗时直方图（来自 instrumentation.Timings.to_dict）"""
+    def extract(status):
+        for name, histogram in sorted((section(status, "agent").get("timings") or {}).get(kind, {}).items()):
+            yield (((label, name),) if label else ()), histogram
+    return extract
+
+
+# (名称, 类型, 说明, 取值函数)；counter 的名称不带 _total 后缀，渲染时按格式补上
+FAMILIES = [
+    ("cpu_usage_ratio", "gauge", "Overall CPU busy ratio (0-1)", scalar("cpu", "usage")),
+    ("cpu_core_usage_ratio", "gauge", "Per-core CPU busy ratio (0-1)", per_core),
+    ("cpu_time_ratio", "gauge", "Share of CPU time spent in each mode (0-1)", cpu_times),
+    ("cpu_cores", "gauge", "Number of logical CPU cores", scalar("cpu", "coreCount")),
+    ("cpu_frequency_hertz", "gauge", "Current CPU frequency", scalar("cpu", "frequency", scale=1e9)),
+    ("cpu_temperature_celsius", "gauge", "CPU temperature", scalar("cpu", "temperature")),
+    ("memory_total_bytes", "gauge", "Total physical memory", scalar("memory", "total")),
+    ("memory_used_bytes", "gauge", "Used physical memory", scalar("memory", "used")),
+    ("memory_available_bytes", "gauge", "Available physical memory", scalar("memory", "free")),
+    ("memory_pressure_ratio", "gauge", "Memory pressure (0-1)", scalar("memory", "pressure")),
+    ("filesystem_size_bytes", "gauge", "Filesystem size per mountpoint", volumes("total")),
+    ("filesystem_used_bytes", "gauge", "Filesystem used bytes per mountpoint", volumes("used")),
+    ("filesystem_free_bytes", "gauge", "Filesystem free bytes per mountpoint", volumes("free")),
+    ("disk_read_bytes_per_second", "gauge", "Disk read throughput", disk_io("readBytes")),
+    ("disk_write_bytes_per_second", "gauge", "Disk write throughput", disk_io("writeBytes")),
+    ("disk_read_ops_per_second", "gauge", "Disk read operations per second", disk_io("readOps")),
+    ("disk_write_ops_per_second", "gauge", "Disk write operations per second", disk_io("writeOps")),
+    ("disk_service_time_seconds", "gauge", "Average disk service time per operation",
+     disk_io("serviceTime", scale=0.001)),
+    ("network_receive_bytes_per_second", "gauge", "Network receive throughput", interfaces("bytesIn")),
+    ("network_transmit_bytes_per_second", "gauge", "Network transmit throughput", interfaces("bytesOut")),
+    ("network_receive_packets", "counter", "Packets received since boot", interfaces("packetsIn")),
+    ("network_transmit_packets", "counter", "Packets sent since boot", interfaces("packetsOut")),
+    ("uptime_seconds", "gauge", "Seconds since boot", scalar("uptime")),
+    ("processes", "gauge", "Number of processes", scalar("processCount")),
+    ("threads", "gauge", "Number of threads", scalar("threadCount")),
+    ("battery_level_ratio", "gauge", "Battery charge level (0-1)", scalar("batteryLevel")),
+    ("battery_charging", "gauge", "Whether the battery is charging", scalar("isCharging")),
+    ("sample_timestamp_seconds", "gauge", "Unix time the snapshot was sampled", scalar("sampledAt")),
+    ("agent_cpu_ratio", "gauge", "Agent CPU usage as a fraction of one core", scalar("agent", "process", "cpu")),
+    ("agent_cpu_seconds", "counter", "Agent CPU time", scalar("agent", "process", "cpuSeconds")),
+    ("agent_resident_memory_bytes", "gauge", "Agent resident memory", scalar("agent", "process", "rss")),
+    ("agent_threads", "gauge", "Agent thread count", scalar("agent", "process", "threads")),
+    ("agent_snapshot_age_seconds", "gauge", "Age of the latest snapshot when rendered", scalar("agent", "snapshotAge")),
+    ("agent_stream_subscribers", "gauge", "Connected stream subscribers", scalar("agent", "queues", "streamSubscribers")),
+    ("agent_stream_pending", "gauge", "Stream subscribers with an undelivered snapshot",
+     scalar("agent", "queues", "streamPending")),
+    ("agent_exporter_pending", "gauge", "Snapshots waiting to be pushed", scalar("agent", "queues", "exporterPending")),
+    ("agent_exporter_spooled", "gauge", "Batches waiting in the export spool", scalar("agent", "queues", "exporterSpooled")),
+    ("agent_alerts_firing", "gauge", "Alert rules currently firing", scalar("agent", "alerts", "firing")),
+    ("agent_collector_duration_seconds", "histogram", "Time spent in each collector", agent_histograms("collector", "collector")),
+    ("agent_snapshot_duration_seconds", "histogram", "Time spent sampling and publishing a snapshot",
+     agent_histograms("snapshot", "stage")),
+    ("agent_encode_duration_seconds", "histogram", "Time spent serializing responses", agent_histograms("encode", "format")),
+    ("agent_compress_duration_seconds", "histogram", "Time spent compressing responses",
+     agent_histograms("compress", "encoding")),
+    ("agent_route_duration_seconds", "histogram", "Time until each HTTP route starts responding",
+     agent_histograms("route", "route")),
+    ("agent_loop_lag_seconds", "histogram", "Event loop scheduling lag", agent_histograms("loop", None)),
+]
+
+
+@lru_cache(maxsize=None)
+def family_header(name, kind, help_text, openmetrics):
+    # 文本格式 0.0.4 中 counter 的 TYPE 行使用带 _total 的样本名，OpenMetrics 使用族名
+    family = PREFIX + name
+    if kind == "counter" and not openmetrics:
+        family += "_total"
+    return f"# HELP {family} {help_text}\n# TYPE {family} {kind}\n"
+
+
+def histogram_lines(sample, labels, histogram):
+    """累计桶（le）、+Inf、_sum 与 _count"""
+    for bound, count in histogram["buckets"].items():
+        yield f"{sample}_bucket{format_labels(labels + (('le', bound),))} {count}\n"
+    yield f"{sample}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram['count']}\n"
+    yield f"{sample}_sum{format_labels(labels)} {format_value(histogram['sum'])}\n"
+    yield f"{sample}_count{format_labels(labels)} {histogram['count']}\n"
+
+
+def render(status, openmetrics=False):
+    """把状态快照渲染为 Prometheus 文本格式（或 OpenMetrics），没有样本的指标族整体省略"""
+    lines = []
+    for name, kind, help_text, extract in FAMILIES:
+        sample = PREFIX + name + ("_total" if kind == "counter" else "")
+        if kind == "histogram":
+            samples = [line for labels, histogram in extract(status) for line in histogram_lines(sample, labels, histogram)]
+        else:
+            samples = [f"{sample}{format_labels(labels)} {format_value(value)}\n" for labels, value in extract(status)]
+        if samples:
+            lines.append(family_header(name, kind, help_text, openmetrics))
+            lines.extend(samples)
+    if openmetrics:
+        lines.append("# EOF\n")
+    return "".join(lines).encode()
+
+
+def encode_prometheus(payload):
+    return render(payload)
+
+
+def encode_openmetrics(payload):
+    return render(payload, openmetrics=True)
@@ -0,0 +1,51 @@
+import time
+
+
+class CounterRate:
+    """把单调递增的计数器换算为每秒速率 / Turn monotonic counters into per-second rates
+
+    速率按固定窗口计算：距上次基准不足一个窗口时直接返回上次结果，
+    不移动基准，因此调用频率不会影响计算窗口。可选 EWMA 平滑（alpha 取 0~1）。
+    """
+
+    # 允许调度抖动：达到窗口的 90% 即视为满一个窗口
+    WINDOW_TOLERANCE = 0.9
+
+    def __init__(self, window=1.0, alpha=None):
+        self.window = window
+        self.alpha = alpha
+        self.rates = {}
+        self._base = None
+        self._base_time = None
+
+    def update(self, counters, now=None):
+        """输入 {key: 计数器值}，返回 {key: 每秒速率}"""
+        if now is None:
+            now = time.monotonic()
+
+        if self._base is None:
+            self._base = dict(counters)
+            self._base_time = now
+            self.rates = {key: 0.0 for key in counters}
+            return self.rates
+
+        elapsed = now - self._base_time
+        if elapsed < self.window * self.WINDOW_TOLERANCE:
+            return self.rates
+
+        rates = {}
+        for key, value in counters.items():
+            previous = self._base.get(key)
+            # 新出现的 key 或计数器回绕/重置时，本窗口速率记为 0
+            if previous is None or value < previous:
+                rate = 0.0
+            else:
+                rate = (value - previous) / elapsed
+            if self.alpha is not None and key in self.rates:
+                rate = self.alpha * rate + (1 - self.alpha) * self.rates[key]
+            rates[key] = rate
+
+        self.rates = rates
+        self._base = dict(counters)
+        self._base_time = now
+        return rates
@@ -0,0 +1,151 @@
+import gzip
+import hashlib
+import time
+import zlib
+from collections import namedtuple
+
+import msgpack
+
+from encoding import JSON, MSGPACK, encode, parse_qvalues
+from instrumentation import Timings
+from prometheus import OPENMETRICS, PROMETHEUS_TEXT
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 小于该长度的响应不压缩，压缩收益抵不过开销
+MIN_COMPRESS_SIZE = 256
+
+FORMAT_TAGS = {JSON: "json", MSGPACK: "msgpack", PROMETHEUS_TEXT: "prom", OPENMETRICS: "openmetrics"}
+
+CachedResponse = namedtuple("CachedResponse", ["body", "etag", "media_type", "content_encoding", "digest"])
+
+
+def choose_encoding(accept_encoding):
+    """按 Accept-Encoding（含 q 值）选择压缩方式，q 值相同时 br 优先于 gzip；没有可接受的压缩方式时不压缩"""
+    if not accept_encoding:
+        return None
+    accepted = dict(parse_qvalues(accept_encoding))
+    best, best_q = None, 0.0
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 是否命中（支持 *，按弱比较忽略 W/ 前缀）"""
+    if not if_none_match:
+        return False
+    etag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+class ResponseCache:
+    """按快照 generation 缓存序列化（及压缩）后的响应体
+
+    每个 generation 下，每种 (格式, 压缩方式) 只编码一次。ETag 是基于内容的弱校验值：快照数据
+    （不含每次采样都会变化的 timestamp / sampledAt）的 blake2b 摘要，每个 generation 每种字段组合只计算一次；
+    摘要与上一个 generation 相同时直接沿用上一份响应，ETag 与响应体都不变，轮询的客户端可以拿到 304。
+    """
+
+    def __init__(self, timings=None):
+        self.timings = timings if timings is not None else Timings()
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0
+        self._generation = None
+        self._entries = {}
+        self._previous = {}
+        self._digests = {}
+
+    def get(self, snapshot, media_type, content_encoding=None, payload=None, fields=None):
+        """fields 为需要的顶层字段集合（None 表示全部）；payload 可以是函数，只在需要编码时调用"""
+        if snapshot.generation != self._generation:
+            self._previous = self._entries
+            self._entries = {}
+            self._digests = {}
+            self._generation = snapshot.generation
+        key = (media_type, content_encoding, fields)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        identity = self._entries.get((media_type, None, fields))
+        if identity is not None:
+            body, content_digest = identity.body, identity.digest
+        else:
+            body = None
+            if payload is None:
+                status = snapshot.status
+                if fields:
+                    status = {key: value for key, value in status.items() if key in fields or key == "timestamp"}
+                content_digest = self._status_digest(status, fields)
+            else:
+                if callable(payload):
+                    payload = payload()
+                body = self._encode(payload, media_type)
+                content_digest = digest(body)
+            previous = self._previous.get(key)
+            if previous is not None and previous.digest == content_digest:
+                self.reused += 1
+                self._entries[key] = previous
+                return previous
+            if body is None:
+                body = self._encode(dict(status, sampledAt=snapshot.sampled_at), media_type)
+
+        if content_encoding is not None and len(body) < MIN_COMPRESS_SIZE:
+            content_encoding = None
+        if content_encoding is not None:
+            started = time.perf_counter()
+            if content_encoding == "gzip":
+                body = gzip.compress(body, compresslevel=6)
+            elif content_encoding == "br":
+                body = brotli.compress(body)
+            self.timings.observe("compress", content_encoding, time.perf_counter() - started)
+
+        tag = FORMAT_TAGS.get(media_type, "bin")
+        if fields:
+            # 不同字段子集是不同的表示形式，ETag 需要区分
+            tag += "-" + format(zlib.crc32(",".join(sorted(fields)).encode()), "08x")
+        suffix = f"-{content_encoding}" if content_encoding else ""
+        etag = f'W/"{tag}-{content_digest}{suffix}"'
+        entry = CachedResponse(body, etag, media_type, content_encoding, content_digest)
+        self._entries[key] = entry
+        if content_encoding is None and key[1] is not None:
+            self._entries[(media_type, None, fields)] = entry
+        return entry
+
+    def _encode(self, payload, media_type):
+        started = time.perf_counter()
+        body = encode(payload, media_type)
+        self.timings.observe("encode", FORMAT_TAGS.get(media_type, "bin"), time.perf_counter() - started)
+        return body
+
+    def _status_digest(self, status, fields):
+        # 与格式无关：同一 generation 下 JSON 与 msgpack 共用一次摘要
+        content_digest = self._digests.get(fields)
+        if content_digest is None:
+            stable = {key: value for key, value in status.items() if key != "timestamp"}
+            content_digest = digest(msgpack.packb(stable, use_bin_type=True))
+            self._digests[fields] = content_digest
+        return content_digest
@@ -0,0 +1,238 @@
+import math
+import threading
+
+from history import (
+    DEFAULT_AGGREGATES, NAN, RingBuffer, default_step, extract_metric, select_aggregates
+)
+
+# 默认降采样层级：(分辨率秒, 保留桶数)
+#   10 秒 × 1 天、1 分钟 × 7 天、1 小时 × 90 天
+DEFAULT_TIERS = [
+    (10, 8640),
+    (60, 10080),
+    (3600, 2160),
+]
+
+# 每个桶保存的聚合值；avg 由 sum / count 得到
+FIELDS = ("min", "max", "sum", "last", "count")
+
+
+class RollupTier:
+    """单个降采样层级：每个指标按 FIELDS 各保存一个环形缓冲区
+
+    新数据先累积到当前未关闭的桶中，桶关闭时写入环形缓冲区，
+    并把整个桶继续合并到下一层级，因此每层只处理上一层关闭的桶。
+    """
+
+    def __init__(self, resolution, capacity, metrics):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.metrics = list(metrics)
+        self.timestamps = RingBuffer(capacity)
+        self.columns = {name: {field: RingBuffer(capacity) for field in FIELDS} for name in self.metrics}
+        self.next_tier = None
+        self.prev_tier = None
+        self._head = 0
+        self._size = 0
+        self._open_start = None
+        self._open = None
+
+    @property
+    def memory_bytes(self):
+        return (len(self.metrics) * len(FIELDS) + 1) * self.capacity * 8
+
+    def oldest(self):
+        if self._size:
+            return self.timestamps.data[(self._head - self._size) % self.capacity]
+        return self._open_start
+
+    def add_sample(self, timestamp, values):
+        """合并一个原始采样点"""
+        self.merge(timestamp, {name: (v, v, v, v, 1) for name, v in values.items() if v == v})
+
+    def merge(self, timestamp, aggregates):
+        """合并一个来自下层的桶：aggregates 为 {metric: (min, max, sum, last, count)}"""
+        bucket_start = math.floor(timestamp / self.resolution) * self.resolution
+        if bucket_start != self._open_start:
+            if self._open_start is not None:
+                self._close()
+            self._open_start = bucket_start
+            self._open = {}
+
+        merge_into(self._open, aggregates)
+
+    def _close(self):
+        index = self._head
+        self.timestamps.data[index] = self._open_start
+        for name, fields in self.columns.items():
+            acc = self._open.get(name)
+            if acc is None:
+                for field in FIELDS:
+                    fields[field].data[index] = NAN
+                fields["count"].data[index] = 0
+            else:
+                for field, value in zip(FIELDS, acc):
+                    fields[field].data[index] = value
+        self._head = (index + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+        if self.next_tier is not None:
+            self.next_tier.merge(self._open_start, {name: tuple(acc) for name, acc in self._open.items()})
+
+    def pending(self):
+        """尚未关闭的桶：本层当前桶，加上下层尚未合并上来的数据（按本层分辨率重新分桶）"""
+        buckets = {}
+        if self.prev_tier is not None:
+            for bucket_start, accs in self.prev_tier.pending():
+                start = math.floor(bucket_start / self.resolution) * self.resolution
+                merge_into(buckets.setdefault(start, {}), accs)
+        if self._open_start is not None:
+            merge_into(buckets.setdefault(self._open_start, {}), self._open)
+        return sorted(buckets.items())
+
+    def range(self, metrics, start, end):
+        """返回 [start, end) 内的桶（包括尚未关闭的桶）：(timestamps, {metric: {field: values}})"""
+        lo = self.timestamps.bisect(self._head, self._size, start)
+        hi = self.timestamps.bisect(self._head, self._size, end)
+        times = list(self.timestamps.slice(self._head, self._size, lo, hi))
+        values = {
+            name: {field: list(self.columns[name][field].slice(self._head, self._size, lo, hi)) for field in FIELDS}
+            for name in metrics
+        }
+        for bucket_start, accs in self.pending():
+            if not start <= bucket_start < end:
+                continue
+            times.append(bucket_start)
+            for name in metrics:
+                acc = accs.get(name)
+                for i, field in enumerate(FIELDS):
+                    values[name][field].append(acc[i] if acc else (0 if field == "count" else NAN))
+        return times, values
+
+    def query(self, metrics, start, end, step, aggregates=DEFAULT_AGGREGATES):
+        times, values = self.range(metrics, start, end)
+        return merge_buckets(times, values, start, end, step, aggregates)
+
+
+def merge_into(target, aggregates):
+    """把 {metric: (min, max, sum, last, count)} 合并进累加器字典 target"""
+    for name, (lo, hi, total, last, count) in aggregates.items():
+        acc = target.get(name)
+        if acc is None:
+            target[name] = [lo, hi, total, last, count]
+        else:
+            if lo < acc[0]:
+                acc[0] = lo
+            if hi > acc[1]:
+                acc[1] = hi
+            acc[2] += total
+            acc[3] = last
+            acc[4] += count
+
+
+def merge_buckets(times, values, start, end, step, aggregates=DEFAULT_AGGREGATES):
+    """把降采样桶再按 step 合并；输出格式与 history.downsample 相同"""
+    buckets = []
+    bucket_index = {}
+    for t in times:
+        bucket = int((t - start) // step)
+        if bucket not in bucket_index:
+            bucket_index[bucket] = len(buckets)
+            buckets.append(bucket)
+
+    series = {}
+    for name, fields in values.items():
+        mins = [None] * len(buckets)
+        maxs = [None] * len(buckets)
+        sums = [0.0] * len(buckets)
+        lasts = [None] * len(buckets)
+        counts = [0] * len(buckets)
+        for t, lo, hi, total, last, count in zip(
+            times, fields["min"], fields["max"], fields["sum"], fields["last"], fields["count"]
+        ):
+            if not count:
+                continue
+            i = bucket_index[int((t - start) // step)]
+            if counts[i] == 0:
+                mins[i], maxs[i] = lo, hi
+            else:
+                if lo < mins[i]:
+                    mins[i] = lo
+                if hi > maxs[i]:
+                    maxs[i] = hi
+            sums[i] += total
+            lasts[i] = last
+            counts[i] += int(count)
+        series[name] = select_aggregates(aggregates, mins, maxs, sums, lasts, counts)
+
+    return {
+        "from": start,
+        "to": end,
+        "step": step,
+        "timestamps": [start + b * step for b in buckets],
+        "series": series,
+    }
+
+
+class RollupHistory:
+    """多分辨率历史：原始数据源 + 增量维护的降采样层级，并负责查询规划"""
+
+    def __init__(self, raw_sources, metrics, tiers=None):
+        self.raw_sources = list(raw_sources)
+        self.metrics = list(metrics)
+        self.tiers = [RollupTier(resolution, capacity, self.metrics) for resolution, capacity in (tiers or DEFAULT_TIERS)]
+        for lower, upper in zip(self.tiers, self.tiers[1:]):
+            lower.next_tier = upper
+            upper.prev_tier = lower
+        self._lock = threading.Lock()
+
+    @property
+    def memory_bytes(self):
+        return sum(tier.memory_bytes for tier in self.tiers)
+
+    def record(self, snapshot):
+        """采集器回调：把快照增量合并到最细的层级"""
+        status = snapshot.status
+        values = {name: extract_metric(status, name) for name in self.metrics}
+        with self._lock:
+            self.tiers[0].add_sample(snapshot.sampled_at, values)
+
+    def plan(self, start, end, step):
+        """选择满足 step 的最粗数据源：分辨率不超过 step，且尽量覆盖整个区间"""
+        candidates = [source for source in self.raw_sources if source is not None]
+        candidates += self.tiers
+        eligible = [source for source in candidates if source.resolution <= step]
+        coarser = [source for source in candidates if source.resolution > step]
+
+        # 先按分辨率从粗到细找能覆盖起点的数据源
+        eligible.sort(key=lambda source: source.resolution, reverse=True)
+        for source in eligible:
+            oldest = source.oldest()
+            if oldest is not None and oldest <= start:
+                return source
+
+        # 都覆盖不到时（例如起点早于第一个采样点），从细到粗选有数据的数据源；
+        # 层级的 oldest() 向下取整到自身分辨率，只有数据确实更早（超出一个桶）时才换用更粗的层级
+        eligible.reverse()
+        coarser.sort(key=lambda source: source.resolution)
+        best = None
+        for source in eligible + coarser:
+            oldest = source.oldest()
+            if oldest is None:
+                continue
+            if best is None or oldest + source.resolution <= best.oldest():
+                best = source
+        return best or (eligible + coarser)[0]
+
+    def query(self, metrics, start, end, step=None, aggregates=DEFAULT_AGGREGATES):
+        if step is None or step <= 0:
+            step = default_step(start, end)
+        source = self.plan(start, end, step)
+        if isinstance(source, RollupTier):
+            with self._lock:
+                result = source.query(metrics, start, end, step, aggregates)
+        else:
+            result = source.query(metrics, start, end, step, aggregates)
+        result["resolution"] = source.resolution
+        return result
@@ -0,0 +1,549 @@
+import asyncio
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+import msgpack
+import psutil
+
+from alerts import AlertEngine
+from budget import OverheadBudget
+from collector import DEFAULT_DEMAND_TTL, Snapshot, StatusCollector
+from history import DEFAULT_METRICS, PINNED_METRICS
+from instrumentation import Timings
+from processes import MAX_TOP, SORT_KEYS
+from storage import SegmentStore
+from system_monitor import COLLECTORS, SystemMonitor, collectors_for_fields
+
+# 共享内存布局：序号 | 数据长度 | CPU 核数 | 各采集项的需求到期时间 | 编码后的最新快照
+SEQUENCE = struct.Struct("<Q")
+LENGTH = struct.Struct("<Q")
+CORES = struct.Struct("<Q")
+DEMAND = struct.Struct(f"<{len(COLLECTORS)}d")
+CORES_OFFSET = SEQUENCE.size + LENGTH.size
+DEMAND_OFFSET = CORES_OFFSET + CORES.size
+PAYLOAD_OFFSET = DEMAND_OFFSET + DEMAND.size
+DEFAULT_SIZE = 4 * 1024 * 1024
+
+# 工作进程检查新快照、采样进程检查新需求的间隔（秒）
+POLL_INTERVAL = 0.02
+# 订阅（acquire）产生的需求每次刷新的保持时间（秒），工作进程退出后随之过期
+HOLD_SECONDS = 5
+# 请求的采集项不在快照中时，最多等待采样进程补采的时间（秒）
+SAMPLE_TIMEOUT = 2.0
+# 发现服务状态写入共享快照的间隔（秒）
+PEERS_INTERVAL = 1.0
+# 工作进程内存历史的默认长度（采样次数）；每个工作进程各保存一份，更早的数据由降采样层级与磁盘存储提供
+WORKER_HISTORY_CAPACITY = 3600
+
+
+class SharedSnapshot:
+    """共享内存中的最新快照与各采集项的需求
+
+    快照只有一个写入方（采样进程），用 seqlock 保护：写入前后各递增一次序号，数据长度与数据都在两次递增之间写入，
+    读方先读到偶数序号、再读长度与数据，最后序号不变才算读到完整数据。需求区每个采集项一个到期时间（time.time()），
+    各工作进程取最大值写入；并发写入偶尔丢失的更新会在下一次刷新时补上。
+    CPU 核数由采样进程在创建时写入一次，工作进程不必自己调用 psutil。
+    """
+
+    def __init__(self, memory, owner=False):
+        self.memory = memory
+        self.owner = owner
+        self.buf = memory.buf
+
+    @classmethod
+    def create(cls, size=DEFAULT_SIZE):
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        memory.buf[:PAYLOAD_OFFSET] = bytes(PAYLOAD_OFFSET)
+        CORES.pack_into(memory.buf, CORES_OFFSET, psutil.cpu_count() or 0)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    @property
+    def cores(self):
+        return CORES.unpack_from(self.buf, CORES_OFFSET)[0]
+
+    @property
+    def capacity(self):
+        return len(self.buf) - PAYLOAD_OFFSET
+
+    def sequence(self):
+        return SEQUENCE.unpack_from(self.buf)[0]
+
+    def write(self, payload):
+        if len(payload) > self.capacity:
+            raise ValueError(f"Snapshot of {len(payload)} bytes exceeds shared memory capacity {self.capacity}")
+        seq = self.sequence()
+        SEQUENCE.pack_into(self.buf, 0, seq + 1)
+        LENGTH.pack_into(self.buf, SEQUENCE.size, len(payload))
+        self.buf[PAYLOAD_OFFSET:PAYLOAD_OFFSET + len(payload)] = payload
+        SEQUENCE.pack_into(self.buf, 0, seq + 2)
+
+    def read(self, since=None):
+        """返回 (序号, 数据)；序号等于 since（没有新快照）或尚未写入时返回 None"""
+        while True:
+            seq = self.sequence()
+            if seq == 0 or seq == since:
+                return None
+            if seq % 2:
+                time.sleep(0)
+                continue
+            # 长度只在序号确认未变后才可信；读到一半被改写时长度可能越界
+            length = min(LENGTH.unpack_from(self.buf, SEQUENCE.size)[0], self.capacity)
+            payload = bytes(self.buf[PAYLOAD_OFFSET:PAYLOAD_OFFSET + length])
+            if self.sequence() == seq:
+                return seq, payload
+
+    def request(self, names, until):
+        """登记需求：names 中的采集项至少运行到 until"""
+        expiry = list(DEMAND.unpack_from(self.buf, DEMAND_OFFSET))
+        changed = False
+        for i, name in enumerate(COLLECTORS):
+            if name in names and expiry[i] < until:
+                expiry[i] = until
+                changed = True
+        if changed:
+            DEMAND.pack_into(self.buf, DEMAND_OFFSET, *expiry)
+
+    def demand(self, now=None):
+        """{采集项: 剩余秒数}，只含尚未过期的需求"""
+        now = time.time() if now is None else now
+        return {name: until - now for name, until in zip(COLLECTORS, DEMAND.unpack_from(self.buf, DEMAND_OFFSET))
+                if until > now}
+
+    def close(self):
+        self.buf = None
+        self.memory.close()
+
+    def unlink(self):
+        if self.owner:
+            self.memory.unlink()
+
+
+def encode_snapshot(snapshot, stats, processes=None, peers=None, alerts=None):
+    collectors = sorted(snapshot.collectors) if snapshot.collectors is not None else None
+    updated = sorted(snapshot.updated) if snapshot.updated is not None else None
+    return msgpack.packb([snapshot.generation, snapshot.sampled_at, snapshot.status, collectors, updated,
+                          stats, processes, peers, alerts], use_bin_type=True)
+
+
+def decode_snapshot(payload):
+    """返回 (快照, 采集器统计, 编码后的进程表、发现服务状态与告警状态，缺失的为 None)"""
+    (generation, sampled_at, status, collectors, updated, stats, processes, peers,
+     alerts) = msgpack.unpackb(payload, raw=False)
+    snapshot = Snapshot(generation, sampled_at, status,
+                        frozenset(collectors) if collectors is not None else None,
+                        frozenset(updated) if updated is not None else None)
+    return snapshot, stats, processes, peers, alerts
+
+
+class SharedSampler:
+    """采样进程：按采集器的节奏采样，把每份快照写入共享内存
+
+    工作进程登记的需求每 poll_interval 秒读取一次，新需要的采集项立即补采，
+    不必等到下一个采样周期。磁盘存储、推送导出、告警与 Bonjour 发布等只需运行一份的子系统
+    作为快照回调挂在采集器上，在本进程中运行；告警状态随每份快照编码，工作进程据此推送告警事件。
+    局域网发现服务也只在本进程中运行，其状态每 PEERS_INTERVAL 秒编码一次，随快照一起提供给工作进程的 /api/peers。
+    """
+
+    def __init__(self, collector, shared, processes=None, poll_interval=POLL_INTERVAL, services=(), publisher=None,
+                 store=None, discovery=None, alerts=None):
+        self.collector = collector
+        self.shared = shared
+        self.processes = processes
+        self.poll_interval = poll_interval
+        # 随采样进程启停的子系统（推送导出、告警 Webhook），以及停止时需要关闭的磁盘存储
+        self.services = list(services)
+        self.publisher = publisher
+        self.discovery = discovery
+        self.store = store
+        self.alerts = alerts
+        self.published = 0
+        self._process_payload = None
+        self._peers_payload = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._loop = None
+        self._loop_thread = None
+        self._peers_task = None
+        collector.add_listener(self.publish)
+
+    def publish(self, snapshot):
+        """采集器回调：编码并写入共享内存；进程表只在 processes 采集项运行后重新编码"""
+        collectors = snapshot.collectors if snapshot.collectors is not None else COLLECTORS
+        if self.processes is None or "processes" not in collectors:
+            self._process_payload = None
+        elif self._process_payload is None or snapshot.updated is None or "processes" in snapshot.updated:
+            tables = {key: self.processes.top(MAX_TOP, key) for key in SORT_KEYS}
+            self._process_payload = msgpack.packb([self.processes.stats(), tables], use_bin_type=True)
+        alerts = None
+        if self.alerts is not None:
+            # 告警引擎的回调先于本回调注册，这里已包含本份快照的评估结果
+            engine = self.alerts
+            alerts = msgpack.packb([engine.to_dict(), engine.stats(), engine.active(), engine.emitted],
+                                   use_bin_type=True)
+        self.shared.write(encode_snapshot(snapshot, self.collector.stats(), self._process_payload,
+                                          self._peers_payload, alerts))
+        self.published += 1
+
+    def apply_demand(self):
+        for name, remaining in self.shared.demand().items():
+            self.collector.touch([name], ttl=remaining)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        for service in self.services:
+            service.start()
+        if self.publisher is not None or self.discovery is not None:
+            self._start_loop()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="shared-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._stop_async(), self._loop).result(timeout=10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=5)
+            self._loop = None
+        for service in self.services:
+            service.stop()
+        if self.store is not None:
+            self.store.close()
+
+    def _start_loop(self):
+        # Bonjour 发布（异步注册、地址变化时重新注册、TXT 负载更新）与发现服务需要事件循环，在单独的线程中运行
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="bonjour", daemon=True)
+        self._loop_thread.start()
+        asyncio.run_coroutine_threadsafe(self._start_async(), self._loop).result(timeout=5)
+
+    async def _start_async(self):
+        if self.publisher is not None:
+            await self.publisher.async_start()
+        if self.discovery is not None:
+            await self.discovery.start()
+            self._peers_task = asyncio.get_running_loop().create_task(self._share_peers())
+
+    async def _stop_async(self):
+        if self.publisher is not None:
+            await self.publisher.async_stop()
+        if self.discovery is not None:
+            self._peers_task.cancel()
+            await self.discovery.stop()
+
+    async def _share_peers(self):
+        # 发现服务的状态只在事件循环线程中读取，编码结果由采样线程随快照写入
+        while True:
+            self.update_peers()
+            await asyncio.sleep(PEERS_INTERVAL)
+
+    def update_peers(self):
+        self._peers_payload = msgpack.packb([self.discovery.to_dict(), self.discovery.stats()], use_bin_type=True)
+
+    def _run(self):
+        collector = self.collector
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self.apply_demand()
+                now = time.monotonic()
+                if now >= next_tick:
+                    collector.sample()
+                    # 按固定节奏调度，落后时不补采
+                    next_tick = max(next_tick + collector.interval, now)
+                else:
+                    missing = collector.missing(collector.demanded())
+                    if missing:
+                        collector.sample(missing)
+            except Exception as e:
+                print(f"❌ Failed to sample system status: {e}")
+            self._stop_event.wait(max(0.0, min(self.poll_interval, next_tick - time.monotonic())))
+
+
+def create_sampler(shared, sample_interval=1.0, net_smoothing=None, collector_intervals=None, disabled_collectors=(),
+                   data_dir=None, retention=7 * 86400, exporter=None, cpu_budget=None, battery_saver=True,
+                   alert_rules=None, alert_webhook=None, publisher=None, discovery=None,
+                   pinned_metrics=PINNED_METRICS):
+    """多进程模式的采样进程：采集配置与 create_app 相同，另外运行只需一份的子系统"""
+    monitor = SystemMonitor(cpu_interval=None, net_window=sample_interval, net_smoothing=net_smoothing)
+    budget = OverheadBudget(cpu_budget, battery_saver) if cpu_budget is not None or battery_saver else None
+    collector = StatusCollector(
+        monitor, interval=sample_interval, intervals=collector_intervals,
+        disabled=disabled_collectors, on_demand=True, budget=budget
+    )
+    services = []
+    # 磁盘存储只有一个写入方
+    store = None
+    if data_dir:
+        store = SegmentStore(data_dir, DEFAULT_METRICS, retention=retention, resolution=sample_interval)
+        collector.add_listener(store.record)
+        collector.acquire(collectors_for_fields(pinned_metrics))
+    if exporter is not None:
+        collector.add_listener(exporter.record)
+        collector.acquire(COLLECTORS)
+        services.append(exporter)
+    # 告警规则只在这里评估一次，工作进程的推送流与 /api/alerts 读取共享快照中的告警状态
+    engine = AlertEngine(alert_rules)
+    collector.add_listener(engine.record)
+    collector.acquire(set().union(*(rule.collectors for rule in engine.rules)))
+    if alert_webhook is not None:
+        engine.add_listener(alert_webhook.notify)
+        services.append(alert_webhook)
+    if publisher is not None:
+        collector.add_listener(publisher.record)
+    return SharedSampler(collector, shared, processes=monitor.processes, services=services, publisher=publisher,
+                         store=store, discovery=discovery, alerts=engine)
+
+
+class SharedPayload:
+    """采样进程预先编码的一块数据，在工作进程中首次使用时才解码"""
+
+    def __init__(self):
+        self._payload = None
+        self._decoded = None
+
+    def update(self, payload):
+        if payload is not self._payload:
+            self._payload = payload
+            self._decoded = None
+
+    def decoded(self):
+        if self._payload is None:
+            return None
+        if self._decoded is None:
+            self._decoded = msgpack.unpackb(self._payload, raw=False)
+        return self._decoded
+
+
+class SharedProcessTable(SharedPayload):
+    """工作进程中的进程表视图：按各排序方式预先排好的前 MAX_TOP 个进程，来自采样进程"""
+
+    def top(self, n=20, sort="cpu"):
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        tables = self.decoded()
+        return tables[1].get(sort, [])[:n] if tables else []
+
+    def stats(self):
+        tables = self.decoded()
+        return tables[0] if tables else {}
+
+
+class SharedPeers(SharedPayload):
+    """工作进程中的发现服务视图：接口与 DiscoveryService 相同，Agent 列表来自采样进程；
+    采样进程未运行发现服务时 to_dict() / stats() 返回 None"""
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def to_dict(self):
+        peers = self.decoded()
+        return peers[0] if peers else None
+
+    def stats(self):
+        peers = self.decoded()
+        return peers[1] if peers else None
+
+
+class SharedAlerts(SharedPayload):
+    """工作进程中的告警视图：接口与 AlertEngine 相同，规则由采样进程评估；
+    新的告警事件在读到快照时按顺序通知监听者（推送流）"""
+
+    def __init__(self):
+        super().__init__()
+        self._emitted = None
+        self._listeners = []
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def update(self, payload):
+        super().update(payload)
+        alerts = self.decoded()
+        if alerts is None:
+            return
+        emitted = alerts[3]
+        # 首次读到时只记录位置，已触发的告警由 active() 在订阅时补发
+        new = emitted - self._emitted if self._emitted is not None else 0
+        self._emitted = emitted
+        events = alerts[0]["events"]
+        for event in events[len(events) - min(new, len(events)):]:
+            for callback in self._listeners:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"⚠️  Alert listener failed: {e}")
+
+    def active(self):
+        alerts = self.decoded()
+        return alerts[2] if alerts else []
+
+    def to_dict(self):
+        alerts = self.decoded()
+        return alerts[0] if alerts else {"rules": [], "events": []}
+
+    def stats(self):
+        alerts = self.decoded()
+        return alerts[1] if alerts else {"rules": 0, "firing": 0, "fired": 0}
+
+
+class SharedCollector:
+    """工作进程使用的采集器：接口与 StatusCollector 相同，快照来自共享内存，本进程不运行任何采集项
+
+    后台线程每 poll_interval 秒检查一次新快照并调用快照回调；acquire / touch 的需求写入共享内存，
+    由采样进程据此决定运行哪些采集项。
+    """
+
+    def __init__(self, shared, interval=1.0, demand_ttl=DEFAULT_DEMAND_TTL, poll_interval=POLL_INTERVAL,
+                 timings=None):
+        self.shared = shared
+        self.interval = interval
+        self.demand_ttl = demand_ttl
+        self.poll_interval = poll_interval
+        self.timings = timings if timings is not None else Timings()
+        self.processes = SharedProcessTable()
+        self.peers = SharedPeers()
+        self.alerts = SharedAlerts()
+        self._stats = {}
+        self._refs = dict.fromkeys(COLLECTORS, 0)
+        self._snapshot = None
+        self._seq = None
+        self._held = 0.0
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    @property
+    def enabled(self):
+        return self._stats.get("enabled", list(COLLECTORS))
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def latest(self):
+        return self._snapshot
+
+    def acquire(self, names):
+        with self._lock:
+            for name in names:
+                if name in self._refs:
+                    self._refs[name] += 1
+        self.shared.request(names, time.time() + HOLD_SECONDS)
+
+    def release(self, names):
+        with self._lock:
+            for name in names:
+                if self._refs.get(name):
+                    self._refs[name] -= 1
+
+    def touch(self, names, ttl=None):
+        self.shared.request(names, time.time() + (self.demand_ttl if ttl is None else ttl))
+
+    def demanded(self):
+        with self._lock:
+            return {name for name, refs in self._refs.items() if refs > 0}
+
+    def missing(self, names):
+        wanted = [name for name in self.enabled if name in names]
+        snapshot = self._snapshot
+        if snapshot is None:
+            return wanted
+        if snapshot.collectors is None:
+            return []
+        return [name for name in wanted if name not in snapshot.collectors]
+
+    def sample(self, only=None):
+        """等待采样进程写入首份快照并补采 only 中的采集项（最多 SAMPLE_TIMEOUT 秒），返回最新快照"""
+        if only:
+            self.touch(only)
+        deadline = time.monotonic() + SAMPLE_TIMEOUT
+        while True:
+            self.poll()
+            if self._snapshot is not None and not (only and self.missing(only)) or time.monotonic() >= deadline:
+                return self._snapshot
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        """读取新快照并按顺序调用快照回调；没有新快照时返回 None"""
+        with self._poll_lock:
+            self._refresh_holds()
+            result = self.shared.read(since=self._seq)
+            if result is None:
+                return None
+            seq, payload = result
+            try:
+                snapshot, stats, processes, peers, alerts = decode_snapshot(payload)
+            except (ValueError, TypeError) as e:
+                # 保留上一份快照，不记录序号，下次轮询重新读取
+                print(f"⚠️  Failed to decode shared snapshot {seq}: {e}")
+                return None
+            self._seq = seq
+            self._stats = stats
+            self.processes.update(processes)
+            self.peers.update(peers)
+            self._snapshot = snapshot
+            self.alerts.update(alerts)
+            for callback in self._listeners:
+                try:
+                    callback(snapshot)
+                except Exception as e:
+                    print(f"⚠️  Snapshot listener failed: {e}")
+            return snapshot
+
+    def _refresh_holds(self):
+        # 订阅者持有的需求在到期前续期
+        now = time.time()
+        if now - self._held >= HOLD_SECONDS / 2:
+            self._held = now
+            held = self.demanded()
+            if held:
+                self.shared.request(held, now + HOLD_SECONDS)
+
+    def stats(self):
+        return dict(self._stats, shared={"name": self.shared.name, "sequence": self._seq})
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="shared-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"❌ Failed to read shared snapshot: {e}")
+            self._stop_event.wait(self.poll_interval)
@@ -0,0 +1,307 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+
+from history import DEFAULT_AGGREGATES, NAN, default_step, downsample, extract_metric
+
+# 段文件格式 / Segment file layout
+#
+#   [0, 4096)    文件头：magic、已提交记录数、容量、指标数、首/末时间戳、指标名（JSON）
+#   [4096, ...)  定长记录：timestamp + 每个指标一个 float64
+#
+# 写入顺序为“先写记录、后更新记录数”，进程崩溃时最多丢失最后一条未提交的记录。
+MAGIC = b"MMTS0001"
+HEADER_SIZE = 4096
+HEADER_STRUCT = struct.Struct("<8sQQQdd")
+COUNT_OFFSET = 8
+NAMES_OFFSET = 64
+
+
+class Segment:
+    """单个内存映射段文件"""
+
+    def __init__(self, path, mm, metrics, capacity, count, first, last, writable):
+        self.path = path
+        self.mm = mm
+        self.metrics = metrics
+        self.capacity = capacity
+        self.count = count
+        self.first = first
+        self.last = last
+        self.writable = writable
+        self.stride = len(metrics) + 1
+        self.view = memoryview(mm)[HEADER_SIZE:].cast("d")
+        if count and first is None:
+            # 首/末时间戳直接取自已提交的记录，不依赖文件头
+            self.first = self.view[0]
+            self.last = self.view[(count - 1) * self.stride]
+
+    @classmethod
+    def create(cls, path, metrics, capacity):
+        names = json.dumps(metrics).encode()
+        if NAMES_OFFSET + len(names) > HEADER_SIZE:
+            raise ValueError("Too many metrics for segment header")
+        size = HEADER_SIZE + capacity * (len(metrics) + 1) * 8
+        with open(path, "wb") as f:
+            f.truncate(size)
+        with open(path, "r+b") as f:
+            mm = mmap.mmap(f.fileno(), size)
+        mm[:HEADER_STRUCT.size] = HEADER_STRUCT.pack(MAGIC, 0, capacity, len(metrics), NAN, NAN)
+        mm[NAMES_OFFSET:NAMES_OFFSET + len(names)] = names
+        return cls(path, mm, list(metrics), capacity, 0, None, None, True)
+
+    @classmethod
+    def open(cls, path, follow=False):
+        """以只读方式打开已有段；若文件尾部有未提交的空间则截断（压缩）
+
+        follow 为 True 时用于另一进程中的只读存储：不截断、不删除文件，映射整个文件，
+        写入方新提交的记录通过 refresh() 读取。
+        """
+        with open(path, "rb" if follow else "r+b") as f:
+            header = f.read(HEADER_SIZE)
+            magic, count, capacity, n_metrics, _, _ = HEADER_STRUCT.unpack_from(header)
+            if magic != MAGIC:
+                raise ValueError(f"Not a segment file: {path}")
+            names = header[NAMES_OFFSET:].rstrip(b"\0")
+            metrics = json.loads(names)
+            used = HEADER_SIZE + count * (n_metrics + 1) * 8
+            size = f.seek(0, os.SEEK_END)
+            if follow:
+                # 写入方关闭段时会截断文件，容量以当前文件大小为准，只读取已提交的记录
+                capacity = (size - HEADER_SIZE) // ((n_metrics + 1) * 8)
+                mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+                return cls(path, mm, metrics, capacity, min(count, capacity), None, None, False)
+            if size > used:
+                f.truncate(used)
+            if count == 0:
+                return None
+            mm = mmap.mmap(f.fileno(), used, access=mmap.ACCESS_READ)
+        return cls(path, mm, metrics, count, count, None, None, False)
+
+    def refresh(self):
+        """重新读取写入方（另一进程）提交的记录数"""
+        count = min(struct.unpack_from("<Q", self.mm, COUNT_OFFSET)[0], self.capacity)
+        if count != self.count:
+            self.count = count
+            if count:
+                self.first = self.view[0]
+                self.last = self.view[(count - 1) * self.stride]
+
+    def append(self, timestamp, values):
+        offset = self.count * self.stride
+        self.view[offset] = timestamp
+        for i, value in enumerate(values, 1):
+            self.view[offset + i] = value
+        # 记录写完后再提交记录数
+        self.count += 1
+        if self.first is None:
+            self.first = timestamp
+        self.last = timestamp
+        self.mm[COUNT_OFFSET:COUNT_OFFSET + 8] = struct.pack("<Q", self.count)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def _bisect(self, timestamp):
+        lo, hi = 0, self.count
+        view, stride = self.view, self.stride
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if view[mid * stride] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def slice(self, start, end):
+        """返回 [start, end) 区间的零拷贝视图：(timestamps, {metric: values})"""
+        lo = self._bisect(start)
+        hi = self._bisect(end)
+        stride = self.stride
+        times = self.view[lo * stride:hi * stride:stride]
+        columns = {
+            name: self.view[lo * stride + i:hi * stride:stride]
+            for i, name in enumerate(self.metrics, 1)
+        }
+        return times, columns
+
+    def close(self):
+        """关闭映射；可写段会截断到已提交的长度"""
+        used = HEADER_SIZE + self.count * self.stride * 8
+        if self.writable:
+            if self.count:
+                self.mm[32:48] = struct.pack("<dd", self.first, self.last)
+            self.mm.flush()
+        try:
+            self.view.release()
+            self.mm.close()
+        except BufferError:
+            # 仍有读者持有视图，交给 GC 回收
+            pass
+        if self.writable:
+            with open(self.path, "r+b") as f:
+                f.truncate(used)
+            if self.count == 0:
+                os.remove(self.path)
+
+
+class SegmentStore:
+    """磁盘持久化时序存储：定长记录追加写入内存映射段文件，按时间滚动并按保留期清理
+
+    readonly 为 True 时只读取另一进程（多进程模式下的采样进程）写入的目录：每次查询时同步新建与已清理的段，
+    并读取正在写入的段中新提交的记录。
+    """
+
+    def __init__(self, directory, metrics, segment_duration=3600, segment_capacity=4096, retention=7 * 86400,
+                 resolution=1.0, readonly=False):
+        self.directory = directory
+        self.metrics = list(metrics)
+        self.resolution = resolution
+        self.segment_duration = segment_duration
+        self.segment_capacity = segment_capacity
+        self.retention = retention
+        self.readonly = readonly
+        # 已有的段文件在首次读写时才打开（通常在采集线程里），不占用 Agent 启动时间
+        self._segments = None
+        self._current = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _load(self):
+        """打开目录中已有的段文件（调用方持有锁）"""
+        if self.readonly:
+            return self._follow()
+        if self._segments is not None:
+            return self._segments
+        self._segments = []
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith("seg-") and name.endswith(".dat")):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                segment = Segment.open(path)
+            except (ValueError, struct.error) as e:
+                print(f"⚠️  Skipping unreadable segment {name}: {e}")
+                continue
+            if segment is None:
+                os.remove(path)
+                continue
+            self._segments.append(segment)
+        self._segments.sort(key=lambda s: s.first)
+        return self._segments
+
+    def _follow(self):
+        """只读存储：与目录同步，返回有记录的段（调用方持有锁）"""
+        known = {segment.path: segment for segment in self._segments or ()}
+        segments = []
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith("seg-") and name.endswith(".dat")):
+                continue
+            path = os.path.join(self.directory, name)
+            segment = known.pop(path, None)
+            if segment is None:
+                try:
+                    segment = Segment.open(path, follow=True)
+                except (OSError, ValueError, struct.error):
+                    # 写入方正在创建的段（文件头尚未写入），下次查询时重试
+                    continue
+            segment.refresh()
+            segments.append(segment)
+        # 已被写入方按保留期删除的段
+        for segment in known.values():
+            segment.close()
+        self._segments = segments
+        return [segment for segment in segments if segment.count]
+
+    @property
+    def segments(self):
+        with self._lock:
+            return list(self._load())
+
+    def record(self, snapshot):
+        """采集器回调：把快照写入磁盘"""
+        status = snapshot.status
+        self.append(snapshot.sampled_at, [extract_metric(status, name) for name in self.metrics])
+
+    def append(self, timestamp, values):
+        if self.readonly:
+            raise ValueError("Segment store is read-only")
+        with self._lock:
+            self._load()
+            current = self._current
+            if current is None or current.full or timestamp - current.first >= self.segment_duration:
+                current = self._rollover(timestamp)
+            current.append(timestamp, values)
+
+    def _rollover(self, timestamp):
+        if self._current is not None:
+            self._current.close()
+            self._segments.remove(self._current)
+            reopened = Segment.open(self._current.path)
+            if reopened is not None:
+                self._segments.append(reopened)
+        self._expire(timestamp)
+        path = os.path.join(self.directory, f"seg-{int(timestamp * 1000):015d}.dat")
+        self._current = Segment.create(path, self.metrics, self.segment_capacity)
+        self._segments.append(self._current)
+        return self._current
+
+    def _expire(self, now):
+        cutoff = now - self.retention
+        keep = []
+        for segment in self._segments:
+            if segment is not self._current and segment.last is not None and segment.last < cutoff:
+                segment.close()
+                os.remove(segment.path)
+            else:
+                keep.append(segment)
+        self._segments = keep
+
+    def oldest(self):
+        with self._lock:
+            segments = self._load()
+            if not segments:
+                return None
+            return segments[0].first
+
+    def slices(self, start, end):
+        """返回与 [start, end) 重叠的各段零拷贝视图列表"""
+        with self._lock:
+            result = []
+            for segment in self._load():
+                if segment.count == 0 or segment.last < start or segment.first >= end:
+                    continue
+                result.append((segment.metrics, segment.slice(start, end)))
+            return result
+
+    def range(self, metrics, start, end):
+        """拼接各段数据，返回 (timestamps, {metric: values})"""
+        times = array("d")
+        values = {name: array("d") for name in metrics}
+        for segment_metrics, (seg_times, columns) in self.slices(start, end):
+            times.frombytes(seg_times.tobytes())
+            for name in metrics:
+                column = columns.get(name)
+                if column is None:
+                    values[name].extend([NAN] * len(seg_times))
+                else:
+                    values[name].frombytes(column.tobytes())
+        return times, values
+
+    def query(self, metrics, start, end, step=None, aggregates=DEFAULT_AGGREGATES):
+        """与 MetricHistory.query 相同的降采样查询"""
+        if step is None or step <= 0:
+            step = default_step(start, end)
+        times, values = self.range(metrics, start, end)
+        return downsample(times, values, start, end, step, aggregates)
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments or ():
+                segment.close()
+            self._segments = []
+            self._current = None
@@ -0,0 +1,250 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+from delta import DeltaEncoder
+from encoding import JSON, encode_msgpack
+from instrumentation import Timings
+from system_monitor import COLLECTORS, collectors_for_fields
+
+# 每个订阅者最多积压的告警事件数（告警不合并，但慢消费者也不能无限积压）
+ALERT_BACKLOG = 100
+
+
+def snapshot_payload(snapshot, fields=None):
+    """把快照转成推送给客户端的字典；fields 为需要的顶层字段集合"""
+    status = snapshot.status
+    if fields:
+        status = {key: value for key, value in status.items() if key in fields or key == "timestamp"}
+    return dict(status, sampledAt=snapshot.sampled_at, generation=snapshot.generation)
+
+
+def delta_payload(snapshot):
+    """增量编码使用的状态：generation 已由帧的 seq 表示"""
+    return dict(snapshot.status, sampledAt=snapshot.sampled_at)
+
+
+def serialize(payload, media_type):
+    # SSE / WebSocket 文本帧需要 str，二进制格式直接返回 bytes
+    if media_type == JSON:
+        return json.dumps(payload, separators=(",", ":"))
+    return encode_msgpack(payload)
+
+
+class Subscription:
+    """单个订阅者：只保留最新一份待发送快照，慢消费者的旧数据会被合并（丢弃）
+
+    mode 为 "delta" 时，首帧为关键帧，之后只发送变化的字段；last_seq 记录客户端已持有的帧。
+    alerts 为 True 时同时接收告警事件：告警逐条排队、不受 min_interval 限制，先于快照发送。
+    """
+
+    def __init__(self, broadcaster, fields=None, min_interval=0.0, mode="full", since=None, media_type=JSON,
+                 alerts=False):
+        self.broadcaster = broadcaster
+        self.fields = frozenset(fields) if fields else None
+        # 订阅期间需要运行的采集项
+        self.collectors = collectors_for_fields(self.fields) if self.fields else set(COLLECTORS)
+        self.min_interval = min_interval
+        self.mode = mode
+        self.last_seq = since
+        self.media_type = media_type
+        self.alerts = deque(maxlen=ALERT_BACKLOG) if alerts else None
+        self.pending = None
+        self.coalesced = 0
+        self.sent = 0
+        self.last_sent = 0.0
+        self.pending_since = None
+        self.closed = False
+        self._event = asyncio.Event()
+
+    def offer(self, snapshot):
+        if self.pending is not None:
+            self.coalesced += 1
+        else:
+            self.pending_since = time.monotonic()
+        self.pending = snapshot
+        self._event.set()
+
+    def offer_alert(self, event):
+        if self.alerts is not None:
+            self.alerts.append(event)
+            self._event.set()
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+    async def next(self):
+        """等待下一份快照（或告警事件，为 dict）；订阅被关闭时返回 None"""
+        while True:
+            await self._event.wait()
+            if self.closed:
+                return None
+            if self.alerts:
+                event = self.alerts.popleft()
+                if not self.alerts and self.pending is None:
+                    self._event.clear()
+                return event
+            # 限速：距上次发送不足 min_interval 时等待，期间到达的快照会被合并
+            delay = self.last_sent + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if self.closed:
+                    return None
+                if self.alerts:
+                    continue
+            self._event.clear()
+            snapshot, self.pending = self.pending, None
+            if snapshot is None:
+                continue
+            self.sent += 1
+            self.last_sent = time.monotonic()
+            return snapshot
+
+    def stalled(self, now, timeout):
+        """待发送的快照在可以发送（到达且已过 min_interval）之后超过 timeout 秒仍未被取走"""
+        if self.pending is None:
+            return False
+        deliverable = max(self.pending_since, self.last_sent + self.min_interval)
+        return now - deliverable > timeout
+
+    def resync(self, seq=None):
+        """客户端请求从 seq 重新同步（None 表示需要关键帧）"""
+        self.last_seq = seq
+        latest = self.broadcaster.collector.latest()
+        if latest is not None:
+            self.offer(latest)
+
+    def message(self, snapshot):
+        """编码待发送的消息：JSON 为 str，MessagePack 为 bytes"""
+        if isinstance(snapshot, dict):
+            return serialize(snapshot, self.media_type)
+        if self.mode == "delta":
+            seq, message = self.broadcaster.encode_delta(self.last_seq, self.fields, self.media_type)
+            self.last_seq = seq
+            return message
+        return self.broadcaster.encode(snapshot, self.fields, self.media_type)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        snapshot = await self.next()
+        if snapshot is None:
+            raise StopAsyncIteration
+        return snapshot
+
+
+class StatusBroadcaster:
+    """把采集器的每份快照推送给所有订阅者（SSE / WebSocket）
+
+    采集线程通过 call_soon_threadsafe 把快照交给事件循环；每份快照按字段过滤组合
+    只序列化一次。订阅者长时间无法接收（stall_timeout 秒）时会被断开。
+    传入 alerts（AlertEngine）时，告警事件推送给订阅了告警的订阅者，新订阅者会先收到正在触发的告警。
+    """
+
+    def __init__(self, collector, stall_timeout=30.0, delta_thresholds=None, timings=None, alerts=None):
+        self.collector = collector
+        self.alert_engine = alerts
+        self.timings = timings if timings is not None else Timings()
+        self.stall_timeout = stall_timeout
+        self.delta = DeltaEncoder(delta_thresholds)
+        self._delta_encoded = {}
+        self.subscribers = set()
+        self.dropped = 0
+        self._loop = None
+        self._encoded = {}
+        self._encoded_generation = None
+        collector.add_listener(self.publish)
+        if alerts is not None:
+            alerts.add_listener(self.publish_alert)
+
+    def subscribe(self, fields=None, min_interval=0.0, mode="full", since=None, media_type=JSON, alerts=False):
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self, fields, min_interval, mode, since, media_type, alerts)
+        self.subscribers.add(subscription)
+        if alerts and self.alert_engine is not None:
+            for event in self.alert_engine.active():
+                subscription.offer_alert(event)
+        self.collector.acquire(subscription.collectors)
+        latest = self.collector.latest()
+        if latest is not None:
+            self.delta.update(latest.generation, delta_payload(latest))
+            subscription.offer(latest)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        if subscription in self.subscribers:
+            self.subscribers.discard(subscription)
+            self.collector.release(subscription.collectors)
+
+    def publish(self, snapshot):
+        """采集器回调（采集线程中调用）"""
+        loop = self._loop
+        if loop is None or not self.subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, snapshot)
+        except RuntimeError:
+            # 事件循环已关闭
+            self._loop = None
+
+    def publish_alert(self, event):
+        """AlertEngine 回调（采集线程中调用）"""
+        loop = self._loop
+        if loop is None or not self.subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch_alert, event)
+        except RuntimeError:
+            self._loop = None
+
+    def _dispatch_alert(self, event):
+        for subscription in list(self.subscribers):
+            subscription.offer_alert(event)
+
+    def _dispatch(self, snapshot):
+        self.delta.update(snapshot.generation, delta_payload(snapshot))
+        now = time.monotonic()
+        for subscription in list(self.subscribers):
+            if subscription.stalled(now, self.stall_timeout):
+                self.dropped += 1
+                self.unsubscribe(subscription)
+                continue
+            subscription.offer(snapshot)
+
+    def encode(self, snapshot, fields=None, media_type=JSON):
+        """按 (generation, fields, 格式) 缓存序列化结果，同一快照只编码一次"""
+        if snapshot.generation != self._encoded_generation:
+            self._encoded = {}
+            self._encoded_generation = snapshot.generation
+        key = (fields, media_type)
+        message = self._encoded.get(key)
+        if message is None:
+            started = time.perf_counter()
+            message = serialize(snapshot_payload(snapshot, fields), media_type)
+            self.timings.observe("encode", "stream-" + ("json" if media_type == JSON else "msgpack"),
+                                 time.perf_counter() - started)
+            self._encoded[key] = message
+        return message
+
+    def encode_delta(self, base, fields=None, media_type=JSON):
+        """生成从 base 追到当前状态的帧；同一 (base, fields, 格式) 在同一 seq 下只编码一次"""
+        key = (self.delta.seq, base, fields, media_type)
+        message = self._delta_encoded.get(key)
+        if message is None:
+            if self._delta_encoded and next(iter(self._delta_encoded))[0] != self.delta.seq:
+                self._delta_encoded = {}
+            message = serialize(self.delta.frame_since(base, fields), media_type)
+            self._delta_encoded[key] = message
+        return self.delta.seq, message
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "pending": sum(1 for s in self.subscribers if s.pending is not None),
+            "dropped": self.dropped,
+            "coalesced": sum(s.coalesced for s in self.subscribers),
+        }
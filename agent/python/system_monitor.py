@@ -2,21 +2,123 @@ import psutil
 import platform
 import time
 from datetime import datetime
+from rates import CounterRate
+from processes import ProcessTable
+from cpu_times import CpuTimes
+from disks import DiskMonitor
+
+# 可独立调度的采集项 / Collectors that can be scheduled independently
+COLLECTORS = ("cpu", "memory", "disk", "diskio", "network", "temperature", "uptime", "processes", "battery")
+
+# get_status 顶层字段 -> 负责产出该字段的采集项（也接受采集项名本身）
+FIELD_COLLECTORS = {
+    "cpu": "cpu",
+    "memory": "memory",
+    "disk": "disk",
+    "diskIO": "diskio",
+    "diskio": "diskio",
+    "network": "network",
+    "temperature": "temperature",
+    "uptime": "uptime",
+    "processCount": "processes",
+    "threadCount": "processes",
+    "processes": "processes",
+    "batteryLevel": "battery",
+    "isCharging": "battery",
+    "battery": "battery",
+}
+
+
+# 采集项 -> 它产出的顶层字段
+COLLECTOR_FIELDS = {
+    "diskio": ("diskIO",),
+    "processes": ("processCount", "threadCount"),
+    "battery": ("batteryLevel", "isCharging"),
+}
+
+
+def collectors_for_fields(fields):
+    """把字段名（或点分指标路径）映射为采集项集合；未知字段抛出 KeyError"""
+    names = set()
+    for field in fields:
+        key = field.split(".", 1)[0]
+        if key != "timestamp":
+            names.add(FIELD_COLLECTORS[key])
+    return names
+
+
+def resolve_fields(fields):
+    """把 ?fields= 中的字段（或采集项名）展开为顶层字段集合；未知字段抛出 KeyError"""
+    keys = set()
+    for field in fields:
+        if field != "timestamp" and field not in FIELD_COLLECTORS:
+            raise KeyError(field)
+        keys.update(COLLECTOR_FIELDS.get(field, (field,)))
+    return frozenset(keys)
+
+
+def assemble_status(parts):
+    """把各采集项的结果组装成 get_status 的字典结构；缺失的采集项不输出对应字段"""
+    status = {"timestamp": datetime.now().isoformat()}
+    if "cpu" in parts:
+        status["cpu"] = dict(parts["cpu"])
+        if "temperature" in parts:
+            status["cpu"]["temperature"] = parts["temperature"]
+    for name in ("memory", "disk", "network"):
+        if name in parts:
+            status[name] = parts[name]
+    if "diskio" in parts:
+        status["diskIO"] = parts["diskio"]
+    if "temperature" in parts:
+        status["temperature"] = parts["temperature"]
+    if "uptime" in parts:
+        status["uptime"] = parts["uptime"]
+    if "processes" in parts:
+        status["processCount"] = parts["processes"]["processCount"]
+        status["threadCount"] = parts["processes"]["threadCount"]
+    if "battery" in parts:
+        status["batteryLevel"] = parts["battery"]["level"]
+        status["isCharging"] = parts["battery"]["isCharging"]
+    return status
+
 
 class SystemMonitor:
-    def __init__(self):
-        # 初始化网络计数器
-        self.last_net_io = psutil.net_io_counters()
-        self.last_time = time.time()
+    def __init__(self, cpu_interval=0.5, net_window=1.0, net_smoothing=None):
+        # cpu_interval 为 None 时不阻塞，返回距上次调用以来的使用率
+        # （由后台采集器按固定节奏调用时使用）
+        self.cpu_interval = cpu_interval
+        self.cpu_times = CpuTimes()
+        self.cpu_times.update()
+        
+        # 网络速率按固定窗口计算（net_smoothing 为 EWMA 系数，None 表示不平滑）
+        self.net_rates = CounterRate(window=net_window, alpha=net_smoothing)
+        self.get_network_info()
+        
+        # 所有挂载点的容量（慢速）与磁盘 IO 速率（快速）
+        self.disks = DiskMonitor(io_window=net_window)
+        self.disks.get_io()
+        
+        # 增量进程表，由 processes 采集项刷新
+        self.processes = ProcessTable()
     
-    def get_cpu_info(self):
+    def get_cpu_info(self, include_temperature=True):
+        # 整体 / 按核使用率与时间拆分来自同一次 cpu_times(percpu=True) 读数
+        if self.cpu_interval:
+            self.cpu_times.update()
+            time.sleep(self.cpu_interval)
+        times = self.cpu_times.sample()
         cpu_freq = psutil.cpu_freq()
-        return {
-            "usage": psutil.cpu_percent(interval=0.5) / 100.0,
+        info = {
+            "usage": times["usage"],
             "coreCount": psutil.cpu_count(),
             "frequency": cpu_freq.current / 1000 if cpu_freq else None,
-            "temperature": self.get_cpu_temperature()
+            "perCore": times["perCore"],
+            "times": times["times"]
         }
+        # 温度读取较慢，由调度器单独采集时可以跳过
+        if include_temperature:
+            info["temperature"] = self.get_cpu_temperature()
+        return info
     
     def get_memory_info(self):
         mem = psutil.virtual_memory()
@@ -28,40 +130,52 @@ class SystemMonitor:
         }
     
     def get_disk_info(self):
+        # 顶层 total/used/free 仍为根卷，volumes 列出所有挂载点
         disk = psutil.disk_usage('/')
         return {
             "total": disk.total,
             "used": disk.used,
-            "free": disk.free
+            "free": disk.free,
+            "volumes": self.disks.get_volumes()
         }
     
+    def get_disk_io(self):
+        return self.disks.get_io()
+    
     def get_network_info(self):
-        net_io = psutil.net_io_counters()
-        current_time = time.time()
-        
-        # 计算速率
-        time_delta = current_time - self.last_time
-        bytes_in_rate = (net_io.bytes_recv - self.last_net_io.bytes_recv) / time_delta if time_delta > 0 else 0
-        bytes_out_rate = (net_io.bytes_sent - self.last_net_io.bytes_sent) / time_delta if time_delta > 0 else 0
+        # 一次读取所有网卡计数器，总量由各网卡求和得到
+        pernic = psutil.net_io_counters(pernic=True)
+        counters = {}
+        for nic, io in pernic.items():
+            counters[(nic, "in")] = io.bytes_recv
+            counters[(nic, "out")] = io.bytes_sent
+        rates = self.net_rates.update(counters)
         
-        self.last_net_io = net_io
-        self.last_time = current_time
+        interfaces = {}
+        for nic, io in pernic.items():
+            interfaces[nic] = {
+                "bytesIn": int(rates.get((nic, "in"), 0)),
+                "bytesOut": int(rates.get((nic, "out"), 0)),
+                "packetsIn": io.packets_recv,
+                "packetsOut": io.packets_sent
+            }
         
         return {
-            "bytesIn": int(bytes_in_rate),
-            "bytesOut": int(bytes_out_rate),
-            "packetsIn": net_io.packets_recv,
-            "packetsOut": net_io.packets_sent
+            "bytesIn": sum(nic["bytesIn"] for nic in interfaces.values()),
+            "bytesOut": sum(nic["bytesOut"] for nic in interfaces.values()),
+            "packetsIn": sum(nic["packetsIn"] for nic in interfaces.values()),
+            "packetsOut": sum(nic["packetsOut"] for nic in interfaces.values()),
+            "interfaces": interfaces
         }
     
     def get_uptime(self):
         return time.time() - psutil.boot_time()
     
     def get_process_info(self):
-        processes = list(psutil.process_iter(['num_threads']))
-        thread_count = sum(p.info['num_threads'] for p in processes if p.info['num_threads'])
+        # 进程表跨调用增量维护，同时为 /api/processes 提供数据
+        process_count, thread_count = self.processes.refresh()
         return {
-            "processCount": len(processes),
+            "processCount": process_count,
             "threadCount": thread_count
         }
     
@@ -91,24 +205,27 @@ class SystemMonitor:
             pass
         return {"level": None, "isCharging": None}
     
+    def collect(self, name):
+        """运行单个采集项，返回其原始结果"""
+        if name == "cpu":
+            return self.get_cpu_info(include_temperature=False)
+        if name == "memory":
+            return self.get_memory_info()
+        if name == "disk":
+            return self.get_disk_info()
+        if name == "diskio":
+            return self.get_disk_io()
+        if name == "network":
+            return self.get_network_info()
+        if name == "temperature":
+            return self.get_cpu_temperature()
+        if name == "uptime":
+            return self.get_uptime()
+        if name == "processes":
+            return self.get_process_info()
+        if name == "battery":
+            return self.get_battery_info()
+        raise KeyError(name)
+    
     def get_status(self):
-        cpu_info = self.get_cpu_info()
-        memory_info = self.get_memory_info()
-        disk_info = self.get_disk_info()
-        network_info = self.get_network_info()
-        process_info = self.get_process_info()
-        battery_info = self.get_battery_info()
-        
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "cpu": cpu_info,
-            "memory": memory_info,
-            "disk": disk_info,
-            "network": network_info,
-            "temperature": cpu_info.get("temperature"),
-            "uptime": self.get_uptime(),
-            "processCount": process_info["processCount"],
-            "threadCount": process_info["threadCount"],
-            "batteryLevel": battery_info["level"],
-            "isCharging": battery_info["isCharging"]
-        }
\ No newline at end of file
+        return assemble_status({name: self.collect(name) for name in COLLECTORS})
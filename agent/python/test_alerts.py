@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Tests for the alert rule engine, webhook delivery and alert streaming
+"""
+import asyncio
+import json
+import time
+import unittest
+import httpx
+from fastapi.testclient import TestClient
+from alerts import AlertEngine, Rule, WebhookNotifier
+from api_server import create_app
+from collector import Snapshot
+from stream import StatusBroadcaster
+from test_stream import FakeCollector, make_snapshot
+
+
+def cpu_snapshot(t, usage, updated=None):
+    return Snapshot(int(t), float(t), {"cpu": {"usage": usage}}, frozenset(["cpu"]), updated)
+
+
+def states(rule, samples):
+    """Feed (timestamp, value) samples and return the emitted event states"""
+    events = [rule.evaluate(t, value) for t, value in samples]
+    return [(event["time"], event["state"]) for event in events if event]
+
+
+class TestRules(unittest.TestCase):
+    """Test cases for Rule signals and the hysteresis state machine"""
+    
+    def test_threshold_for_duration(self):
+        """Test that a breach must last for_seconds before firing"""
+        rule = Rule("cpu", "cpu.usage", value=0.8, for_seconds=3)
+        self.assertEqual(states(rule, [(0, 0.9), (1, 0.9), (2, 0.5), (3, 0.9), (5, 0.9), (6, 0.9)]), [(6, "firing")])
+        self.assertEqual(rule.since, 3)
+    
+    def test_hysteresis(self):
+        """Test that values between clear and value do not flap the alert"""
+        rule = Rule("cpu", "cpu.usage", value=0.8, clear=0.6)
+        samples = [(0, 0.85), (1, 0.79), (2, 0.81), (3, 0.7), (4, 0.6), (5, 0.79), (6, 0.81)]
+        self.assertEqual(states(rule, samples), [(0, "firing"), (4, "resolved"), (6, "firing")])
+    
+    def test_clear_for(self):
+        """Test that recovery must last clear_for seconds"""
+        rule = Rule("cpu", "cpu.usage", value=0.8, clear_for=2)
+        self.assertEqual(states(rule, [(0, 0.9), (1, 0.5), (2, 0.9), (3, 0.5), (4, 0.5), (5, 0.5)]),
+                         [(0, "firing"), (5, "resolved")])
+    
+    def test_below_operator(self):
+        """Test rules that fire when the value drops below the threshold"""
+        rule = Rule("battery", "batteryLevel", op="<", value=0.2, clear=0.3)
+        self.assertEqual(states(rule, [(0, 0.5), (1, 0.1), (2, 0.25), (3, 0.3)]), [(1, "firing"), (3, "resolved")])
+    
+    def test_rate(self):
+        """Test that the rate signal is the smoothed per-second change"""
+        rule = Rule("disk", "disk.used", kind="rate", value=10, alpha=1.0)
+        self.assertEqual(states(rule, [(0, 0), (10, 50), (20, 200), (30, 250)]), [(20, "firing"), (30, "resolved")])
+        self.assertEqual(rule.last_score, 5)
+    
+    def test_zscore(self):
+        """Test that a spike far outside the running distribution fires after warm-up"""
+        rule = Rule("anomaly", "cpu.usage", kind="zscore", value=4, clear=2, warmup=20)
+        samples = [(t, 0.2 + 0.01 * (t % 3)) for t in range(50)]
+        self.assertEqual(states(rule, samples), [])
+        self.assertEqual(states(rule, [(50, 0.9)]), [(50, "firing")])
+        self.assertGreater(rule.last_score, 4)
+    
+    def test_zscore_warmup_and_min_std(self):
+        """Test that no score is produced during warm-up and min_std bounds flat baselines"""
+        rule = Rule("anomaly", "cpu.usage", kind="zscore", value=4, warmup=5, min_std=0.1)
+        self.assertEqual(states(rule, [(t, 0.2) for t in range(5)] + [(5, 0.35)]), [])
+        self.assertAlmostEqual(rule.last_score, 1.5)
+    
+    def test_from_dict_validation(self):
+        """Test that invalid rule configurations are rejected"""
+        rule = Rule.from_dict({"name": "r", "metric": "memory.pressure", "value": 0.9, "for": 10, "clearFor": 5})
+        self.assertEqual((rule.for_seconds, rule.clear_for, rule.clear), (10, 5, 0.9))
+        for config in [
+            {"name": "r", "metric": "nope.value"},
+            {"name": "r", "metric": "cpu.usage", "kind": "median"},
+            {"name": "r", "metric": "cpu.usage", "op": ">=", "value": 1},
+            {"name": "r", "metric": "cpu.usage", "value": 0.5, "clear": 0.6},
+            {"name": "r", "metric": "cpu.usage", "window": 5},
+            {"metric": "cpu.usage"},
+        ]:
+            with self.assertRaises(ValueError):
+                Rule.from_dict(config)
+
+
+class TestAlertEngine(unittest.TestCase):
+    """Test cases for AlertEngine"""
+    
+    def test_events_and_listeners(self):
+        """Test that state changes are recorded and passed to listeners"""
+        engine = AlertEngine([{"name": "cpu-high", "metric": "cpu.usage", "value": 0.8}], host="mac")
+        received = []
+        engine.add_listener(received.append)
+        for t, usage in enumerate([0.5, 0.9, 0.95, 0.5]):
+            engine.record(cpu_snapshot(t, usage))
+        
+        self.assertEqual([event["state"] for event in received], ["firing", "resolved"])
+        self.assertEqual(received[0]["host"], "mac")
+        self.assertEqual(received[0]["value"], 0.9)
+        self.assertIn("cpu.usage > 0.8", received[0]["message"])
+        self.assertEqual(engine.to_dict()["events"], received)
+        self.assertEqual(engine.stats(), {"rules": 1, "firing": 0, "fired": 1})
+    
+    def test_skips_stale_collectors(self):
+        """Test that rules only see samples from collectors that actually ran"""
+        engine = AlertEngine([{"name": "rate", "metric": "cpu.usage", "kind": "rate", "value": 1, "alpha": 1.0}])
+        engine.record(cpu_snapshot(0, 0.1, frozenset(["cpu"])))
+        engine.record(cpu_snapshot(1, 0.1, frozenset(["memory"])))
+        engine.record(cpu_snapshot(2, 0.3, frozenset(["cpu"])))
+        
+        self.assertAlmostEqual(engine.rules[0].last_score, 0.1)
+    
+    def test_skips_missing_metric(self):
+        """Test that a metric missing from the status does not reach the rule"""
+        engine = AlertEngine([
+            {"name": "temp-rate", "metric": "temperature", "kind": "rate", "value": 1},
+            {"name": "temp-z", "metric": "temperature", "kind": "zscore", "value": 3},
+        ])
+        for t in range(5):
+            engine.record(Snapshot(t, float(t), {"temperature": None}, frozenset(["temperature"])))
+        
+        for rule in engine.rules:
+            self.assertIsNone(rule.to_dict()["lastValue"])
+        json.dumps(engine.to_dict(), allow_nan=False)
+    
+    def test_active(self):
+        """Test that firing rules are reported for late subscribers"""
+        engine = AlertEngine([{"name": "cpu-high", "metric": "cpu.usage", "value": 0.8, "for": 1}])
+        engine.record(cpu_snapshot(0, 0.9))
+        self.assertEqual(engine.active(), [])
+        engine.record(cpu_snapshot(1, 0.9))
+        
+        active = engine.active()
+        self.assertEqual(len(active), 1)
+        self.assertEqual((active[0]["rule"], active[0]["time"]), ("cpu-high", 0))
+    
+    def test_duplicate_names(self):
+        """Test that rule names must be unique"""
+        rule = {"name": "r", "metric": "cpu.usage"}
+        with self.assertRaises(ValueError):
+            AlertEngine([rule, rule])
+
+
+class TestWebhookNotifier(unittest.TestCase):
+    """Test cases for WebhookNotifier"""
+    
+    def test_posts_events_with_retries(self):
+        """Test that events are POSTed as JSON and 5xx responses are retried"""
+        received = []
+        responses = [503]
+        
+        def handler(request):
+            received.append(json.loads(request.content))
+            return httpx.Response(responses.pop(0) if responses else 200)
+        
+        notifier = WebhookNotifier("http://sink/alerts", retry_delay=0.01,
+                                   client=httpx.Client(transport=httpx.MockTransport(handler)))
+        notifier.start()
+        try:
+            notifier.notify({"rule": "cpu-high", "state": "firing"})
+            deadline = time.monotonic() + 5
+            while notifier.sent < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            notifier.close()
+        
+        self.assertEqual(len(received), 2)
+        self.assertEqual(received[1]["rule"], "cpu-high")
+        self.assertEqual(notifier.stats()["sent"], 1)
+    
+    def test_rejected_events_are_not_retried(self):
+        """Test that 4xx responses count as failures without retrying"""
+        calls = []
+        client = httpx.Client(transport=httpx.MockTransport(lambda request: calls.append(1) or httpx.Response(400)))
+        notifier = WebhookNotifier("http://sink/alerts", client=client)
+        notifier.notify({"rule": "r"})
+        notifier.drain()
+        
+        self.assertEqual((len(calls), notifier.failed), (1, 1))
+        self.assertEqual(notifier.stats()["lastError"], "HTTP 400")
+
+
+class TestAlertStream(unittest.TestCase):
+    """Test cases for alert delivery on the stream"""
+    
+    def test_alerts_bypass_coalescing(self):
+        """Test that alert events are queued individually ahead of snapshots"""
+        engine = AlertEngine([])
+        broadcaster = StatusBroadcaster(FakeCollector(), alerts=engine)
+        
+        async def scenario():
+            subscription = broadcaster.subscribe(alerts=True, min_interval=10)
+            plain = broadcaster.subscribe()
+            broadcaster._dispatch(make_snapshot(1))
+            broadcaster._dispatch_alert({"rule": "a"})
+            broadcaster._dispatch_alert({"rule": "b"})
+            return [await subscription.next() for _ in range(3)], plain.alerts
+        
+        items, plain_alerts = asyncio.run(scenario())
+        self.assertEqual(items[:2], [{"rule": "a"}, {"rule": "b"}])
+        self.assertEqual(items[2].generation, 1)
+        self.assertIsNone(plain_alerts)
+    
+    def test_sse_alert_events(self):
+        """Test that firing alerts are sent as SSE alert events"""
+        app = create_app(alert_rules=[{"name": "always", "metric": "uptime", "op": ">", "value": 0}])
+        with TestClient(app) as client:
+            app.state.collector.sample()
+            with client.stream("GET", "/api/stream?limit=1") as response:
+                body = "".join(response.iter_text())
+            alerts = client.get("/api/alerts").json()
+            stats = client.get("/api/agent/stats").json()
+        
+        self.assertIn("event: alert\n", body)
+        event = json.loads(body.split("event: alert\ndata: ")[1].split("\n")[0])
+        self.assertEqual((event["rule"], event["state"]), ("always", "firing"))
+        self.assertIn("event: status\n", body)
+        self.assertEqual(alerts["rules"][0]["state"], "firing")
+        self.assertEqual(stats["alerts"]["firing"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
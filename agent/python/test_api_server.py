@@ -2,9 +2,14 @@
 """
 Tests for API Server
 """
+import shutil
+import tempfile
+import time
 import unittest
 from fastapi.testclient import TestClient
+import msgpack
 from api_server import create_app
+from encoding import decode_columnar
 
 
 class TestAPIServer(unittest.TestCase):
@@ -123,6 +128,234 @@ class TestAPIServer(unittest.TestCase):
         self.assertIsInstance(data["uptime"], (int, float))
         self.assertGreater(data["uptime"], 0)
     
+    def test_api_status_reports_sample_time(self):
+        """Test that /api/status carries the snapshot sample time and age"""
+        response = self.client.get("/api/status")
+        data = response.json()
+        
+        self.assertIn("sampledAt", data)
+        self.assertIsInstance(data["sampledAt"], float)
+        self.assertIn("x-sample-age", response.headers)
+        self.assertGreaterEqual(float(response.headers["x-sample-age"]), 0.0)
+    
+    def test_api_status_served_from_background_collector(self):
+        """Test that a running collector serves the same snapshot to all requests"""
+        app = create_app(sample_interval=60)
+        with TestClient(app) as client:
+            first = client.get("/api/status").json()
+            second = client.get("/api/status").json()
+        
+        self.assertEqual(first["sampledAt"], second["sampledAt"])
+        self.assertEqual(first["timestamp"], second["timestamp"])
+    
+    def test_api_history_endpoint(self):
+        """Test /api/history returns downsampled series"""
+        self.client.get("/api/status")  # make sure at least one sample exists
+        response = self.client.get("/api/history?metrics=cpu.usage,memory.pressure&step=60")
+        
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        for field in ["from", "to", "step", "timestamps", "series"]:
+            self.assertIn(field, data)
+        self.assertEqual(set(data["series"]), {"cpu.usage", "memory.pressure"})
+        self.assertGreaterEqual(len(data["timestamps"]), 1)
+        for name in ["min", "max", "avg"]:
+            self.assertEqual(len(data["series"]["cpu.usage"][name]), len(data["timestamps"]))
+        self.assertIn("resolution", data)
+    
+    def test_api_history_per_core(self):
+        """Test that cpu.perCore expands to one series per core"""
+        self.client.get("/api/status")
+        response = self.client.get("/api/history?metrics=cpu.perCore,cpu.usage&step=60")
+        
+        self.assertEqual(response.status_code, 200)
+        series = response.json()["series"]
+        self.assertIn("cpu.usage", series)
+        self.assertIn("cpu.perCore.0", series)
+        self.assertEqual(len(series), 1 + len(self.client.get("/api/status").json()["cpu"]["perCore"]))
+    
+    def test_api_history_aggregates(self):
+        """Test selecting aggregates on /api/history"""
+        self.client.get("/api/status")
+        response = self.client.get("/api/history?metrics=cpu.usage&step=3600&aggs=last,count")
+        
+        self.assertEqual(response.status_code, 200)
+        series = response.json()["series"]["cpu.usage"]
+        self.assertEqual(set(series), {"last", "count"})
+        
+        response = self.client.get("/api/history?aggs=median")
+        self.assertEqual(response.status_code, 400)
+    
+    def test_api_history_rejects_unknown_metric(self):
+        """Test that unknown metrics return 400"""
+        response = self.client.get("/api/history?metrics=cpu.bogus")
+        self.assertEqual(response.status_code, 400)
+    
+    def test_api_history_rejects_non_finite(self):
+        """Test that nan / inf in step, from or to return 400"""
+        for query in ["step=nan", "step=inf", "from=nan", "to=inf", "from=-inf&to=10"]:
+            response = self.client.get(f"/api/history?metrics=cpu.usage&{query}")
+            self.assertEqual(response.status_code, 400, query)
+    
+    def test_api_history_reads_persistent_store(self):
+        """Test that ranges older than the memory history are read from disk"""
+        directory = tempfile.mkdtemp()
+        try:
+            app = create_app(data_dir=directory)
+            two_days_ago = float(int(time.time()) - 2 * 86400)
+            app.state.store.append(two_days_ago, [0.5] * len(app.state.store.metrics))
+            client = TestClient(app)
+            client.get("/api/status")
+            
+            response = client.get(
+                f"/api/history?metrics=cpu.usage&from={two_days_ago}&to={two_days_ago + 100}&step=100"
+            )
+            data = response.json()
+            self.assertEqual(data["timestamps"], [two_days_ago])
+            self.assertEqual(data["series"]["cpu.usage"]["avg"], [0.5])
+            app.state.store.close()
+        finally:
+            shutil.rmtree(directory)
+    
+    def test_api_status_msgpack(self):
+        """Test MessagePack content negotiation on /api/status"""
+        response = self.client.get("/api/status", headers={"Accept": "application/msgpack"})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/msgpack")
+        data = msgpack.unpackb(response.content)
+        self.assertIn("cpu", data)
+        self.assertIn("sampledAt", data)
+    
+    def test_api_status_not_acceptable(self):
+        """Test that unsupported formats return 406"""
+        response = self.client.get("/api/status", headers={"Accept": "text/csv"})
+        self.assertEqual(response.status_code, 406)
+    
+    def test_api_history_columnar(self):
+        """Test the packed columnar format on /api/history"""
+        self.client.get("/api/status")
+        response = self.client.get(
+            "/api/history?metrics=cpu.usage&step=60",
+            headers={"Accept": "application/x-macmonitor-columnar"}
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        data = decode_columnar(response.content)
+        self.assertEqual(set(data["series"]["cpu.usage"]), {"min", "max", "avg"})
+        self.assertEqual(len(data["series"]["cpu.usage"]["avg"]), len(data["timestamps"]))
+    
+    def test_api_status_etag(self):
+        """Test that unchanged snapshots answer If-None-Match with 304"""
+        app = create_app(sample_interval=60)
+        with TestClient(app) as client:
+            first = client.get("/api/status")
+            etag = first.headers["etag"]
+            second = client.get("/api/status", headers={"If-None-Match": etag})
+        
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        self.assertEqual(second.headers["etag"], etag)
+    
+    def test_api_status_gzip(self):
+        """Test that /api/status is served gzip-compressed when accepted"""
+        response = self.client.get("/api/status", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers.get("content-encoding"), "gzip")
+        self.assertIn("cpu", response.json())
+    
+    def test_api_status_fields(self):
+        """Test that ?fields= limits the response and the collectors that run"""
+        client = TestClient(create_app())
+        response = client.get("/api/status?fields=cpu,processes")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        
+        self.assertEqual(set(data), {"timestamp", "cpu", "processCount", "threadCount", "sampledAt"})
+        full = client.get("/api/status")
+        self.assertNotEqual(full.headers["etag"], response.headers["etag"])
+    
+    def test_api_status_timestamp_only_before_first_sample(self):
+        """Test that fields needing no collector still get a snapshot at startup"""
+        client = TestClient(create_app())
+        response = client.get("/api/status?fields=timestamp")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("timestamp", response.json())
+    
+    def test_temperature_idle_without_demand(self):
+        """Test that history and default alerts do not keep the temperature sensors running"""
+        app = create_app()
+        collector = app.state.collector
+        collector.sample()
+        self.assertNotIn("temperature", collector.demanded())
+        self.assertNotIn("battery", collector.demanded())
+        self.assertEqual(collector.runs["temperature"], 0)
+        self.assertIn("cpu", collector.demanded())
+        
+        # Requesting the field samples it once
+        TestClient(app).get("/api/status?fields=temperature")
+        self.assertEqual(collector.runs["temperature"], 1)
+    
+    def test_api_status_rejects_unknown_field(self):
+        """Test that unknown fields are rejected"""
+        client = TestClient(create_app())
+        response = client.get("/api/status?fields=gpu")
+        self.assertEqual(response.status_code, 400)
+    
+    def test_metrics_endpoint(self):
+        """Test /metrics exposition, negotiation and per-snapshot caching"""
+        app = create_app(sample_interval=60)
+        with TestClient(app) as client:
+            response = client.get("/metrics")
+            again = client.get("/metrics")
+            openmetrics = client.get("/metrics", headers={
+                "Accept": "application/openmetrics-text;version=1.0.0,text/plain;version=0.0.4;q=0.5,*/*;q=0.1"
+            })
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "text/plain; version=0.0.4; charset=utf-8")
+        self.assertIn("macmonitor_cpu_usage_ratio ", response.text)
+        self.assertIn('macmonitor_cpu_core_usage_ratio{core="0"}', response.text)
+        self.assertEqual(again.headers["etag"], response.headers["etag"])
+        self.assertGreaterEqual(app.state.response_cache.hits, 1)
+        self.assertTrue(openmetrics.headers["content-type"].startswith("application/openmetrics-text"))
+        self.assertTrue(openmetrics.text.endswith("# EOF\n"))
+    
+    def test_agent_stats(self):
+        """Test /api/agent/stats and the agent series in /metrics"""
+        app = create_app(sample_interval=60)
+        with TestClient(app) as client:
+            client.get("/api/status")
+            data = client.get("/api/agent/stats").json()
+            metrics = client.get("/metrics").text
+        
+        self.assertGreater(data["process"]["rss"], 0)
+        self.assertIsNotNone(data["snapshotAge"])
+        self.assertIn("streamSubscribers", data["queues"])
+        self.assertTrue(data["collector"]["budget"]["batterySaver"])
+        self.assertIn("processes", data["collector"]["effectiveIntervals"])
+        self.assertGreaterEqual(data["timings"]["collector"]["cpu"]["count"], 1)
+        self.assertEqual(data["timings"]["route"]["GET /api/status"]["count"], 1)
+        self.assertIn("json", data["timings"]["encode"])
+        self.assertIn("macmonitor_agent_resident_memory_bytes ", metrics)
+        self.assertIn('macmonitor_agent_collector_duration_seconds_bucket{collector="cpu",le="+Inf"}', metrics)
+        self.assertIn('macmonitor_agent_route_duration_seconds_count{route="GET /api/agent/stats"} 1', metrics)
+    
+    def test_api_processes(self):
+        """Test the top-N process endpoint"""
+        client = TestClient(create_app())
+        response = client.get("/api/processes?top=5&sort=rss")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        
+        self.assertEqual(data["sort"], "rss")
+        self.assertLessEqual(len(data["processes"]), 5)
+        self.assertIn("scanSeconds", data)
+        for entry in data["processes"]:
+            self.assertIn("pid", entry)
+            self.assertIn("cpu", entry)
+        self.assertEqual(client.get("/api/processes?sort=disk").status_code, 400)
+    
     def test_invalid_endpoint(self):
         """Test that invalid endpoints return 404"""
         response = self.client.get("/api/invalid")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the benchmark suite's result flattening and regression check
+"""
+import os
+import subprocess
+import sys
+import unittest
+from benchmarks.bench_startup import package_times, parse_importtime
+from benchmarks.suite import compare, direction, flatten
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+    """Test cases for benchmarks/suite.py"""
+    
+    def test_direction_from_name(self):
+        """Test that metric names decide whether higher or lower is better"""
+        self.assertEqual(direction("api/transport=asgi/requests_per_sec"), "higher")
+        self.assertEqual(direction("api/transport=asgi/p50_ms"), "lower")
+        self.assertEqual(direction("encoding/format=json/bytes_per_sample"), "lower")
+        self.assertEqual(direction("fleet_query/hosts=1000/queries_ms.top10_avg_1h"), "lower")
+        self.assertIsNone(direction("history/points=3600/buckets"))
+    
+    def test_flatten_rows_and_nested(self):
+        """Test that label fields become part of the metric name and nested dicts are joined"""
+        rows = [{"collector": "cpu", "p50_ms": 1.5, "name": "ignored"}, {"collector": "disk", "p50_ms": 2.0}]
+        self.assertEqual(flatten("collectors", rows, ("collector",)), {
+            "collectors/collector=cpu/p50_ms": 1.5,
+            "collectors/collector=disk/p50_ms": 2.0,
+        })
+        nested = {"hosts": 10, "queries_ms": {"top": 3.0}, "ok": True}
+        self.assertEqual(flatten("fleet_query", nested, ("hosts",)), {"fleet_query/hosts=10/queries_ms.top": 3.0})
+    
+    def test_compare_thresholds(self):
+        """Test that only changes beyond the threshold and noise floor count"""
+        baseline = {
+            "a/query_ms": 10.0,
+            "a/requests_per_sec": 1000.0,
+            "a/bytes": 100,
+            "a/tiny_ms": 0.1,
+            "a/p99_ms": 10.0,
+            "a/buckets": 600,
+        }
+        current = {
+            "a/query_ms": 14.0,
+            "a/requests_per_sec": 1300.0,
+            "a/bytes": 110,
+            "a/tiny_ms": 0.3,
+            "a/p99_ms": 14.0,
+            "a/buckets": 100,
+            "a/new_ms": 5.0,
+        }
+        regressions, improvements = compare(baseline, current, threshold=0.25)
+        
+        self.assertEqual([entry["metric"] for entry in regressions], ["a/query_ms"])
+        self.assertAlmostEqual(regressions[0]["change"], 0.4)
+        self.assertEqual([entry["metric"] for entry in improvements], ["a/requests_per_sec"])
+        self.assertEqual(compare(baseline, current, threshold=0.5), ([], []))
+
+
+
+class TestStartup(unittest.TestCase):
+    """Test cases for startup cost"""
+    
+    def test_parse_importtime(self):
+        """Test that -X importtime output is parsed and summed per package"""
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |     fastapi.routing",
+            "import time:       300 |        400 |   fastapi",
+            "import time:      1000 |       1500 | main",
+        ])
+        entries = parse_importtime(output)
+        
+        self.assertEqual(entries[0], ("fastapi.routing", 100, 100, 2))
+        self.assertEqual(entries[-1], ("main", 1000, 1500, 0))
+        self.assertEqual(package_times(entries), {"fastapi": 0.4, "main": 1.0})
+    
+    def test_main_defers_heavy_imports(self):
+        """Test that importing the agent and building the app does not load httpx or zeroconf"""
+        code = ("import sys, main\n"
+                "main.create_app(publisher=main.BonjourPublisher(port=8080), discovery=main.DiscoveryService(port=8080))\n"
+                "print(sorted(m for m in ('httpx', 'zeroconf') if m in sys.modules))")
+        output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip().splitlines()[-1], "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,16 @@
 """
 Tests for Bonjour Service
 """
+import asyncio
+import socket
 import unittest
 import time
-from bonjour_service import BonjourPublisher
+from collections import namedtuple
+from bonjour_service import BonjourPublisher, load_bucket, usable_addresses
+from collector import Snapshot
+
+Addr = namedtuple("Addr", ["family", "address"])
+Stats = namedtuple("Stats", ["isup"])
 
 
 class TestBonjourService(unittest.TestCase):
@@ -121,6 +128,72 @@ class TestBonjourService(unittest.TestCase):
         except Exception as e:
             self.fail(f"stop() raised exception: {e}")
 
+    
+    def test_usable_addresses(self):
+        """Test that all up interfaces are advertised without loopback or link-local addresses"""
+        addrs = {
+            "lo0": [Addr(socket.AF_INET, "127.0.0.1"), Addr(socket.AF_INET6, "::1")],
+            "en0": [Addr(socket.AF_INET, "192.168.1.5"), Addr(socket.AF_INET6, "fe80::1%en0"),
+                    Addr(socket.AF_INET6, "2001:db8::5")],
+            "en1": [Addr(socket.AF_INET, "10.0.0.7")],
+            "en2": [Addr(socket.AF_INET, "10.0.9.9")],
+            "awdl0": [Addr(socket.AF_INET, "169.254.3.3")],
+        }
+        stats = {"lo0": Stats(True), "en0": Stats(True), "en1": Stats(True), "en2": Stats(False), "awdl0": Stats(True)}
+        
+        self.assertEqual(usable_addresses(addrs, stats), ["10.0.0.7", "192.168.1.5", "2001:db8::5"])
+    
+    def test_usable_addresses_offline(self):
+        """Test that an offline machine falls back to loopback"""
+        addrs = {"lo0": [Addr(socket.AF_INET, "127.0.0.1")], "en0": [Addr(socket.AF_INET, "169.254.1.1")]}
+        self.assertEqual(usable_addresses(addrs, {}), ["127.0.0.1"])
+        self.assertEqual(usable_addresses({}, {}), ["127.0.0.1"])
+    
+    def test_txt_load_hint(self):
+        """Test that the TXT record carries capabilities and the load bucket"""
+        bonjour = BonjourPublisher(port=8086)
+        self.assertNotIn("load", bonjour.properties())
+        bonjour.record(Snapshot(1, 0.0, {"cpu": {"usage": 0.6}}))
+        
+        properties = bonjour.properties()
+        self.assertEqual(properties["load"], "2")
+        self.assertIn("stream", properties["api"].split(","))
+        self.assertEqual([load_bucket(usage) for usage in (0.0, 0.24, 0.25, 0.99, 1.0)], [0, 0, 1, 3, 3])
+    
+    def test_async_publish_and_refresh(self):
+        """Test async publishing, rate-limited TXT updates and re-registration on address changes"""
+        addresses = [["127.0.0.1"]]
+        bonjour = BonjourPublisher(port=8087, txt_interval=3600, refresh_interval=3600,
+                                   address_source=lambda: addresses[0])
+        
+        async def scenario():
+            await bonjour.async_start()
+            while bonjour.registrations == 0:
+                await asyncio.sleep(0.05)
+            first = bonjour.zeroconf
+            
+            # 负载变化但未到 TXT 更新间隔：不更新
+            bonjour.record(Snapshot(1, 0.0, {"cpu": {"usage": 0.9}}))
+            await bonjour.refresh()
+            unchanged = bonjour.info.properties.get(b"load")
+            bonjour.txt_interval = 0
+            await bonjour.refresh()
+            updated = bonjour.info.properties.get(b"load")
+            
+            addresses[0] = ["127.0.0.2"]
+            await bonjour.refresh()
+            result = (first, bonjour.zeroconf, unchanged, updated, bonjour.info.parsed_addresses())
+            await bonjour.async_stop()
+            return result
+        
+        first, second, unchanged, updated, parsed = asyncio.run(scenario())
+        self.assertIsNone(unchanged)
+        self.assertEqual(updated, b"3")
+        self.assertIsNot(first, second)
+        self.assertEqual(parsed, ["127.0.0.2"])
+        self.assertEqual(bonjour.registrations, 2)
+        self.assertIsNone(bonjour.zeroconf)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the agent overhead budget
+"""
+import unittest
+from budget import BATTERY_STRETCH, LOW_BATTERY_STRETCH, OverheadBudget
+from collector import StatusCollector
+from system_monitor import SystemMonitor
+
+PLUGGED = {"level": 0.9, "isCharging": True}
+UNPLUGGED = {"level": 0.9, "isCharging": False}
+LOW = {"level": 0.1, "isCharging": False}
+
+
+class TestOverheadBudget(unittest.TestCase):
+    """Test cases for OverheadBudget"""
+    
+    def run_window(self, budget, now, cpu, costs, battery=PLUGGED):
+        for name, seconds in costs.items():
+            budget.charge(name, seconds)
+        return budget.update(now, cpu, battery)
+    
+    def test_over_budget_stretches_most_expensive(self):
+        """Test that the costliest adaptive collector is doubled when over budget"""
+        budget = OverheadBudget(cpu_budget=0.01, window=10)
+        self.run_window(budget, 0, 0.0, {})
+        changes = self.run_window(budget, 10, 0.5, {"processes": 0.3, "temperature": 0.01, "cpu": 0.1})
+        
+        self.assertEqual(budget.usage, 0.05)
+        self.assertEqual(budget.factor("processes"), 2)
+        self.assertEqual(budget.factor("temperature"), 1)
+        self.assertEqual(budget.factor("cpu"), 1)
+        self.assertEqual(changes[0]["collector"], "processes")
+        self.assertEqual(changes[0]["reason"], "over budget")
+        
+        for i in range(2, 6):
+            self.run_window(budget, i * 10, 0.5 * i, {"processes": 0.3})
+        self.assertEqual(budget.factor("processes"), 8)
+    
+    def test_relaxes_when_well_under_budget(self):
+        """Test that intervals are restored once usage falls below half the budget"""
+        budget = OverheadBudget(cpu_budget=0.01, window=10)
+        self.run_window(budget, 0, 0.0, {})
+        self.run_window(budget, 10, 0.5, {"processes": 0.3})
+        # 0.8% is under budget but above half of it: no change
+        self.run_window(budget, 20, 0.58, {"processes": 0.01})
+        self.assertEqual(budget.factor("processes"), 2)
+        changes = self.run_window(budget, 30, 0.59, {"processes": 0.001})
+        self.assertEqual(budget.factor("processes"), 1)
+        self.assertEqual(changes[0]["reason"], "restored")
+        self.assertEqual(len(budget.stats()["changes"]), 2)
+    
+    def test_battery_stretches_adaptive_collectors(self):
+        """Test that unplugged and low battery stretch intervals without a CPU budget"""
+        budget = OverheadBudget(cpu_budget=None, window=10)
+        self.run_window(budget, 0, 0.0, {}, UNPLUGGED)
+        self.assertTrue(budget.on_battery)
+        self.assertEqual(budget.factor("processes"), BATTERY_STRETCH)
+        self.assertEqual(budget.factor("cpu"), 1)
+        
+        changes = self.run_window(budget, 10, 0.0, {}, LOW)
+        self.assertEqual(budget.factor("temperature"), LOW_BATTERY_STRETCH)
+        self.assertEqual(changes[0]["reason"], "low battery")
+        
+        self.run_window(budget, 20, 0.0, {}, PLUGGED)
+        self.assertEqual(budget.factor("temperature"), 1)
+        
+        budget = OverheadBudget(cpu_budget=None, battery_saver=False)
+        budget.update(0, 0.0, LOW)
+        self.assertEqual(budget.factor("processes"), 1)
+    
+    def test_unknown_battery_is_ignored(self):
+        """Test that machines without a battery are treated as plugged in"""
+        budget = OverheadBudget()
+        budget.update(0, 0.0, {"level": None, "isCharging": None})
+        self.assertIsNone(budget.on_battery)
+        self.assertEqual(budget.factor("processes"), 1)
+
+
+class TestCollectorBudget(unittest.TestCase):
+    """Test cases for the budget inside StatusCollector"""
+    
+    def test_effective_intervals_in_stats(self):
+        """Test that stretched intervals drive scheduling and are reported"""
+        budget = OverheadBudget(cpu_budget=0.01)
+        collector = StatusCollector(SystemMonitor(cpu_interval=None), intervals={"processes": 0}, budget=budget)
+        collector.sample()
+        self.assertIn("processes", budget.cpu_seconds)
+        
+        budget.stretch["processes"] = 4
+        collector.intervals["processes"] = 60
+        stats = collector.stats()
+        self.assertEqual(stats["effectiveIntervals"]["processes"], 240)
+        self.assertEqual(stats["effectiveIntervals"]["cpu"], 1)
+        self.assertEqual(stats["budget"]["stretch"]["processes"], 4)
+        
+        runs = collector.runs["processes"]
+        collector.sample()
+        self.assertEqual(collector.runs["processes"], runs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for StatusCollector
+"""
+import unittest
+import time
+from system_monitor import SystemMonitor
+from collector import StatusCollector
+
+
+class TestStatusCollector(unittest.TestCase):
+    """Test cases for StatusCollector"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.collector = StatusCollector(SystemMonitor(cpu_interval=None), interval=0.1)
+    
+    def tearDown(self):
+        self.collector.stop()
+    
+    def test_latest_is_none_before_sampling(self):
+        """Test that no snapshot exists before the first sample"""
+        self.assertIsNone(self.collector.latest())
+    
+    def test_sample_publishes_snapshot(self):
+        """Test that sample() publishes a new snapshot generation"""
+        first = self.collector.sample()
+        second = self.collector.sample()
+        
+        self.assertEqual(second.generation, first.generation + 1)
+        self.assertIs(self.collector.latest(), second)
+        self.assertIn("cpu", second.status)
+        self.assertLessEqual(second.sampled_at, time.time())
+    
+    def test_background_sampling(self):
+        """Test that the background thread keeps publishing snapshots"""
+        self.collector.start()
+        self.assertTrue(self.collector.running)
+        time.sleep(0.5)
+        snapshot = self.collector.latest()
+        
+        self.assertIsNotNone(snapshot)
+        self.assertGreater(snapshot.generation, 1)
+        
+        self.collector.stop()
+        self.assertFalse(self.collector.running)
+    
+    def test_listeners_receive_snapshots(self):
+        """Test that listeners are called with each snapshot"""
+        received = []
+        self.collector.add_listener(received.append)
+        snapshot = self.collector.sample()
+        
+        self.assertEqual(received, [snapshot])
+    
+    def test_failing_listener_does_not_break_sampling(self):
+        """Test that a failing listener does not prevent publishing"""
+        def broken(snapshot):
+            raise RuntimeError("boom")
+        
+        self.collector.add_listener(broken)
+        snapshot = self.collector.sample()
+        self.assertIs(self.collector.latest(), snapshot)
+
+    
+    def test_collector_timings(self):
+        """Test that each collector run and each sample is timed"""
+        self.collector.sample()
+        self.collector.sample(only=["cpu"])
+        timings = self.collector.timings.to_dict()
+        
+        self.assertEqual(timings["collector"]["cpu"]["count"], 2)
+        self.assertEqual(timings["collector"]["disk"]["count"], 1)
+        self.assertEqual(timings["snapshot"]["sample"]["count"], 2)
+        self.assertIn("listeners", timings["snapshot"])
+    
+    def test_per_collector_intervals(self):
+        """Test that collectors which are not due reuse their previous result"""
+        collector = StatusCollector(SystemMonitor(cpu_interval=None), intervals={"cpu": 0, "disk": 60})
+        collector.sample()
+        collector.sample()
+        
+        self.assertEqual(collector.runs["disk"], 1)
+        self.assertEqual(collector.runs["cpu"], 2)
+        self.assertIn("disk", collector.latest().status)
+    
+    def test_disabled_collectors(self):
+        """Test that disabled collectors never run and their fields are omitted"""
+        collector = StatusCollector(SystemMonitor(cpu_interval=None), disabled=("processes", "temperature"))
+        status = collector.sample().status
+        
+        self.assertNotIn("processes", collector.runs)
+        self.assertNotIn("processCount", status)
+        self.assertNotIn("temperature", status)
+        self.assertNotIn("temperature", status["cpu"])
+    
+    def test_unknown_collector_rejected(self):
+        """Test that configuring an unknown collector fails fast"""
+        with self.assertRaises(ValueError):
+            StatusCollector(SystemMonitor(cpu_interval=None), disabled=("gpu",))
+    
+    def test_on_demand_runs_only_demanded_collectors(self):
+        """Test that collectors nobody asked for stop running"""
+        collector = StatusCollector(SystemMonitor(cpu_interval=None), on_demand=True)
+        collector.acquire({"cpu"})
+        snapshot = collector.sample()
+        
+        self.assertEqual(snapshot.collectors, frozenset(["cpu"]))
+        self.assertIn("cpu", snapshot.status)
+        self.assertNotIn("processCount", snapshot.status)
+        
+        collector.release({"cpu"})
+        collector.touch({"memory"})
+        snapshot = collector.sample()
+        self.assertEqual(snapshot.collectors, frozenset(["memory"]))
+        self.assertEqual(collector.runs["cpu"], 1)
+    
+    def test_expired_lease_stops_collector(self):
+        """Test that touch() demand expires after its TTL"""
+        collector = StatusCollector(SystemMonitor(cpu_interval=None), on_demand=True)
+        collector.touch({"uptime"}, ttl=0)
+        
+        self.assertEqual(collector.demanded(), set())
+    
+    def test_sample_only_fills_missing_collectors(self):
+        """Test that a forced sample runs only the requested collectors"""
+        collector = StatusCollector(SystemMonitor(cpu_interval=None), on_demand=True)
+        collector.acquire({"cpu"})
+        collector.sample()
+        
+        self.assertEqual(collector.missing({"cpu", "battery"}), ["battery"])
+        snapshot = collector.sample(only=["battery"])
+        self.assertEqual(collector.runs["cpu"], 1)
+        self.assertIn("cpu", snapshot.status)
+        self.assertIn("batteryLevel", snapshot.status)
+
+
+if __name__ == "__main__":
+    unittest.main()
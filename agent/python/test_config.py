@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the agent configuration layer
+"""
+import argparse
+import json
+import os
+import tempfile
+import unittest
+from config import ServerConfig, add_arguments, load_config
+
+
+def parse(*argv):
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+class TestServerConfig(unittest.TestCase):
+    """Test cases for load_config and ServerConfig"""
+    
+    def setUp(self):
+        """Set up a temporary config file"""
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+    
+    def tearDown(self):
+        os.remove(self.path)
+    
+    def write(self, data):
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+    
+    def test_defaults(self):
+        """Test the defaults and the uvicorn options derived from them"""
+        config = load_config(parse(), environ={})
+        self.assertEqual((config.host, config.port, config.workers), ("0.0.0.0", 8080, 1))
+        self.assertEqual(config.uvicorn_options(), {
+            "host": "0.0.0.0",
+            "port": 8080,
+            "workers": 1,
+            "loop": "auto",
+            "http": "auto",
+            "timeout_keep_alive": 5,
+            "backlog": 2048,
+            "limit_concurrency": None,
+            "log_level": "info",
+        })
+    
+    def test_precedence(self):
+        """Test that the file overrides defaults, env overrides the file and CLI overrides env"""
+        self.write({"port": 9000, "workers": 4, "keepAlive": 30, "logLevel": "warning"})
+        environ = {"MACMONITOR_CONFIG": self.path, "MACMONITOR_PORT": "9100", "MACMONITOR_WORKERS": "2"}
+        config = load_config(parse("--workers", "3", "--backlog", "512"), environ=environ)
+        
+        self.assertEqual((config.port, config.workers, config.backlog), (9100, 3, 512))
+        self.assertEqual((config.keep_alive, config.log_level), (30, "warning"))
+        self.assertEqual(load_config(parse("--config", self.path), environ={}).port, 9000)
+    
+    def test_data_dir_and_budget_from_env(self):
+        """Test that the existing MACMONITOR_DATA_DIR / MACMONITOR_CPU_BUDGET variables are honoured"""
+        config = load_config(environ={"MACMONITOR_DATA_DIR": "/tmp/mm", "MACMONITOR_CPU_BUDGET": "0.5"})
+        self.assertEqual((config.data_dir, config.cpu_budget), ("/tmp/mm", 0.5))
+        self.assertEqual(config.to_dict()["cpuBudget"], 0.5)
+    
+    def test_pinned_metrics(self):
+        """Test the default pinned history metrics and the comma-separated override"""
+        self.assertNotIn("temperature", load_config(environ={}).pinned())
+        config = load_config(environ={"MACMONITOR_PINNED_METRICS": "cpu.usage, temperature"})
+        self.assertEqual(config.pinned(), ("cpu.usage", "temperature"))
+        self.assertEqual(ServerConfig(pinned_metrics="").pinned(), ())
+        with self.assertRaises(ValueError):
+            ServerConfig(pinned_metrics="cpu.usage,gpu")
+    
+    def test_validation(self):
+        """Test that invalid values are rejected with ValueError"""
+        for values in [{"port": 70000}, {"workers": 0}, {"loop": "trio"}, {"http": "h2"},
+                       {"log_level": "loud"}, {"limit_concurrency": 0}]:
+            with self.assertRaises(ValueError):
+                ServerConfig(**values)
+        with self.assertRaises(ValueError):
+            load_config(environ={"MACMONITOR_PORT": "http"})
+    
+    def test_file_errors(self):
+        """Test that unknown keys and wrongly typed values in the file are rejected"""
+        self.write({"port": 8080, "threads": 4})
+        with self.assertRaises(ValueError):
+            load_config(parse("--config", self.path), environ={})
+        self.write({"workers": "many"})
+        with self.assertRaises(ValueError):
+            load_config(parse("--config", self.path), environ={})
+
+
+if __name__ == "__main__":
+    unittest.main()
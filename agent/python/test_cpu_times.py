@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for per-core CPU time deltas
+"""
+import unittest
+import psutil
+from cpu_times import CpuTimes
+
+
+class TestCpuTimes(unittest.TestCase):
+    """Test cases for CpuTimes"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.cpu = CpuTimes()
+
+    def make_times(self, *rows):
+        """Build a cores x fields matrix from {field: value} rows"""
+        return [[row.get(field, 0.0) for field in self.cpu.fields] for row in rows]
+
+    def test_first_update_only_records_baseline(self):
+        """Test that the first reading has nothing to diff against"""
+        self.assertIsNone(self.cpu.update())
+
+    def test_live_reading(self):
+        """Test a real per-core reading"""
+        self.cpu.update()
+        result = self.cpu.update()
+
+        self.assertEqual(len(result["perCore"]), psutil.cpu_count())
+        self.assertGreaterEqual(result["usage"], 0.0)
+        self.assertLessEqual(result["usage"], 1.0)
+        self.assertEqual(set(result["times"]), {"user", "system", "idle", "iowait", "steal"})
+
+    def test_per_core_usage_from_deltas(self):
+        """Test that one pegged core is visible next to an idle one"""
+        self.cpu.update(self.make_times({"user": 10, "idle": 10}, {"user": 10, "idle": 10}))
+        result = self.cpu.update(self.make_times({"user": 20, "idle": 10}, {"user": 10, "idle": 20}))
+
+        self.assertEqual(result["perCore"], [1.0, 0.0])
+        self.assertAlmostEqual(result["usage"], 0.5)
+        self.assertAlmostEqual(result["times"]["user"], 0.5)
+        self.assertAlmostEqual(result["times"]["idle"], 0.5)
+
+    def test_counter_reset_and_core_change(self):
+        """Test that counters going backwards count as zero and a core count change resets the baseline"""
+        self.cpu.update(self.make_times({"user": 10, "idle": 10}))
+        result = self.cpu.update(self.make_times({"user": 5, "idle": 20}))
+        self.assertEqual(result["perCore"], [0.0])
+
+        self.assertIsNone(self.cpu.update(self.make_times({"idle": 30}, {"idle": 30})))
+
+
+    def test_sample_survives_core_change(self):
+        """Test that sample() keeps the previous reading while the baseline is reset"""
+        self.assertEqual(self.cpu.sample(self.make_times({"idle": 10}))["perCore"], [0.0])
+        previous = self.cpu.sample(self.make_times({"user": 10, "idle": 10}))
+        self.assertEqual(previous["perCore"], [1.0])
+
+        self.assertIs(self.cpu.sample(self.make_times({"idle": 30}, {"idle": 30})), previous)
+        self.assertEqual(self.cpu.sample(self.make_times({"user": 10, "idle": 40}, {"idle": 40}))["perCore"],
+                         [0.5, 0.0])
+
+if __name__ == "__main__":
+    unittest.main()
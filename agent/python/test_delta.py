@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for DeltaEncoder
+"""
+import unittest
+from delta import DeltaEncoder, apply_delta, flatten, unflatten
+
+
+def status(usage, used=1000, uptime=10.0):
+    return {
+        "cpu": {"usage": usage, "coreCount": 8},
+        "memory": {"total": 4096, "used": used},
+        "uptime": uptime,
+    }
+
+
+class TestDeltaEncoder(unittest.TestCase):
+    """Test cases for DeltaEncoder"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.encoder = DeltaEncoder(thresholds={"cpu.usage": 0.01, "memory.used": 0, "uptime": 60})
+    
+    def test_flatten_roundtrip(self):
+        """Test that flatten and unflatten are inverses"""
+        data = status(0.5)
+        self.assertEqual(flatten(data)["cpu.usage"], 0.5)
+        self.assertEqual(unflatten(flatten(data)), data)
+    
+    def test_first_frame_is_keyframe(self):
+        """Test that unknown clients receive a keyframe"""
+        self.encoder.update(1, status(0.5))
+        frame = self.encoder.frame_since(None)
+        
+        self.assertEqual(frame["type"], "keyframe")
+        self.assertEqual(frame["seq"], 1)
+        self.assertEqual(frame["data"], status(0.5))
+    
+    def test_delta_contains_only_changes(self):
+        """Test that unchanged fields are omitted from deltas"""
+        self.encoder.update(1, status(0.5))
+        self.encoder.update(2, status(0.6, used=2000))
+        frame = self.encoder.frame_since(1)
+        
+        self.assertEqual(frame["type"], "delta")
+        self.assertEqual(frame["base"], 1)
+        self.assertEqual(frame["set"], {"cpu.usage": 0.6, "memory.used": 2000})
+        self.assertEqual(frame["unset"], [])
+    
+    def test_quantization_threshold(self):
+        """Test that changes below the threshold are suppressed until they accumulate"""
+        self.encoder.update(1, status(0.500, uptime=10))
+        self.encoder.update(2, status(0.505, uptime=11))
+        self.assertEqual(self.encoder.frame_since(1)["set"], {})
+        
+        # Drift is measured against the last value sent, not the last sample
+        self.encoder.update(3, status(0.511, uptime=12))
+        self.assertEqual(self.encoder.frame_since(2)["set"], {"cpu.usage": 0.511})
+    
+    def test_composite_delta_for_lagging_client(self):
+        """Test that a client that skipped frames gets the merged changes"""
+        self.encoder.update(1, status(0.1))
+        self.encoder.update(2, status(0.2))
+        self.encoder.update(3, status(0.2, used=3000))
+        frame = self.encoder.frame_since(1)
+        
+        self.assertEqual(frame["set"], {"cpu.usage": 0.2, "memory.used": 3000})
+        state = apply_delta(flatten(status(0.1)), frame)
+        self.assertEqual(unflatten(state), status(0.2, used=3000))
+    
+    def test_removed_fields(self):
+        """Test that disappearing fields are reported as unset"""
+        self.encoder.update(1, {"a": 1, "b": {"c": 2}})
+        self.encoder.update(2, {"a": 1})
+        self.assertEqual(self.encoder.frame_since(1)["unset"], ["b.c"])
+    
+    def test_resync_from_expired_seq(self):
+        """Test that a seq older than the kept history yields a keyframe"""
+        encoder = DeltaEncoder(history=2)
+        for seq in range(1, 6):
+            encoder.update(seq, status(seq / 10))
+        self.assertEqual(encoder.frame_since(1)["type"], "keyframe")
+        self.assertEqual(encoder.frame_since(3)["type"], "delta")
+        self.assertEqual(encoder.frame_since(999)["type"], "keyframe")
+    
+    def test_field_filter(self):
+        """Test that frames can be restricted to top-level fields"""
+        self.encoder.update(1, status(0.1))
+        self.encoder.update(2, status(0.2, used=2000))
+        self.assertEqual(set(self.encoder.keyframe(frozenset(["cpu"]))["data"]), {"cpu"})
+        self.assertEqual(self.encoder.frame_since(1, frozenset(["memory"]))["set"], {"memory.used": 2000})
+    
+    def test_wildcard_thresholds(self):
+        """Test that thresholds accept fnmatch patterns"""
+        encoder = DeltaEncoder(thresholds={"network.interfaces.*.bytesIn": 1024})
+        self.assertEqual(encoder.threshold("network.interfaces.en0.bytesIn"), 1024)
+        self.assertEqual(encoder.threshold("network.interfaces.en0.packetsIn"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for the LAN discovery service and /api/peers
+"""
+import asyncio
+import unittest
+import httpx
+from fastapi.testclient import TestClient
+from api_server import create_app
+from discovery import DiscoveryService
+from fleet import decode_txt
+
+
+def health_client(down=(), delay=0.0, tracker=None):
+    """AsyncClient whose /health answers 200, except for hosts in down"""
+    async def handler(request):
+        if tracker is not None:
+            tracker["active"] += 1
+            tracker["max"] = max(tracker["max"], tracker["active"])
+        try:
+            await asyncio.sleep(delay)
+            if request.url.host in down:
+                raise httpx.ConnectError("connection refused", request=request)
+            return httpx.Response(200, json={"status": "ok"})
+        finally:
+            if tracker is not None:
+                tracker["active"] -= 1
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestDiscoveryService(unittest.TestCase):
+    """Test cases for DiscoveryService"""
+    
+    def test_probe_health(self):
+        """Test that probing records latency for healthy peers and errors for the rest"""
+        discovery = DiscoveryService(browse=False, client=health_client(down={"10.0.0.2"}))
+        discovery.add_peer("10.0.0.1", 8080, name="mini")
+        discovery.add_peer("10.0.0.2", 8080, name="air")
+        
+        healthy = asyncio.run(discovery.probe_once())
+        
+        self.assertEqual(healthy, 1)
+        up, down = discovery.peers["10.0.0.1:8080"], discovery.peers["10.0.0.2:8080"]
+        self.assertTrue(up.healthy)
+        self.assertIsNotNone(up.latency)
+        self.assertEqual((down.healthy, down.failures), (False, 1))
+        self.assertIn("refused", down.error)
+        self.assertEqual(discovery.stats(), {"peers": 2, "healthy": 1, "rounds": 1, "expired": 0})
+    
+    def test_bounded_parallelism(self):
+        """Test that probes run concurrently but never exceed the concurrency limit"""
+        tracker = {"active": 0, "max": 0}
+        discovery = DiscoveryService(browse=False, concurrency=4,
+                                     client=health_client(delay=0.02, tracker=tracker))
+        for i in range(20):
+            discovery.add_peer(f"10.0.1.{i}", 8080)
+        
+        self.assertEqual(asyncio.run(discovery.probe_once()), 20)
+        self.assertEqual(tracker["max"], 4)
+    
+    def test_ttl_expiry(self):
+        """Test that peers not confirmed within the TTL are dropped"""
+        discovery = DiscoveryService(browse=False, ttl=60)
+        fresh = discovery.add_peer("10.0.0.1", 8080)
+        stale = discovery.add_peer("10.0.0.2", 8080)
+        stale.last_seen -= 120
+        discovery.expire()
+        
+        self.assertEqual(list(discovery.peers), [fresh.id])
+        self.assertEqual(discovery.expired, 1)
+        
+        # 重新公告会刷新最近出现时间
+        fresh.last_seen -= 120
+        discovery.add_peer("10.0.0.1", 8080, txt={"load": "1"})
+        discovery.expire()
+        self.assertEqual(discovery.peers[fresh.id].txt, {"load": "1"})
+    
+    def test_ranking_and_self(self):
+        """Test that healthy, lightly loaded peers are listed first and the agent itself is flagged"""
+        discovery = DiscoveryService(port=8080, browse=False)
+        busy = discovery.add_peer("10.0.0.1", 8080, name="busy", txt={"load": "3"})
+        idle = discovery.add_peer("10.0.0.2", 8080, name="idle", txt={"load": "0"})
+        down = discovery.add_peer("10.0.0.3", 8080, name="down", txt={"load": "0"})
+        own = discovery.add_peer("127.0.0.1", 8080, name="me")
+        for peer in (busy, idle, own):
+            peer.healthy, peer.latency = True, 0.01
+        down.healthy = False
+        
+        peers = discovery.to_dict()["peers"]
+        self.assertEqual([peer["name"] for peer in peers], ["idle", "busy", "me", "down"])
+        self.assertEqual([peer["self"] for peer in peers], [False, False, True, False])
+        self.assertEqual(peers[0]["url"], "http://10.0.0.2:8080")
+    
+    def test_decode_txt(self):
+        """Test that TXT records are decoded to strings"""
+        self.assertEqual(decode_txt({b"load": b"2", b"api": b"status,stream", b"flag": None}),
+                         {"load": "2", "api": "status,stream"})
+        self.assertEqual(decode_txt(None), {})
+
+
+class TestPeersEndpoint(unittest.TestCase):
+    """Test cases for /api/peers"""
+    
+    def test_peers(self):
+        """Test that /api/peers returns the cached list"""
+        discovery = DiscoveryService(port=8080, browse=False, probe_interval=3600, client=health_client())
+        discovery.add_peer("10.0.0.9", 8080, name="studio", txt={"load": "1"})
+        app = create_app(discovery=discovery)
+        with TestClient(app) as client:
+            data = client.get("/api/peers").json()
+            stats = client.get("/api/agent/stats").json()
+        
+        self.assertFalse(data["browsing"])
+        self.assertEqual(data["peers"][0]["name"], "studio")
+        self.assertEqual(data["peers"][0]["txt"], {"load": "1"})
+        self.assertTrue(data["peers"][0]["healthy"])
+        self.assertEqual(stats["discovery"]["peers"], 1)
+    
+    def test_peers_disabled(self):
+        """Test that /api/peers is unavailable without a discovery service"""
+        with TestClient(create_app()) as client:
+            self.assertEqual(client.get("/api/peers").status_code, 503)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for DiskMonitor
+"""
+import unittest
+from disks import DiskMonitor, io_summary, mount_signature
+
+
+class TestDiskMonitor(unittest.TestCase):
+    """Test cases for DiskMonitor"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.disks = DiskMonitor()
+    
+    def test_volumes_include_root(self):
+        """Test that mounted volumes are listed with usage"""
+        volumes = self.disks.get_volumes()
+        
+        self.assertGreater(len(volumes), 0)
+        for volume in volumes:
+            for field in ["mountpoint", "device", "fstype", "total", "used", "free"]:
+                self.assertIn(field, volume)
+    
+    def test_partitions_enumerated_only_on_mount_change(self):
+        """Test that the partition list is reused until the mount table changes"""
+        if mount_signature() is None:
+            self.skipTest("Mount table changes cannot be detected on this platform")
+        self.disks.refresh_partitions()
+        self.disks.refresh_partitions()
+        self.assertEqual(self.disks.enumerations, 1)
+        
+        # Simulate a mount table change
+        self.disks._signature = b"stale"
+        self.disks.refresh_partitions()
+        self.assertEqual(self.disks.enumerations, 2)
+    
+    def test_io_rates(self):
+        """Test that disk IO returns throughput, IOPS and service time"""
+        io = self.disks.get_io()
+        
+        for field in ["readBytes", "writeBytes", "readOps", "writeOps", "serviceTime", "disks"]:
+            self.assertIn(field, io)
+        self.assertGreaterEqual(io["readBytes"], 0)
+    
+    def test_service_time(self):
+        """Test that service time is busy time per operation"""
+        summary = io_summary({
+            "readBytes": 4096.0, "writeBytes": 0.0, "readOps": 8.0, "writeOps": 2.0,
+            "readTime": 30.0, "writeTime": 10.0
+        })
+        self.assertEqual(summary["serviceTime"], 4.0)
+        self.assertEqual(summary["readBytes"], 4096)
+        
+        idle = io_summary(dict.fromkeys(["readBytes", "writeBytes", "readOps", "writeOps", "readTime", "writeTime"], 0.0))
+        self.assertEqual(idle["serviceTime"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for wire format encoding and content negotiation
+"""
+import json
+import unittest
+import msgpack
+from encoding import (
+    COLUMNAR, JSON, MSGPACK, decode_columnar, encode, encode_columnar, negotiate
+)
+
+
+class TestNegotiation(unittest.TestCase):
+    """Test cases for Accept header negotiation"""
+    
+    def test_default_is_first_offer(self):
+        """Test that a missing or wildcard Accept header picks the default"""
+        self.assertEqual(negotiate(None, [JSON, MSGPACK]), JSON)
+        self.assertEqual(negotiate("*/*", [JSON, MSGPACK]), JSON)
+    
+    def test_exact_match(self):
+        """Test that an explicit media type is honoured"""
+        self.assertEqual(negotiate("application/msgpack", [JSON, MSGPACK]), MSGPACK)
+        self.assertEqual(negotiate("application/x-msgpack", [JSON, MSGPACK]), MSGPACK)
+    
+    def test_quality_values(self):
+        """Test that q-values rank the candidates"""
+        accept = "application/json;q=0.5, application/msgpack;q=0.9"
+        self.assertEqual(negotiate(accept, [JSON, MSGPACK]), MSGPACK)
+        accept = "application/msgpack;q=0, application/json"
+        self.assertEqual(negotiate(accept, [JSON, MSGPACK]), JSON)
+    
+    def test_unacceptable(self):
+        """Test that unsupported formats yield None"""
+        self.assertIsNone(negotiate("text/html", [JSON, MSGPACK]))
+
+
+class TestEncoders(unittest.TestCase):
+    """Test cases for the encoders"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.result = {
+            "from": 1000.0,
+            "to": 1060.0,
+            "step": 30,
+            "timestamps": [1000.0, 1030.0],
+            "series": {
+                "cpu.usage": {"min": [0.1, 0.2], "max": [0.3, None]},
+                "memory.pressure": {"avg": [0.5, 0.6]},
+            },
+        }
+    
+    def test_json_and_msgpack_roundtrip(self):
+        """Test that JSON and MessagePack carry the same payload"""
+        payload = {"cpu": {"usage": 0.25, "coreCount": 8}, "temperature": None}
+        self.assertEqual(json.loads(encode(payload, JSON)), payload)
+        self.assertEqual(msgpack.unpackb(encode(payload, MSGPACK)), payload)
+    
+    def test_columnar_roundtrip(self):
+        """Test that the columnar format decodes back to the query result"""
+        data = encode_columnar(self.result)
+        self.assertEqual(decode_columnar(data), self.result)
+    
+    def test_columnar_layout_is_aligned(self):
+        """Test that every float64 column starts on an 8-byte boundary"""
+        data = encode(self.result, COLUMNAR)
+        self.assertEqual(len(data) % 8, 0)
+        self.assertEqual(data[:4], b"MMC1")
+    
+    def test_columnar_rejects_garbage(self):
+        """Test that decoding a non-columnar payload fails"""
+        with self.assertRaises(ValueError):
+            decode_columnar(b"\0" * 64)
+
+
+if __name__ == "__main__":
+    unittest.main()
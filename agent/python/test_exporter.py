@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Tests for the push exporter and its spool
+"""
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collector import Snapshot
+from exporter import FileSpool, MemorySpool, PushExporter, encode_line
+
+
+class StandInSink:
+    """Local HTTP server that records pushed batches; responses can be scripted"""
+    
+    def __init__(self):
+        self.batches = []
+        self.responses = []
+        sink = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                status = sink.responses.pop(0) if sink.responses else 204
+                if status < 300:
+                    if self.headers.get("Content-Encoding") == "gzip":
+                        body = gzip.decompress(body)
+                    sink.batches.append((self.headers.get("Content-Type"), body.decode()))
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/write"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+    
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def timestamps(self):
+        return [json.loads(line)["sampledAt"] for _, body in self.batches for line in body.splitlines()]
+
+
+def snapshot(i):
+    status = {
+        "timestamp": "t", "cpu": {"usage": 0.5, "perCore": [0.5]}, "processCount": 10, "isCharging": True,
+        "network": {"bytesIn": 1, "interfaces": {"en 0": {"bytesIn": 1, "bytesOut": 2}}},
+    }
+    return Snapshot(i, float(i), status)
+
+
+class TestPushExporter(unittest.TestCase):
+    """Test cases for PushExporter"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.sink = StandInSink()
+        self.temp_dir = tempfile.mkdtemp()
+        self.exporters = []
+    
+    def tearDown(self):
+        """Clean up"""
+        for exporter in self.exporters:
+            exporter.spool.close()
+            exporter.client.close()
+        self.sink.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def make_exporter(self, url=None, **kwargs):
+        kwargs.setdefault("batch_size", 2)
+        kwargs.setdefault("retry_delay", 0.01)
+        exporter = PushExporter(url or self.sink.url, host="mac-1", **kwargs)
+        self.exporters.append(exporter)
+        return exporter
+    
+    def test_batches_are_compressed_and_ordered(self):
+        """Test that full batches are pushed gzip-compressed as NDJSON"""
+        exporter = self.make_exporter()
+        for i in range(5):
+            exporter.record(snapshot(i))
+        exporter.flush()
+        
+        self.assertEqual(len(self.sink.batches), 2)
+        self.assertEqual(self.sink.batches[0][0], "application/x-ndjson")
+        self.assertEqual(self.sink.timestamps(), [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(json.loads(self.sink.batches[0][1].splitlines()[0])["host"], "mac-1")
+        
+        exporter.flush(everything=True)
+        self.assertEqual(self.sink.timestamps(), [0.0, 1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(exporter.stats()["sent"], 3)
+    
+    def test_line_protocol(self):
+        """Test InfluxDB line protocol encoding"""
+        lines = encode_line("mac 1", 1.5, snapshot(0).status)
+        self.assertEqual(lines[0], "macmonitor,host=mac\\ 1 cpu_usage=0.5,processCount=10i,isCharging=true,"
+                                   "network_bytesIn=1i 1500000000")
+        self.assertEqual(lines[1], "macmonitor_net,host=mac\\ 1,interface=en\\ 0 bytesIn=1i,bytesOut=2i 1500000000")
+        self.assertEqual(lines[2], "macmonitor_core,host=mac\\ 1,core=0 usage=0.5 1500000000")
+        
+        volume = {"mountpoint": "/Volumes/Data 1", "device": "/dev/disk3", "fstype": "apfs",
+                  "total": 100, "used": 40, "free": 60}
+        lines = encode_line("mac", 1.5, {"disk": {"total": 100, "volumes": [volume]}})
+        self.assertEqual(lines, [
+            "macmonitor,host=mac disk_total=100i 1500000000",
+            "macmonitor_volume,host=mac,mountpoint=/Volumes/Data\\ 1 total=100i,used=40i,free=60i 1500000000",
+        ])
+        
+        exporter = self.make_exporter(format="line")
+        exporter.record(snapshot(1))
+        exporter.flush(everything=True)
+        self.assertTrue(self.sink.batches[0][1].startswith("macmonitor,host=mac-1 "))
+        with self.assertRaises(ValueError):
+            PushExporter(self.sink.url, format="csv")
+    
+    def test_bounded_retries(self):
+        """Test that transient errors are retried a bounded number of times"""
+        exporter = self.make_exporter(retries=3)
+        self.sink.responses = [503, 429]
+        exporter.record(snapshot(0))
+        exporter.record(snapshot(1))
+        exporter.flush()
+        self.assertEqual(self.sink.timestamps(), [0.0, 1.0])
+        self.assertEqual(len(exporter.spool), 0)
+        
+        self.sink.responses = [503, 503, 503]
+        exporter.record(snapshot(2))
+        exporter.record(snapshot(3))
+        exporter.flush()
+        self.assertEqual(len(exporter.spool), 1)
+        self.assertEqual(exporter.stats()["failed"], 1)
+        self.assertEqual(exporter.stats()["lastError"], "HTTP 503")
+    
+    def test_rejected_batches_are_dropped(self):
+        """Test that a 4xx rejection is not retried or spooled"""
+        exporter = self.make_exporter()
+        self.sink.responses = [400]
+        exporter.record(snapshot(0))
+        exporter.record(snapshot(1))
+        exporter.flush()
+        self.assertEqual(exporter.stats()["rejected"], 1)
+        self.assertEqual(len(exporter.spool), 0)
+    
+    def test_spool_replays_in_order(self):
+        """Test that batches spooled while the sink is down are replayed before new ones, across restarts"""
+        spool_path = os.path.join(self.temp_dir, "export.spool")
+        down = self.make_exporter(url="http://127.0.0.1:9/write", retries=1, spool_path=spool_path)
+        for i in range(4):
+            down.record(snapshot(i))
+        down.flush()
+        self.assertEqual(len(down.spool), 2)
+        self.assertGreater(os.path.getsize(spool_path), 16)
+        down.spool.close()
+        
+        exporter = self.make_exporter(spool_path=spool_path)
+        self.assertEqual(len(exporter.spool), 2)
+        exporter.record(snapshot(4))
+        exporter.record(snapshot(5))
+        exporter.flush()
+        self.assertEqual(self.sink.timestamps(), [0.0, 1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(len(exporter.spool), 0)
+        self.assertEqual(os.path.getsize(spool_path), 16)
+    
+    def test_background_thread_flushes(self):
+        """Test that start/stop push everything that was recorded"""
+        exporter = self.make_exporter(batch_size=100, flush_interval=60)
+        exporter.start()
+        exporter.record(snapshot(0))
+        exporter.stop()
+        self.assertEqual(self.sink.timestamps(), [0.0])
+
+
+class TestSpool(unittest.TestCase):
+    """Test cases for the spool size cap"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "spool")
+    
+    def tearDown(self):
+        """Clean up"""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_file_spool_drops_oldest_when_full(self):
+        """Test that the file never exceeds max_bytes and the oldest batches go first"""
+        spool = FileSpool(self.path, max_bytes=16 + 3 * 104)
+        for i in range(5):
+            spool.append(bytes([i]) * 100)
+            self.assertLessEqual(os.path.getsize(self.path), 16 + 3 * 104)
+        self.assertEqual(len(spool), 3)
+        self.assertEqual(spool.dropped, 2)
+        self.assertEqual(spool.peek(), bytes([2]) * 100)
+        
+        spool.pop()
+        spool.append(bytes([5]) * 100)
+        spool.append(bytes([6]) * 100)
+        self.assertLessEqual(os.path.getsize(self.path), 16 + 3 * 104)
+        self.assertEqual([spool.peek()[0]], [4])
+        spool.close()
+        
+        reopened = FileSpool(self.path, max_bytes=16 + 3 * 104)
+        contents = []
+        while reopened.peek() is not None:
+            contents.append(reopened.peek()[0])
+            reopened.pop()
+        self.assertEqual(contents, [4, 5, 6])
+        reopened.close()
+    
+    def test_file_spool_truncates_partial_record(self):
+        """Test that a record cut off by a crash is discarded on open"""
+        spool = FileSpool(self.path)
+        spool.append(b"complete")
+        spool.close()
+        with open(self.path, "ab") as f:
+            f.write(b"\xff\x00\x00\x00partial")
+        
+        reopened = FileSpool(self.path)
+        self.assertEqual(len(reopened), 1)
+        self.assertEqual(reopened.peek(), b"complete")
+        reopened.close()
+    
+    def test_memory_spool_cap(self):
+        """Test the in-memory spool cap"""
+        spool = MemorySpool(max_bytes=250)
+        for i in range(4):
+            spool.append(bytes([i]) * 100)
+        self.assertEqual(len(spool), 2)
+        self.assertEqual(spool.peek()[0], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for the fleet aggregator
+"""
+import asyncio
+import json
+import unittest
+import httpx
+import msgpack
+from fastapi.testclient import TestClient
+from fleet import FleetAggregator, parse_peer
+from fleet_server import create_fleet_app
+
+
+class StubAgents:
+    """httpx transport handler that answers /api/status for a set of fake agents"""
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.requests = []
+
+    def __call__(self, request):
+        host = request.url.host
+        self.requests.append((host, dict(request.headers)))
+        if host in self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        etag = f'"{host}-1"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        status = {"timestamp": "t", "cpu": {"usage": 0.5}, "host": host}
+        if host.endswith("json"):
+            return httpx.Response(200, content=json.dumps(status), headers={"Content-Type": "application/json", "ETag": etag})
+        return httpx.Response(200, content=msgpack.packb(status), headers={"Content-Type": "application/msgpack", "ETag": etag})
+
+
+class TestFleetAggregator(unittest.TestCase):
+    """Test cases for FleetAggregator"""
+
+    def make_aggregator(self, peers, handler):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return FleetAggregator(peers, client=client, backoff_base=10)
+
+    def test_parse_peer(self):
+        """Test host[:port] parsing"""
+        self.assertEqual(parse_peer("mac-1"), ("mac-1", 8080))
+        self.assertEqual(parse_peer("10.0.0.2:9000"), ("10.0.0.2", 9000))
+        self.assertEqual(parse_peer("[fe80::1]:8081"), ("fe80::1", 8081))
+
+    def test_poll_decodes_msgpack_and_json(self):
+        """Test that statuses are fetched concurrently in either format"""
+        handler = StubAgents()
+        aggregator = self.make_aggregator(["a", "b-json:9000"], handler)
+        succeeded = asyncio.run(aggregator.poll_once())
+
+        self.assertEqual(succeeded, 2)
+        self.assertEqual(aggregator.peers["a:8080"].status["host"], "a")
+        self.assertEqual(aggregator.peers["b-json:9000"].status["host"], "b-json")
+        self.assertIn("application/msgpack", handler.requests[0][1]["accept"])
+
+    def test_unchanged_status_uses_etag(self):
+        """Test that the second poll sends If-None-Match and keeps the status on 304"""
+        handler = StubAgents()
+        aggregator = self.make_aggregator(["a"], handler)
+
+        async def scenario():
+            await aggregator.poll_once()
+            await aggregator.poll_once()
+
+        asyncio.run(scenario())
+        self.assertEqual(handler.requests[1][1]["if-none-match"], '"a-1"')
+        self.assertTrue(aggregator.peers["a:8080"].online)
+        self.assertEqual(aggregator.peers["a:8080"].status["host"], "a")
+
+    def test_failed_peer_backs_off(self):
+        """Test that an unreachable agent is skipped until its backoff expires"""
+        handler = StubAgents(down={"down"})
+        aggregator = self.make_aggregator(["up", "down"], handler)
+
+        async def scenario():
+            await aggregator.poll_once()
+            await aggregator.poll_once()
+
+        asyncio.run(scenario())
+        peer = aggregator.peers["down:8080"]
+        self.assertFalse(peer.online)
+        self.assertEqual(peer.failures, 1)
+        self.assertIn("refused", peer.error)
+        self.assertEqual([host for host, _ in handler.requests].count("down"), 1)
+
+    def test_snapshot(self):
+        """Test the merged fleet view"""
+        aggregator = self.make_aggregator(["a", "down"], StubAgents(down={"down"}))
+        asyncio.run(aggregator.poll_once())
+        snapshot = aggregator.snapshot()
+
+        self.assertEqual(snapshot["total"], 2)
+        self.assertEqual(snapshot["online"], 1)
+        self.assertEqual(snapshot["offline"], 1)
+        self.assertEqual({host["id"] for host in snapshot["hosts"]}, {"a:8080", "down:8080"})
+        self.assertIs(aggregator.encoded(), aggregator.encoded())
+
+
+class TestFleetServer(unittest.TestCase):
+    """Test cases for the aggregator HTTP API"""
+
+    def test_fleet_status_endpoint(self):
+        """Test /api/fleet/status in JSON and MessagePack"""
+        client = httpx.AsyncClient(transport=httpx.MockTransport(StubAgents()))
+        aggregator = FleetAggregator(["a", "b"], client=client)
+        asyncio.run(aggregator.poll_once())
+        app = TestClient(create_fleet_app(browse=False, aggregator=aggregator))
+
+        response = app.get("/api/fleet/status")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["online"], 2)
+
+        response = app.get("/api/fleet/status", headers={"Accept": "application/msgpack"})
+        self.assertEqual(msgpack.unpackb(response.content)["total"], 2)
+
+    def test_fleet_queries(self):
+        """Test /api/fleet/percentiles and /api/fleet/top over polled statuses"""
+        client = httpx.AsyncClient(transport=httpx.MockTransport(StubAgents()))
+        aggregator = FleetAggregator(["a", "b"], client=client)
+        # The app attaches a FleetHistory, so only polls after this are recorded
+        app = TestClient(create_fleet_app(browse=False, aggregator=aggregator))
+        asyncio.run(aggregator.poll_once())
+
+        response = app.get("/api/fleet/percentiles?metric=cpu.usage&q=50,99")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 2)
+        self.assertAlmostEqual(response.json()["percentiles"]["99"], 0.5)
+
+        response = app.get("/api/fleet/percentiles?metric=cpu.usage&step=60")
+        self.assertEqual(len(response.json()["timestamps"]), 1)
+
+        response = app.get("/api/fleet/top?metric=cpu.usage&k=1&agg=max")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["hosts"]), 1)
+        self.assertIn(response.json()["hosts"][0]["name"], ("a", "b"))
+
+        self.assertEqual(app.get("/api/fleet/top?metric=bogus").status_code, 400)
+        self.assertEqual(app.get("/api/fleet/top?agg=median").status_code, 400)
+        self.assertEqual(app.get("/api/fleet/percentiles?q=101").status_code, 400)
+        self.assertEqual(app.get("/api/fleet/percentiles?step=nan").status_code, 400)
+        self.assertEqual(app.get("/api/fleet/top?from=inf").status_code, 400)
+
+        aggregator.remove_peer("a:8080")
+        response = app.get("/api/fleet/top?metric=cpu.usage&k=5")
+        self.assertEqual([host["host"] for host in response.json()["hosts"]], ["b:8080"])
+        self.assertEqual(app.get("/api/fleet/percentiles").json()["hosts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for FleetHistory
+"""
+import math
+import unittest
+import numpy as np
+from fleet_history import FleetHistory, sorted_quantiles
+
+
+def status(cpu, memory=0.5):
+    return {"cpu": {"usage": cpu}, "memory": {"pressure": memory}}
+
+
+class TestFleetHistory(unittest.TestCase):
+    """Test cases for FleetHistory"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.history = FleetHistory(resolution=10, capacity=6, initial_hosts=2)
+    
+    def fill(self):
+        # 4 hosts x 3 buckets; host-i CPU = i/10 + bucket/100
+        for bucket in range(3):
+            for i in range(4):
+                self.history.record(f"host-{i}", 1000 + bucket * 10, status(i / 10 + bucket / 100))
+    
+    def test_rows_grow_with_hosts(self):
+        """Test that new hosts grow the host axis"""
+        self.fill()
+        self.assertEqual(self.history.hosts, ["host-0", "host-1", "host-2", "host-3"])
+        self.assertGreaterEqual(self.history.data["cpu.usage"].shape[0], 4)
+    
+    def test_removed_host_row_is_reused(self):
+        """Test that removing a host clears its row and hands it to the next new host"""
+        self.fill()
+        self.assertTrue(self.history.remove("host-3"))
+        self.assertFalse(self.history.remove("host-3"))
+        
+        top = self.history.top("cpu.usage", 1000, 1030, k=2, aggregate="max")
+        self.assertEqual([entry["host"] for entry in top], ["host-2", "host-1"])
+        self.assertEqual(self.history.percentiles("cpu.usage", 1000, 1030)["count"], 9)
+        
+        self.history.record("host-4", 1020, status(0.9))
+        self.assertEqual(self.history.hosts, ["host-0", "host-1", "host-2", "host-4"])
+        top = self.history.top("cpu.usage", 1000, 1030, k=1, aggregate="avg")
+        self.assertEqual(top[0]["host"], "host-4")
+        self.assertAlmostEqual(top[0]["value"], 0.9, places=5)
+    
+    def test_fleet_percentiles(self):
+        """Test percentiles over all hosts and time points in the window"""
+        self.fill()
+        result = self.history.percentiles("cpu.usage", 1000, 1030, qs=(0, 50, 100))
+        
+        self.assertEqual(result["count"], 12)
+        self.assertAlmostEqual(result["percentiles"]["0"], 0.0)
+        self.assertAlmostEqual(result["percentiles"]["100"], 0.32, places=5)
+        expected = np.percentile([i / 10 + b / 100 for i in range(4) for b in range(3)], 50)
+        self.assertAlmostEqual(result["percentiles"]["50"], expected, places=5)
+    
+    def test_percentile_series(self):
+        """Test per-bucket percentiles across hosts"""
+        self.fill()
+        result = self.history.percentile_series("cpu.usage", 1000, 1030, qs=(50, 100))
+        
+        self.assertEqual(result["timestamps"], [1000.0, 1010.0, 1020.0])
+        self.assertAlmostEqual(result["percentiles"]["100"][2], 0.32, places=5)
+        self.assertAlmostEqual(result["percentiles"]["50"][0], 0.15, places=5)
+        
+        coarse = self.history.percentile_series("cpu.usage", 1000, 1030, qs=(100,), step=20)
+        self.assertEqual(coarse["timestamps"], [1000.0, 1020.0])
+        self.assertAlmostEqual(coarse["percentiles"]["100"][0], 0.31, places=5)
+    
+    def test_top_k(self):
+        """Test streaming top-k by avg / max / last"""
+        self.fill()
+        self.history.record("host-0", 1020, status(0.9))
+        
+        top = self.history.top("cpu.usage", 1000, 1030, k=2, aggregate="avg")
+        self.assertEqual([entry["host"] for entry in top], ["host-3", "host-0"])
+        top = self.history.top("cpu.usage", 1000, 1030, k=1, aggregate="last")
+        self.assertEqual(top[0]["host"], "host-0")
+        self.assertAlmostEqual(top[0]["value"], 0.9, places=5)
+        top = self.history.top("cpu.usage", 1000, 1030, k=10, aggregate="max")
+        self.assertEqual(len(top), 4)
+        with self.assertRaises(ValueError):
+            self.history.top("cpu.usage", 1000, 1030, aggregate="median")
+    
+    def test_top_k_across_chunks(self):
+        """Test that chunked top-k matches a brute-force ranking over many hosts"""
+        history = FleetHistory(resolution=10, capacity=20)
+        rng = np.random.default_rng(7)
+        values = rng.random((600, 5))
+        for bucket in range(5):
+            for host in range(600):
+                history.record(f"h{host}", bucket * 10, status(values[host, bucket]))
+        
+        top = history.top("cpu.usage", 0, 50, k=5, aggregate="max")
+        expected = np.argsort(-values.max(axis=1))[:5]
+        self.assertEqual([entry["host"] for entry in top], [f"h{i}" for i in expected])
+    
+    def test_ring_clears_skipped_buckets(self):
+        """Test that buckets skipped while time advances do not keep stale data"""
+        self.fill()
+        # Jump four buckets ahead: the two oldest buckets fall out of the ring
+        # and the skipped columns stay empty
+        self.history.record("host-0", 1070, status(0.7))
+        result = self.history.percentiles("cpu.usage", 0, 2000, qs=(100,))
+        self.assertEqual(result["count"], 5)
+        self.assertAlmostEqual(result["percentiles"]["100"], 0.7, places=5)
+        
+        self.history.record("host-0", 1200, status(0.8))
+        result = self.history.percentiles("cpu.usage", 0, 2000, qs=(0,))
+        self.assertEqual(result["count"], 1)
+        self.assertAlmostEqual(result["percentiles"]["0"], 0.8, places=5)
+    
+    def test_empty_window(self):
+        """Test queries with no data"""
+        self.assertEqual(self.history.percentiles("cpu.usage", 0, 10)["count"], 0)
+        self.assertEqual(self.history.top("cpu.usage", 0, 10), [])
+        self.assertEqual(self.history.percentile_series("cpu.usage", 0, 10)["timestamps"], [])
+    
+    def test_sorted_quantiles_matches_numpy(self):
+        """Test the vectorized quantiles against numpy.nanpercentile"""
+        data = np.random.default_rng(1).random((5, 40))
+        data[:, 30:] = np.nan
+        data[4] = np.nan
+        ordered = np.sort(data, axis=1)
+        counts = np.count_nonzero(~np.isnan(ordered), axis=1)
+        result = sorted_quantiles(ordered, counts, [10, 50, 95])
+        
+        for row in range(4):
+            np.testing.assert_allclose(result[row], np.nanpercentile(data[row], [10, 50, 95]))
+        self.assertTrue(all(math.isnan(v) for v in result[4]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for MetricHistory
+"""
+import math
+import unittest
+from collector import Snapshot
+from history import BlockHistory, MetricHistory, extract_metric, default_step, merge_results
+
+
+class TestMetricHistory(unittest.TestCase):
+    """Test cases for MetricHistory"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.history = MetricHistory(metrics=["cpu.usage", "memory.pressure"], capacity=100)
+    
+    def fill(self, count, start=1000.0):
+        for i in range(count):
+            self.history.append(start + i, {"cpu.usage": i / 100.0, "memory.pressure": 0.5})
+    
+    def test_extract_metric(self):
+        """Test dotted-path extraction from a status dict"""
+        status = {"cpu": {"usage": 0.25}, "temperature": None, "isCharging": True}
+        self.assertEqual(extract_metric(status, "cpu.usage"), 0.25)
+        self.assertTrue(math.isnan(extract_metric(status, "temperature")))
+        self.assertTrue(math.isnan(extract_metric(status, "isCharging")))
+        self.assertTrue(math.isnan(extract_metric(status, "cpu.missing.deep")))
+    
+    def test_record_snapshot(self):
+        """Test that collector snapshots are recorded"""
+        snapshot = Snapshot(1, 1000.0, {"cpu": {"usage": 0.3}, "memory": {"pressure": 0.6}})
+        self.history.record(snapshot)
+        
+        times, values = self.history.range(["cpu.usage"], 0, 2000)
+        self.assertEqual(list(times), [1000.0])
+        self.assertEqual(list(values["cpu.usage"]), [0.3])
+    
+    def test_fixed_memory_footprint(self):
+        """Test that the buffer wraps around at capacity"""
+        self.fill(250)
+        
+        self.assertEqual(len(self.history), 100)
+        self.assertEqual(self.history.memory_bytes, 3 * 100 * 8)
+        self.assertEqual(self.history.oldest(), 1150.0)
+        
+        times, values = self.history.range(["cpu.usage"], 0, 10000)
+        self.assertEqual(len(times), 100)
+        self.assertEqual(list(times), sorted(times))
+        self.assertAlmostEqual(values["cpu.usage"][-1], 2.49)
+    
+    def test_range_bounds(self):
+        """Test half-open range selection"""
+        self.fill(50)
+        times, _ = self.history.range(["cpu.usage"], 1010, 1020)
+        self.assertEqual(list(times), [1010.0 + i for i in range(10)])
+    
+    def test_query_downsampling(self):
+        """Test min/max/avg bucket aggregation"""
+        self.fill(20)
+        result = self.history.query(["cpu.usage"], 1000, 1020, step=10)
+        
+        self.assertEqual(result["timestamps"], [1000, 1010])
+        series = result["series"]["cpu.usage"]
+        self.assertAlmostEqual(series["min"][0], 0.0)
+        self.assertAlmostEqual(series["max"][0], 0.09)
+        self.assertAlmostEqual(series["avg"][0], 0.045)
+        self.assertAlmostEqual(series["min"][1], 0.10)
+    
+    def test_query_skips_missing_values(self):
+        """Test that NaN samples do not contribute to buckets"""
+        self.history.append(1000.0, {"cpu.usage": 0.2})
+        result = self.history.query(["cpu.usage", "memory.pressure"], 1000, 1010, step=10)
+        
+        self.assertEqual(result["series"]["cpu.usage"]["avg"], [0.2])
+        self.assertEqual(result["series"]["memory.pressure"]["avg"], [None])
+    
+    def test_default_step(self):
+        """Test that the default step bounds the number of points"""
+        self.assertEqual(default_step(0, 60), 1)
+        self.assertEqual(default_step(0, 86400), 144)
+
+
+
+class TestBlockHistory(unittest.TestCase):
+    """Test cases for the 2-D (time x core) BlockHistory"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.history = BlockHistory("cpu.perCore", 2, capacity=10)
+    
+    def test_record_and_wraparound(self):
+        """Test that rows are stored per sample and old rows are overwritten"""
+        for i in range(15):
+            self.history.record(Snapshot(i + 1, 1000.0 + i, {"cpu": {"perCore": [i / 100.0, 0.5]}}))
+        
+        self.assertEqual(len(self.history), 10)
+        self.assertEqual(self.history.oldest(), 1005.0)
+        times, block = self.history.range(1000.0, 2000.0)
+        self.assertEqual(block.shape, (10, 2))
+        self.assertEqual(times[0], 1005.0)
+    
+    def test_missing_and_short_rows(self):
+        """Test that missing values and short lists become NaN"""
+        self.history.record(Snapshot(1, 1000.0, {"cpu": {"perCore": [0.25]}}))
+        self.history.record(Snapshot(2, 1001.0, {"memory": {}}))
+        result = self.history.query(1000.0, 1010.0, step=10, aggregates=("avg", "count"))
+        
+        self.assertEqual(result["series"]["cpu.perCore.0"], {"avg": [0.25], "count": [1]})
+        self.assertEqual(result["series"]["cpu.perCore.1"], {"avg": [None], "count": [0]})
+    
+    def test_query_per_core_aggregates(self):
+        """Test min/max/avg/last per core and per bucket"""
+        for i in range(10):
+            self.history.append(1000.0 + i, [i / 10.0, 1.0])
+        result = self.history.query(1000.0, 1010.0, step=5, aggregates=("min", "max", "avg", "last"))
+        
+        self.assertEqual(result["timestamps"], [1000.0, 1005.0])
+        core = result["series"]["cpu.perCore.0"]
+        self.assertEqual(core["min"], [0.0, 0.5])
+        self.assertEqual(core["max"], [0.4, 0.9])
+        self.assertEqual(core["last"], [0.4, 0.9])
+        self.assertAlmostEqual(core["avg"][0], 0.2, places=5)
+        self.assertEqual(result["series"]["cpu.perCore.1"]["avg"], [1.0, 1.0])
+    
+    def test_merge_results_aligns_buckets(self):
+        """Test merging results whose buckets differ"""
+        first = {"from": 0, "to": 20, "step": 10, "timestamps": [0], "series": {"a": {"avg": [1.0]}}}
+        second = {"from": 0, "to": 20, "step": 10, "timestamps": [10], "series": {"b": {"avg": [2.0], "count": [3]}}}
+        merged = merge_results(first, second)
+        
+        self.assertEqual(merged["timestamps"], [0, 10])
+        self.assertEqual(merged["series"]["a"]["avg"], [1.0, None])
+        self.assertEqual(merged["series"]["b"], {"avg": [None, 2.0], "count": [0, 3]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for agent self-instrumentation
+"""
+import asyncio
+import time
+import unittest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from instrumentation import BUCKETS, Histogram, LoopLagMonitor, ProcessUsage, RouteTimingMiddleware, Timings
+
+
+class TestHistogram(unittest.TestCase):
+    """Test cases for Histogram and Timings"""
+    
+    def test_cumulative_buckets(self):
+        """Test that buckets are cumulative and bounded by le"""
+        histogram = Histogram()
+        for seconds in (0.00005, 0.0003, 0.0003, 0.02, 10.0):
+            histogram.observe(seconds)
+        data = histogram.to_dict()
+        
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(data["max"], 10.0)
+        self.assertEqual(data["buckets"]["0.0001"], 1)
+        self.assertEqual(data["buckets"]["0.0005"], 3)
+        self.assertEqual(data["buckets"]["0.025"], 4)
+        self.assertEqual(data["buckets"][str(BUCKETS[-1])], 4)
+        self.assertAlmostEqual(data["sum"], 10.02065, places=5)
+    
+    def test_quantile_estimate(self):
+        """Test the bucket-interpolated quantiles"""
+        histogram = Histogram()
+        self.assertIsNone(histogram.quantile(0.5))
+        for _ in range(100):
+            histogram.observe(0.003)
+        self.assertTrue(0.0025 <= histogram.quantile(0.5) <= 0.005)
+        self.assertTrue(0.0025 <= histogram.quantile(0.99) <= 0.005)
+    
+    def test_timings_grouping(self):
+        """Test that timings are grouped by kind and name"""
+        timings = Timings()
+        timings.observe("collector", "cpu", 0.001)
+        timings.observe("collector", "disk", 0.01)
+        timings.observe("encode", "json", 0.0001)
+        data = timings.to_dict()
+        
+        self.assertEqual(set(data), {"collector", "encode"})
+        self.assertEqual(set(data["collector"]), {"cpu", "disk"})
+        self.assertIs(timings.histogram("collector", "cpu"), timings.histogram("collector", "cpu"))
+
+
+class TestAgentProbes(unittest.TestCase):
+    """Test cases for route timing, loop lag and process usage"""
+    
+    def test_route_timing_uses_route_template(self):
+        """Test that routes are recorded by path template, unmatched ones as other"""
+        timings = Timings()
+        app = FastAPI()
+        app.add_middleware(RouteTimingMiddleware, timings=timings)
+        
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: int):
+            return {"id": item_id}
+        
+        client = TestClient(app)
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/missing")
+        data = timings.to_dict()["route"]
+        
+        self.assertEqual(data["GET /items/{item_id}"]["count"], 2)
+        self.assertEqual(data["other"]["count"], 1)
+    
+    def test_loop_lag(self):
+        """Test that a blocked event loop shows up as lag"""
+        timings = Timings()
+        monitor = LoopLagMonitor(timings, interval=0.01)
+        
+        async def scenario():
+            monitor.start()
+            await asyncio.sleep(0.02)
+            time.sleep(0.05)
+            await asyncio.sleep(0.02)
+            await monitor.stop()
+        
+        asyncio.run(scenario())
+        self.assertGreaterEqual(timings.histogram("loop", "lag").max, 0.03)
+    
+    def test_process_usage(self):
+        """Test the agent's own resource usage"""
+        usage = ProcessUsage()
+        data = usage.read()
+        self.assertGreater(data["rss"], 0)
+        self.assertGreaterEqual(data["threads"], 1)
+        self.assertGreaterEqual(data["cpu"], 0.0)
+        # Reads inside the window reuse the previous value
+        self.assertEqual(usage.read()["cpu"], data["cpu"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental process table
+"""
+import os
+import subprocess
+import sys
+import unittest
+import psutil
+from processes import ProcessTable
+
+
+class TestProcessTable(unittest.TestCase):
+    """Test cases for ProcessTable"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.table = ProcessTable()
+
+    def own_entry(self):
+        return next(entry for entry in self.table.entries.values() if entry.pid == os.getpid())
+
+    def test_refresh_counts(self):
+        """Test that refresh returns process and thread counts"""
+        process_count, thread_count = self.table.refresh()
+
+        self.assertGreater(process_count, 0)
+        self.assertGreaterEqual(thread_count, process_count // 2)
+        self.assertIsNotNone(self.table.refreshed_at)
+
+    def test_process_objects_are_reused(self):
+        """Test that entries keep their psutil.Process across refreshes"""
+        self.table.refresh()
+        first = self.own_entry()
+        self.assertIsNone(first.cpu)
+
+        self.table.refresh()
+        second = self.own_entry()
+        self.assertIs(second.process, first.process)
+        self.assertIsNotNone(second.cpu)
+
+    def test_top_sorting(self):
+        """Test that top() returns the largest consumers first"""
+        self.table.refresh()
+        top = self.table.top(5, "rss")
+
+        self.assertLessEqual(len(top), 5)
+        values = [entry["rss"] for entry in top]
+        self.assertEqual(values, sorted(values, reverse=True))
+        with self.assertRaises(ValueError):
+            self.table.top(5, "disk")
+
+    def test_readers_do_not_wait_for_scan(self):
+        """Test that top() and stats() serve the last published table while a scan is running"""
+        self.table.refresh()
+        published = self.table.top(3, "rss")
+        with self.table._refresh_lock:
+            self.assertEqual(self.table.top(3, "rss"), published)
+            self.assertEqual(self.table.stats()["total"], len(self.table.entries))
+
+    def test_refresh_is_bounded(self):
+        """Test that each refresh handles at most max_refresh processes and rotates through all"""
+        table = ProcessTable(max_refresh=2)
+        table.refresh()
+        self.assertLessEqual(len(table.entries) + table.scanned, 2)
+
+        for _ in range(len(psutil.pids())):
+            table.refresh()
+        refreshed = [entry for entry in table.entries.values() if entry.refreshed_at is not None]
+        self.assertGreaterEqual(len(refreshed), len(table.entries) - 2)
+
+    def test_first_build_is_budgeted(self):
+        """Test that creating entries counts against the time budget and spreads over refreshes"""
+        table = ProcessTable(budget=0.0)
+        process_count, _ = table.refresh()
+        self.assertEqual(len(table.entries), 1)
+        self.assertEqual(table.stats()["pending"], process_count - 1)
+
+        table.refresh()
+        self.assertEqual(len(table.entries), 2)
+        self.assertEqual(table.scanned, 1)
+
+    def test_exited_process_removed(self):
+        """Test that processes that exit are dropped from the table"""
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        try:
+            self.table.refresh()
+            self.assertIn(child.pid, [entry.pid for entry in self.table.entries.values()])
+        finally:
+            child.kill()
+            child.wait()
+        self.table.refresh()
+        self.assertNotIn(child.pid, [entry.pid for entry in self.table.entries.values()])
+
+    def test_stats(self):
+        """Test that scan cost is recorded"""
+        self.table.refresh()
+        stats = self.table.stats()
+
+        self.assertEqual(stats["total"], len(self.table.entries))
+        self.assertGreaterEqual(stats["scanSeconds"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
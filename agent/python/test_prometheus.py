@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus / OpenMetrics exposition format
+"""
+import unittest
+from prometheus import format_labels, render
+
+
+def sample_status():
+    return {
+        "timestamp": "2026-01-01T00:00:00",
+        "cpu": {"usage": 0.25, "coreCount": 2, "frequency": 3.2, "perCore": [0.5, 0.0],
+                "times": {"user": 0.2, "system": 0.05, "idle": 0.75, "iowait": None, "steal": None},
+                "temperature": None},
+        "memory": {"total": 1024, "used": 512, "free": 512, "pressure": 0.5},
+        "disk": {"total": 100, "used": 40, "free": 60, "volumes": [
+            {"mountpoint": "/Volumes/My \"Disk\"", "device": "/dev/disk2s1", "fstype": "apfs",
+             "total": 100, "used": 40, "free": 60},
+        ]},
+        "diskIO": {"readBytes": 10, "writeBytes": 0, "readOps": 1.0, "writeOps": 0.0, "serviceTime": 2.0,
+                   "disks": {"disk0": {"readBytes": 10, "writeBytes": 0, "readOps": 1.0, "writeOps": 0.0,
+                                       "serviceTime": 2.0}}},
+        "network": {"bytesIn": 100, "bytesOut": 50, "packetsIn": 7, "packetsOut": 3, "interfaces": {
+            "en0": {"bytesIn": 100, "bytesOut": 50, "packetsIn": 7, "packetsOut": 3},
+        }},
+        "uptime": 3600.5,
+        "processCount": 300,
+        "threadCount": 1200,
+        "batteryLevel": None,
+        "isCharging": True,
+        "sampledAt": 1700000000.0,
+    }
+
+
+class TestPrometheusFormat(unittest.TestCase):
+    """Test cases for render()"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.lines = render(sample_status()).decode().splitlines()
+    
+    def test_scalar_and_labelled_series(self):
+        """Test that scalars, per-core, per-disk and per-NIC series are rendered"""
+        self.assertIn("macmonitor_cpu_usage_ratio 0.25", self.lines)
+        self.assertIn('macmonitor_cpu_core_usage_ratio{core="1"} 0.0', self.lines)
+        self.assertIn('macmonitor_cpu_time_ratio{mode="user"} 0.2', self.lines)
+        self.assertIn('macmonitor_disk_read_bytes_per_second{disk="disk0"} 10', self.lines)
+        self.assertIn('macmonitor_disk_service_time_seconds{disk="disk0"} 0.002', self.lines)
+        self.assertIn('macmonitor_network_receive_bytes_per_second{interface="en0"} 100', self.lines)
+        self.assertIn("macmonitor_cpu_frequency_hertz 3200000000.0", self.lines)
+        self.assertIn("macmonitor_battery_charging 1", self.lines)
+    
+    def test_missing_values_are_omitted(self):
+        """Test that None values produce no samples and no empty families"""
+        self.assertFalse(any(line.startswith("macmonitor_battery_level_ratio") for line in self.lines))
+        self.assertFalse(any("battery_level_ratio" in line for line in self.lines))
+        self.assertFalse(any('mode="iowait"' in line for line in self.lines))
+    
+    def test_label_values_are_escaped(self):
+        """Test escaping of quotes in label values"""
+        self.assertIn('macmonitor_filesystem_size_bytes{mountpoint="/Volumes/My \\"Disk\\"",'
+                      'device="/dev/disk2s1",fstype="apfs"} 100', self.lines)
+        self.assertEqual(format_labels((("a", 'x\\y\n'),)), '{a="x\\\\y\\n"}')
+    
+    def test_counter_naming(self):
+        """Test counter TYPE lines in the text format and in OpenMetrics"""
+        self.assertIn("# TYPE macmonitor_network_receive_packets_total counter", self.lines)
+        self.assertIn('macmonitor_network_receive_packets_total{interface="en0"} 7', self.lines)
+        
+        openmetrics = render(sample_status(), openmetrics=True).decode().splitlines()
+        self.assertIn("# TYPE macmonitor_network_receive_packets counter", openmetrics)
+        self.assertIn('macmonitor_network_receive_packets_total{interface="en0"} 7', openmetrics)
+        self.assertEqual(openmetrics[-1], "# EOF")
+    
+    def test_histograms(self):
+        """Test histogram families from the agent's timings"""
+        status = dict(sample_status(), agent={"timings": {"collector": {"cpu": {
+            "count": 3, "sum": 0.004, "buckets": {"0.001": 1, "0.0025": 3},
+        }}}})
+        lines = render(status).decode().splitlines()
+        
+        self.assertIn("# TYPE macmonitor_agent_collector_duration_seconds histogram", lines)
+        self.assertIn('macmonitor_agent_collector_duration_seconds_bucket{collector="cpu",le="0.001"} 1', lines)
+        self.assertIn('macmonitor_agent_collector_duration_seconds_bucket{collector="cpu",le="+Inf"} 3', lines)
+        self.assertIn('macmonitor_agent_collector_duration_seconds_sum{collector="cpu"} 0.004', lines)
+        self.assertIn('macmonitor_agent_collector_duration_seconds_count{collector="cpu"} 3', lines)
+    
+    def test_every_sample_has_type(self):
+        """Test that every sample belongs to a declared family"""
+        declared = set()
+        for line in self.lines:
+            if line.startswith("# TYPE "):
+                declared.add(line.split()[2])
+            elif not line.startswith("#"):
+                name = line.split("{")[0].split(" ")[0]
+                self.assertIn(name, declared)
+
+
+if __name__ == "__main__":
+    unittest.main()
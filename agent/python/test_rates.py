@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for CounterRate
+"""
+import unittest
+from rates import CounterRate
+
+
+class TestCounterRate(unittest.TestCase):
+    """Test cases for CounterRate"""
+    
+    def test_first_update_returns_zero(self):
+        """Test that the first update only establishes a baseline"""
+        meter = CounterRate(window=1.0)
+        self.assertEqual(meter.update({"a": 100}, now=0.0), {"a": 0.0})
+    
+    def test_rate_over_window(self):
+        """Test rate calculation over a full window"""
+        meter = CounterRate(window=1.0)
+        meter.update({"a": 100}, now=0.0)
+        rates = meter.update({"a": 300}, now=2.0)
+        self.assertAlmostEqual(rates["a"], 100.0)
+    
+    def test_short_calls_do_not_move_baseline(self):
+        """Test that calls inside the window reuse the previous rates"""
+        meter = CounterRate(window=1.0)
+        meter.update({"a": 0}, now=0.0)
+        meter.update({"a": 1000}, now=1.0)
+        
+        # A caller polling 10 ms later must not see a spike or a zero
+        rates = meter.update({"a": 1010}, now=1.01)
+        self.assertAlmostEqual(rates["a"], 1000.0)
+        
+        # The next full window is still measured from the t=1.0 baseline
+        rates = meter.update({"a": 1500}, now=2.0)
+        self.assertAlmostEqual(rates["a"], 500.0)
+    
+    def test_counter_reset_reads_zero(self):
+        """Test that a counter going backwards does not produce negative rates"""
+        meter = CounterRate(window=1.0)
+        meter.update({"a": 500}, now=0.0)
+        rates = meter.update({"a": 10}, now=1.0)
+        self.assertEqual(rates["a"], 0.0)
+    
+    def test_ewma_smoothing(self):
+        """Test that EWMA smoothing blends with the previous rate"""
+        meter = CounterRate(window=1.0, alpha=0.5)
+        meter.update({"a": 0}, now=0.0)
+        meter.update({"a": 100}, now=1.0)   # raw 100 -> 0.5*100 + 0.5*0
+        rates = meter.update({"a": 300}, now=2.0)  # raw 200 -> 0.5*200 + 0.5*50
+        self.assertAlmostEqual(rates["a"], 125.0)
+    
+    def test_new_keys_start_at_zero(self):
+        """Test that keys appearing later start with a zero rate"""
+        meter = CounterRate(window=1.0)
+        meter.update({"a": 0}, now=0.0)
+        rates = meter.update({"a": 10, "b": 50}, now=1.0)
+        self.assertEqual(rates["b"], 0.0)
+        self.assertAlmostEqual(rates["a"], 10.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for ResponseCache
+"""
+import gzip
+import json
+import unittest
+from collector import Snapshot
+from encoding import JSON, MSGPACK
+from response_cache import ResponseCache, brotli, choose_encoding, etag_matches
+
+
+def make_snapshot(generation, size=10, usage=0.5):
+    status = {"timestamp": f"2024-01-01T00:00:{generation:02d}", "cpu": {"usage": usage}, "padding": "x" * size}
+    return Snapshot(generation, 1000.0 + generation, status)
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for ResponseCache"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.cache = ResponseCache()
+    
+    def test_encode_once_per_generation(self):
+        """Test that repeated requests reuse the cached body"""
+        snapshot = make_snapshot(1)
+        first = self.cache.get(snapshot, JSON)
+        second = self.cache.get(snapshot, JSON)
+        
+        self.assertIs(first, second)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(json.loads(first.body)["sampledAt"], 1001.0)
+    
+    def test_changed_data_changes_etag(self):
+        """Test that a new snapshot with different data produces a new ETag"""
+        first = self.cache.get(make_snapshot(1), JSON)
+        second = self.cache.get(make_snapshot(2, usage=0.6), JSON)
+        self.assertNotEqual(first.etag, second.etag)
+        self.assertEqual(json.loads(second.body)["cpu"]["usage"], 0.6)
+    
+    def test_unchanged_data_keeps_etag(self):
+        """Test that a poll across generations with the same data can be answered with 304"""
+        first = self.cache.get(make_snapshot(1, size=1000), JSON, "gzip")
+        second = self.cache.get(make_snapshot(2, size=1000), JSON, "gzip")
+        
+        self.assertTrue(etag_matches(first.etag, second.etag))
+        self.assertIs(second, first)
+        self.assertEqual(self.cache.reused, 1)
+    
+    def test_etag_differs_per_representation(self):
+        """Test that formats and codings have distinct ETags"""
+        snapshot = make_snapshot(1, size=1000)
+        tags = {
+            self.cache.get(snapshot, JSON).etag,
+            self.cache.get(snapshot, MSGPACK).etag,
+            self.cache.get(snapshot, JSON, "gzip").etag,
+        }
+        self.assertEqual(len(tags), 3)
+    
+    def test_gzip_compression(self):
+        """Test that large bodies are gzip-compressed"""
+        snapshot = make_snapshot(1, size=1000)
+        entry = self.cache.get(snapshot, JSON, "gzip")
+        
+        self.assertEqual(entry.content_encoding, "gzip")
+        self.assertEqual(gzip.decompress(entry.body), self.cache.get(snapshot, JSON).body)
+    
+    def test_small_bodies_are_not_compressed(self):
+        """Test that tiny bodies skip compression"""
+        entry = self.cache.get(make_snapshot(1), JSON, "gzip")
+        self.assertIsNone(entry.content_encoding)
+    
+    def test_choose_encoding(self):
+        """Test Accept-Encoding parsing"""
+        self.assertIsNone(choose_encoding(None))
+        self.assertEqual(choose_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0, identity"))
+        self.assertIsNone(choose_encoding("deflate"))
+        self.assertEqual(choose_encoding("br;q=0.1, gzip;q=1"), "gzip")
+        self.assertNotEqual(choose_encoding("gzip;q=0, *"), "gzip")
+        self.assertEqual(choose_encoding("*"), "br" if brotli is not None else "gzip")
+    
+    def test_etag_matches(self):
+        """Test If-None-Match matching"""
+        self.assertTrue(etag_matches('"a", "b"', '"b"'))
+        self.assertTrue(etag_matches('W/"b"', '"b"'))
+        self.assertTrue(etag_matches("*", '"b"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for multi-resolution rollups
+"""
+import unittest
+from collector import Snapshot
+from history import MetricHistory
+from rollups import RollupHistory, RollupTier
+
+
+class TestRollupTier(unittest.TestCase):
+    """Test cases for RollupTier"""
+    
+    def test_bucket_aggregates(self):
+        """Test min/max/sum/last/count of a closed bucket"""
+        tier = RollupTier(10, 100, ["cpu"])
+        for i, value in enumerate([0.5, 0.1, 0.9, 0.3]):
+            tier.add_sample(1000 + i, {"cpu": value})
+        tier.add_sample(1010, {"cpu": 0.0})  # closes the first bucket
+        
+        times, values = tier.range(["cpu"], 1000, 1010)
+        self.assertEqual(times, [1000])
+        self.assertEqual(values["cpu"]["min"], [0.1])
+        self.assertEqual(values["cpu"]["max"], [0.9])
+        self.assertAlmostEqual(values["cpu"]["sum"][0], 1.8)
+        self.assertEqual(values["cpu"]["last"], [0.3])
+        self.assertEqual(values["cpu"]["count"], [4])
+    
+    def test_open_bucket_is_queryable(self):
+        """Test that the bucket still being filled is returned by queries"""
+        tier = RollupTier(10, 100, ["cpu"])
+        tier.add_sample(1003, {"cpu": 0.4})
+        result = tier.query(["cpu"], 1000, 1010, 10)
+        self.assertEqual(result["timestamps"], [1000])
+        self.assertEqual(result["series"]["cpu"]["avg"], [0.4])
+    
+    def test_missing_values_are_not_counted(self):
+        """Test that NaN samples are skipped"""
+        tier = RollupTier(10, 100, ["cpu", "temp"])
+        tier.add_sample(1000, {"cpu": 0.2, "temp": float("nan")})
+        result = tier.query(["cpu", "temp"], 1000, 1010, 10, ("avg", "count"))
+        self.assertEqual(result["series"]["cpu"]["count"], [1])
+        self.assertEqual(result["series"]["temp"]["avg"], [None])
+    
+    def test_cascade_to_next_tier(self):
+        """Test that closed buckets are merged into the coarser tier"""
+        fine = RollupTier(10, 100, ["cpu"])
+        coarse = RollupTier(60, 100, ["cpu"])
+        fine.next_tier = coarse
+        for i in range(120):
+            fine.add_sample(i, {"cpu": float(i)})
+        
+        times, values = coarse.range(["cpu"], 0, 60)
+        self.assertEqual(times, [0])
+        self.assertEqual(values["cpu"]["count"], [60])
+        self.assertEqual(values["cpu"]["min"], [0.0])
+        self.assertEqual(values["cpu"]["max"], [59.0])
+        self.assertEqual(values["cpu"]["last"], [59.0])
+        self.assertAlmostEqual(values["cpu"]["sum"][0], sum(range(60)))
+    
+    def test_fixed_capacity(self):
+        """Test that old buckets are overwritten once the ring is full"""
+        tier = RollupTier(1, 5, ["cpu"])
+        for i in range(20):
+            tier.add_sample(i, {"cpu": 1.0})
+        self.assertEqual(tier.oldest(), 14)
+
+
+class TestRollupHistory(unittest.TestCase):
+    """Test cases for RollupHistory query planning"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.raw = MetricHistory(metrics=["cpu.usage"], capacity=600)
+        self.rollups = RollupHistory([self.raw], ["cpu.usage"], tiers=[(10, 1000), (60, 1000), (3600, 100)])
+        for i in range(7200):
+            snapshot = Snapshot(i + 1, float(i), {"cpu": {"usage": 0.5}})
+            self.raw.record(snapshot)
+            self.rollups.record(snapshot)
+    
+    def test_plan_uses_raw_for_fine_steps(self):
+        """Test that short ranges at 1 s steps read raw samples"""
+        source = self.rollups.plan(7000, 7200, 1)
+        self.assertIs(source, self.raw)
+    
+    def test_plan_picks_coarsest_tier(self):
+        """Test that the coarsest tier not exceeding the step is chosen"""
+        self.assertEqual(self.rollups.plan(0, 7200, 60).resolution, 60)
+        self.assertEqual(self.rollups.plan(0, 7200, 30).resolution, 10)
+        self.assertEqual(self.rollups.plan(0, 7200, 7200).resolution, 3600)
+    
+    def test_plan_falls_back_when_raw_does_not_cover(self):
+        """Test that ranges older than the raw buffer use a rollup tier"""
+        source = self.rollups.plan(0, 7200, 1)
+        self.assertIsNot(source, self.raw)
+    
+    def test_plan_range_before_first_sample(self):
+        """Test that a range starting before any data keeps the finest source"""
+        raw = MetricHistory(metrics=["cpu.usage"], capacity=3600)
+        rollups = RollupHistory([raw], ["cpu.usage"], tiers=[(10, 1000), (60, 1000), (3600, 100)])
+        # 30 min of samples starting mid-hour, queried over the last hour
+        for i in range(1800):
+            snapshot = Snapshot(i + 1, 5000.0 + i, {"cpu": {"usage": 0.5}})
+            raw.record(snapshot)
+            rollups.record(snapshot)
+        
+        self.assertIs(rollups.plan(3200, 6800, 6), raw)
+        result = rollups.query(["cpu.usage"], 3200, 6800, 6)
+        self.assertEqual(result["resolution"], 1.0)
+        self.assertEqual(len(result["timestamps"]), 300)
+        self.assertIs(rollups.plan(0, 10, 1), raw)
+        self.assertIs(rollups.plan(0, 6800, 30), raw)
+    
+    def test_query_point_count(self):
+        """Test that a long range returns about range / step points"""
+        result = self.rollups.query(["cpu.usage"], 0, 7200, 600)
+        self.assertEqual(result["resolution"], 60)
+        self.assertEqual(len(result["timestamps"]), 12)
+        self.assertEqual(result["series"]["cpu.usage"]["avg"], [0.5] * 12)
+        
+        result = self.rollups.query(["cpu.usage"], 0, 7200, 600, ("count",))
+        self.assertEqual(sum(result["series"]["cpu.usage"]["count"]), 7200)
+
+
+if __name__ == "__main__":
+    unittest.main()
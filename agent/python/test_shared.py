@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared-memory sampler used in multi-worker mode
+"""
+import shutil
+import tempfile
+import threading
+import unittest
+import psutil
+from fastapi.testclient import TestClient
+from api_server import create_app
+from collector import Snapshot
+from discovery import DiscoveryService
+from shared import (
+    LENGTH, SEQUENCE, WORKER_HISTORY_CAPACITY, SharedCollector, SharedSnapshot, create_sampler, decode_snapshot,
+    encode_snapshot
+)
+
+
+class TestSharedSnapshot(unittest.TestCase):
+    """Test cases for the shared memory segment"""
+    
+    def setUp(self):
+        """Create a small shared segment and attach a second handle like a worker would"""
+        self.shared = SharedSnapshot.create(size=64 * 1024)
+        self.worker = SharedSnapshot.attach(self.shared.name)
+    
+    def tearDown(self):
+        self.worker.close()
+        self.shared.close()
+        self.shared.unlink()
+    
+    def test_roundtrip(self):
+        """Test that snapshots written by the sampler are read back by a worker"""
+        self.assertIsNone(self.worker.read())
+        snapshot = Snapshot(3, 1000.0, {"cpu": {"usage": 0.25}}, frozenset(["cpu"]), frozenset(["cpu"]))
+        self.shared.write(encode_snapshot(snapshot, {"enabled": ["cpu"]}))
+        
+        seq, payload = self.worker.read()
+        self.assertEqual(decode_snapshot(payload), (snapshot, {"enabled": ["cpu"]}, None, None, None))
+        self.assertIsNone(self.worker.read(since=seq))
+    
+    def test_read_waits_for_writer(self):
+        """Test that a write in progress is not returned with a stale length"""
+        self.shared.write(b"old")
+        seq = self.shared.sequence()
+        # writer has bumped the sequence and the length but not finished the payload
+        SEQUENCE.pack_into(self.shared.buf, 0, seq + 1)
+        LENGTH.pack_into(self.shared.buf, SEQUENCE.size, self.shared.capacity * 2)
+        
+        writer = threading.Timer(0.05, SEQUENCE.pack_into, (self.shared.buf, 0, seq + 2))
+        writer.start()
+        try:
+            result = self.worker.read(since=seq)
+        finally:
+            writer.join()
+        self.assertEqual(result[0], seq + 2)
+        self.assertEqual(len(result[1]), self.shared.capacity)
+    
+    def test_core_count_in_header(self):
+        """Test that the creator records the core count for attached workers"""
+        self.assertEqual(self.worker.cores, psutil.cpu_count())
+    
+    def test_oversized_payload(self):
+        """Test that a payload larger than the segment is rejected"""
+        with self.assertRaises(ValueError):
+            self.shared.write(bytes(self.shared.capacity + 1))
+    
+    def test_demand_keeps_latest_expiry(self):
+        """Test that requests only ever extend a collector's demand"""
+        self.worker.request(["cpu", "processes"], until=1100.0)
+        self.worker.request(["cpu"], until=1050.0)
+        
+        self.assertEqual(self.shared.demand(now=1000.0), {"cpu": 100.0, "processes": 100.0})
+        self.assertEqual(self.shared.demand(now=1200.0), {})
+
+
+class TestSharedSampler(unittest.TestCase):
+    """Test cases for SharedSampler and SharedCollector"""
+    
+    def setUp(self):
+        """Create a sampler and a worker-side collector on the same segment"""
+        self.shared = SharedSnapshot.create()
+        self.sampler = create_sampler(self.shared, battery_saver=False)
+        self.worker = SharedSnapshot.attach(self.shared.name)
+    
+    def tearDown(self):
+        self.sampler.stop()
+        self.worker.close()
+        self.shared.close()
+        self.shared.unlink()
+    
+    def test_demand_drives_sampler(self):
+        """Test that collectors requested by a worker are sampled and published"""
+        collector = SharedCollector(self.worker)
+        received = []
+        collector.add_listener(received.append)
+        collector.touch(["memory"])
+        self.sampler.apply_demand()
+        self.sampler.collector.sample()
+        
+        snapshot = collector.poll()
+        self.assertIn("memory", snapshot.status)
+        self.assertEqual(received, [snapshot])
+        self.assertIn("memory", collector.stats()["active"])
+        self.assertIsNone(collector.poll())
+    
+    def test_undecodable_snapshot_keeps_previous(self):
+        """Test that a payload that fails to decode leaves the previous snapshot in place"""
+        collector = SharedCollector(self.worker)
+        self.sampler.collector.sample(["memory"])
+        previous = collector.poll()
+        self.shared.write(b"\xc1")
+        
+        self.assertIsNone(collector.poll())
+        self.assertIs(collector.sample(), previous)
+        self.sampler.collector.sample(["memory"])
+        self.assertGreater(collector.poll().generation, previous.generation)
+    
+    def test_process_table_is_shared(self):
+        """Test that workers serve the process list published by the sampler"""
+        collector = SharedCollector(self.worker)
+        self.sampler.collector.sample(["processes"])
+        collector.poll()
+        
+        self.assertGreater(collector.processes.stats()["total"], 0)
+        top = collector.processes.top(3, "rss")
+        self.assertLessEqual(len(top), 3)
+        self.assertEqual(top, sorted(top, key=lambda p: p["rss"] or 0, reverse=True))
+    
+    def test_worker_app(self):
+        """Test that an app built on shared memory answers without sampling in-process"""
+        self.sampler.start()
+        app = create_app(shared=self.worker)
+        with TestClient(app) as client:
+            status = client.get("/api/status?fields=memory")
+            processes = client.get("/api/processes?top=2")
+            stats = client.get("/api/agent/stats").json()
+        
+        self.assertEqual(status.status_code, 200)
+        self.assertIn("memory", status.json())
+        self.assertEqual(len(processes.json()["processes"]), 2)
+        self.assertEqual(stats["collector"]["shared"]["name"], self.shared.name)
+        self.assertGreater(stats["collector"]["runs"]["memory"], 0)
+
+    
+    def test_worker_app_sizing(self):
+        """Test that workers size core history from the header and keep a short in-memory history"""
+        app = create_app(shared=self.worker)
+        self.assertEqual(app.state.core_history.width, self.shared.cores)
+        self.assertEqual(app.state.history.capacity, WORKER_HISTORY_CAPACITY)
+        self.assertEqual(app.state.alerts.stats()["rules"], 0)
+    
+    def test_worker_alerts_come_from_sampler(self):
+        """Test that rules are evaluated once in the sampler and workers replay new events"""
+        rules = [{"name": "memory-used", "metric": "memory.used", "op": ">", "value": 0}]
+        sampler = create_sampler(self.shared, battery_saver=False, alert_rules=rules)
+        collector = SharedCollector(self.worker)
+        events = []
+        collector.alerts.add_listener(events.append)
+        sampler.collector.sample(["cpu"])
+        collector.poll()
+        self.assertEqual(events, [])
+        
+        sampler.collector.sample(["memory"])
+        collector.poll()
+        self.assertEqual([(event["rule"], event["state"]) for event in events], [("memory-used", "firing")])
+        self.assertEqual(collector.alerts.to_dict()["events"], events)
+        self.assertEqual(collector.alerts.stats()["firing"], 1)
+        self.assertEqual(len(collector.alerts.active()), 1)
+        
+        sampler.collector.sample(["memory"])
+        collector.poll()
+        self.assertEqual(len(events), 1)
+    
+    def test_worker_peers_come_from_sampler(self):
+        """Test that workers serve the sampler's discovery cache instead of browsing themselves"""
+        app = create_app(shared=self.worker)
+        with TestClient(app) as client:
+            self.sampler.collector.sample(["memory"])
+            self.assertEqual(client.get("/api/peers").status_code, 503)
+        
+        discovery = DiscoveryService(port=8080, browse=False)
+        discovery.add_peer("10.0.0.7", 8080, name="mini")
+        sampler = create_sampler(self.shared, battery_saver=False, discovery=discovery)
+        sampler.update_peers()
+        sampler.collector.sample(["memory"])
+        app = create_app(shared=self.worker)
+        with TestClient(app) as client:
+            peers = client.get("/api/peers").json()
+            stats = client.get("/api/agent/stats").json()
+        
+        self.assertEqual([peer["name"] for peer in peers["peers"]], ["mini"])
+        self.assertEqual(stats["discovery"]["peers"], 1)
+    
+    def test_worker_reads_sampler_store(self):
+        """Test that workers query the on-disk store written by the sampler"""
+        directory = tempfile.mkdtemp()
+        sampler = create_sampler(self.shared, battery_saver=False, data_dir=directory)
+        try:
+            for _ in range(3):
+                sampler.collector.sample()
+            app = create_app(shared=self.worker, data_dir=directory)
+            store = app.state.store
+            self.assertTrue(store.readonly)
+            self.assertEqual(len(store.range(["cpu.usage"], 0, 1e12)[0]), 3)
+            store.close()
+        finally:
+            sampler.store.close()
+            shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    unittest.main()
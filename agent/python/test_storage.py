@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Tests for SegmentStore
+"""
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from collector import Snapshot
+from storage import SegmentStore, HEADER_SIZE, COUNT_OFFSET
+
+
+class TestSegmentStore(unittest.TestCase):
+    """Test cases for SegmentStore"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.directory = tempfile.mkdtemp()
+        self.store = self.open_store()
+    
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+    
+    def open_store(self, **kwargs):
+        options = dict(segment_duration=10, segment_capacity=5, retention=3600)
+        options.update(kwargs)
+        return SegmentStore(self.directory, ["cpu.usage", "memory.pressure"], **options)
+    
+    def fill(self, count, start=1000.0):
+        for i in range(count):
+            self.store.append(start + i, [i / 100.0, 0.5])
+    
+    def test_record_snapshot(self):
+        """Test that collector snapshots are persisted"""
+        self.store.record(Snapshot(1, 1000.0, {"cpu": {"usage": 0.4}, "memory": {"pressure": 0.7}}))
+        times, values = self.store.range(["cpu.usage", "memory.pressure"], 0, 2000)
+        
+        self.assertEqual(list(times), [1000.0])
+        self.assertEqual(list(values["cpu.usage"]), [0.4])
+        self.assertEqual(list(values["memory.pressure"]), [0.7])
+    
+    def test_rollover_by_capacity(self):
+        """Test that full segments roll over to new files"""
+        self.fill(12)
+        self.assertEqual(len(self.store.segments), 3)
+        
+        times, _ = self.store.range(["cpu.usage"], 0, 2000)
+        self.assertEqual(list(times), [1000.0 + i for i in range(12)])
+    
+    def test_rollover_by_duration(self):
+        """Test that segments roll over when their time span is exceeded"""
+        self.store.append(1000.0, [0.1, 0.1])
+        self.store.append(1020.0, [0.2, 0.2])
+        self.assertEqual(len(self.store.segments), 2)
+    
+    def test_slices_are_zero_copy_views(self):
+        """Test that range reads return memoryviews into the segment files"""
+        self.fill(4)
+        slices = self.store.slices(1001, 1003)
+        
+        self.assertEqual(len(slices), 1)
+        metrics, (times, columns) = slices[0]
+        self.assertIsInstance(times, memoryview)
+        self.assertEqual(list(times), [1001.0, 1002.0])
+        self.assertEqual(list(columns["cpu.usage"]), [0.01, 0.02])
+    
+    def test_reopen_after_close(self):
+        """Test that data survives a restart"""
+        self.fill(8)
+        self.store.close()
+        
+        self.store = self.open_store()
+        times, values = self.store.range(["cpu.usage"], 0, 2000)
+        self.assertEqual(len(times), 8)
+        self.assertEqual(self.store.oldest(), 1000.0)
+        
+        # Closed segments are compacted to their committed size
+        for segment in self.store.segments:
+            size = os.path.getsize(segment.path)
+            self.assertEqual(size, HEADER_SIZE + segment.count * 3 * 8)
+    
+    def test_segments_open_lazily(self):
+        """Test that existing segments are only opened on first access"""
+        self.fill(8)
+        self.store.close()
+        
+        self.store = self.open_store()
+        self.assertIsNone(self.store._segments)
+        self.store.append(1008.0, [0.08, 0.5])
+        self.assertEqual(len(self.store.segments), 3)
+        times, _ = self.store.range(["cpu.usage"], 0, 2000)
+        self.assertEqual(len(times), 9)
+    
+    def test_crash_loses_at_most_partial_record(self):
+        """Test that an uncommitted record is ignored after a crash"""
+        self.fill(3)
+        segment = self.store.segments[-1]
+        
+        # Simulate a crash mid-append: the record is written but the count is not
+        offset = segment.count * segment.stride
+        segment.view[offset] = 1003.0
+        segment.view[offset + 1] = 0.99
+        segment.mm.flush()
+        with open(segment.path, "rb") as f:
+            f.seek(COUNT_OFFSET)
+            committed = struct.unpack("<Q", f.read(8))[0]
+        self.assertEqual(committed, 3)
+        
+        store = SegmentStore(self.directory, ["cpu.usage", "memory.pressure"])
+        try:
+            times, values = store.range(["cpu.usage"], 0, 2000)
+            self.assertEqual(list(times), [1000.0, 1001.0, 1002.0])
+        finally:
+            store.close()
+    
+    def test_retention_deletes_old_segments(self):
+        """Test that segments older than the retention period are removed"""
+        self.store.close()
+        self.store = self.open_store(retention=30)
+        self.fill(10)
+        self.store.append(1100.0, [0.0, 0.0])
+        
+        self.assertEqual(self.store.oldest(), 1100.0)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+    
+    def test_readonly_follows_writer(self):
+        """Test that a read-only store sees new records, new segments and expired segments"""
+        self.store.close()
+        self.store = self.open_store(retention=30)
+        reader = self.open_store(readonly=True)
+        try:
+            self.assertIsNone(reader.oldest())
+            self.fill(3)
+            times, _ = reader.range(["cpu.usage"], 0, 2000)
+            self.assertEqual(list(times), [1000.0, 1001.0, 1002.0])
+            
+            self.fill(4, start=1003.0)  # rolls over into a second segment
+            times, _ = reader.range(["cpu.usage"], 0, 2000)
+            self.assertEqual(len(times), 7)
+            
+            self.store.append(1100.0, [0.0, 0.0])  # expires both earlier segments
+            self.assertEqual(reader.oldest(), 1100.0)
+            self.assertEqual(len(reader.segments), 1)
+            with self.assertRaises(ValueError):
+                reader.append(1101.0, [0.0, 0.0])
+        finally:
+            reader.close()
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+    
+    def test_query_downsampling(self):
+        """Test downsampled queries across segment boundaries"""
+        self.fill(12)
+        result = self.store.query(["cpu.usage"], 1000, 1012, step=6)
+        
+        self.assertEqual(result["timestamps"], [1000, 1006])
+        self.assertAlmostEqual(result["series"]["cpu.usage"]["max"][0], 0.05)
+        self.assertAlmostEqual(result["series"]["cpu.usage"]["min"][1], 0.06)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Tests for StatusBroadcaster and the /api/stream endpoint
+"""
+import asyncio
+import json
+import unittest
+import msgpack
+from fastapi.testclient import TestClient
+from api_server import create_app
+from collector import Snapshot
+from stream import StatusBroadcaster, snapshot_payload
+
+
+class FakeCollector:
+    """Minimal collector stand-in that records listeners"""
+    
+    def __init__(self):
+        self.listeners = []
+        self.snapshot = None
+        self.demand = {}
+    
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+    
+    def latest(self):
+        return self.snapshot
+    
+    def acquire(self, names):
+        for name in names:
+            self.demand[name] = self.demand.get(name, 0) + 1
+    
+    def release(self, names):
+        for name in names:
+            self.demand[name] -= 1
+
+
+def make_snapshot(generation):
+    return Snapshot(generation, 1000.0 + generation, {
+        "timestamp": "t",
+        "cpu": {"usage": 0.1},
+        "memory": {"pressure": 0.2}
+    })
+
+
+class TestStatusBroadcaster(unittest.TestCase):
+    """Test cases for StatusBroadcaster"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.collector = FakeCollector()
+        self.broadcaster = StatusBroadcaster(self.collector)
+    
+    def test_payload_field_filter(self):
+        """Test that field filtering keeps only requested top-level keys"""
+        payload = snapshot_payload(make_snapshot(1), frozenset(["cpu"]))
+        self.assertEqual(set(payload), {"timestamp", "cpu", "sampledAt", "generation"})
+    
+    def test_encode_once_per_generation(self):
+        """Test that the same snapshot is serialized once per field set"""
+        snapshot = make_snapshot(1)
+        first = self.broadcaster.encode(snapshot)
+        self.assertIs(self.broadcaster.encode(snapshot), first)
+        self.assertEqual(json.loads(first)["generation"], 1)
+    
+    def test_slow_subscriber_is_coalesced(self):
+        """Test that a consumer that does not read only keeps the latest snapshot"""
+        async def scenario():
+            subscription = self.broadcaster.subscribe()
+            for generation in range(1, 6):
+                self.broadcaster._dispatch(make_snapshot(generation))
+            snapshot = await subscription.next()
+            return subscription, snapshot
+        
+        subscription, snapshot = asyncio.run(scenario())
+        self.assertEqual(snapshot.generation, 5)
+        self.assertEqual(subscription.coalesced, 4)
+    
+    def test_stalled_subscriber_is_dropped(self):
+        """Test that subscribers that stop reading are disconnected"""
+        self.broadcaster.stall_timeout = 0.0
+        
+        async def scenario():
+            subscription = self.broadcaster.subscribe()
+            self.broadcaster._dispatch(make_snapshot(1))
+            await asyncio.sleep(0.01)
+            self.broadcaster._dispatch(make_snapshot(2))
+            return subscription, await subscription.next()
+        
+        subscription, snapshot = asyncio.run(scenario())
+        self.assertIsNone(snapshot)
+        self.assertTrue(subscription.closed)
+        self.assertEqual(self.broadcaster.dropped, 1)
+        self.assertEqual(len(self.broadcaster.subscribers), 0)
+    
+    def test_slow_interval_is_not_stalled(self):
+        """Test that a rate-limited subscriber waiting out its interval is kept"""
+        self.broadcaster.stall_timeout = 0.05
+        
+        async def scenario():
+            subscription = self.broadcaster.subscribe(min_interval=0.2)
+            self.broadcaster._dispatch(make_snapshot(1))
+            first = await subscription.next()
+            received = asyncio.ensure_future(subscription.next())
+            for generation in range(2, 8):
+                await asyncio.sleep(0.03)
+                self.broadcaster._dispatch(make_snapshot(generation))
+            return subscription, first, await received
+        
+        subscription, first, second = asyncio.run(scenario())
+        self.assertEqual((first.generation, second.generation), (1, 7))
+        self.assertFalse(subscription.closed)
+        self.assertEqual(self.broadcaster.dropped, 0)
+    
+    def test_rate_limit(self):
+        """Test that min_interval delays and coalesces deliveries"""
+        async def scenario():
+            subscription = self.broadcaster.subscribe(min_interval=0.2)
+            self.broadcaster._dispatch(make_snapshot(1))
+            first = await subscription.next()
+            self.broadcaster._dispatch(make_snapshot(2))
+            self.broadcaster._dispatch(make_snapshot(3))
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            second = await subscription.next()
+            return first, second, loop.time() - started
+        
+        first, second, waited = asyncio.run(scenario())
+        self.assertEqual(first.generation, 1)
+        self.assertEqual(second.generation, 3)
+        self.assertGreaterEqual(waited, 0.15)
+
+
+class TestStreamEndpoint(unittest.TestCase):
+    """Test cases for /api/stream"""
+    
+    def test_sse_stream(self):
+        """Test that the SSE endpoint pushes status events"""
+        app = create_app(sample_interval=0.1)
+        with TestClient(app) as client:
+            response = client.get("/api/stream?limit=3&fields=cpu")
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("text/event-stream", response.headers["content-type"])
+        events = [block for block in response.text.split("\n\n") if block]
+        self.assertEqual(len(events), 3)
+        
+        generations = []
+        for event in events:
+            lines = dict(line.split(": ", 1) for line in event.split("\n"))
+            self.assertEqual(lines["event"], "status")
+            data = json.loads(lines["data"])
+            self.assertIn("cpu", data)
+            self.assertNotIn("memory", data)
+            generations.append(data["generation"])
+        self.assertEqual(generations, sorted(set(generations)))
+    
+    def test_websocket_stream(self):
+        """Test that the WebSocket endpoint pushes status messages"""
+        app = create_app(sample_interval=0.1)
+        with TestClient(app) as client:
+            with client.websocket_connect("/api/stream?fields=memory") as websocket:
+                first = json.loads(websocket.receive_text())
+                second = json.loads(websocket.receive_text())
+        
+        self.assertIn("memory", first)
+        self.assertNotIn("cpu", first)
+        self.assertGreater(second["generation"], first["generation"])
+    
+    def test_delta_sse_stream(self):
+        """Test that delta mode starts with a keyframe followed by deltas"""
+        app = create_app(sample_interval=0.1)
+        with TestClient(app) as client:
+            response = client.get("/api/stream?mode=delta&limit=3")
+        
+        frames = []
+        for event in [block for block in response.text.split("\n\n") if block]:
+            lines = dict(line.split(": ", 1) for line in event.split("\n"))
+            self.assertEqual(lines["event"], "delta")
+            frame = json.loads(lines["data"])
+            self.assertEqual(int(lines["id"]), frame["seq"])
+            frames.append(frame)
+        
+        self.assertEqual(frames[0]["type"], "keyframe")
+        self.assertIn("memory", frames[0]["data"])
+        for previous, frame in zip(frames, frames[1:]):
+            self.assertEqual(frame["type"], "delta")
+            self.assertEqual(frame["base"], previous["seq"])
+            self.assertNotIn("cpu.coreCount", frame["set"])
+    
+    def test_delta_websocket_resync(self):
+        """Test that WebSocket clients can request a resync"""
+        app = create_app(sample_interval=0.1)
+        with TestClient(app) as client:
+            with client.websocket_connect("/api/stream?mode=delta") as websocket:
+                keyframe = json.loads(websocket.receive_text())
+                websocket.send_text(json.dumps({"resync": None}))
+                frames = [json.loads(websocket.receive_text()) for _ in range(3)]
+        
+        self.assertEqual(keyframe["type"], "keyframe")
+        self.assertIn("keyframe", [frame["type"] for frame in frames])
+    
+    def test_websocket_msgpack(self):
+        """Test that WebSocket clients can receive MessagePack binary frames"""
+        app = create_app(sample_interval=0.1)
+        with TestClient(app) as client:
+            with client.websocket_connect("/api/stream?format=msgpack&fields=cpu") as websocket:
+                message = msgpack.unpackb(websocket.receive_bytes())
+        
+        self.assertIn("cpu", message)
+        self.assertIn("generation", message)
+    
+    def test_invalid_stream_mode(self):
+        """Test that unknown stream modes are rejected"""
+        client = TestClient(create_app())
+        self.assertEqual(client.get("/api/stream?mode=bogus").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,7 +4,7 @@ Tests for SystemMonitor class
 """
 import unittest
 import time
-from system_monitor import SystemMonitor
+from system_monitor import SystemMonitor, assemble_status
 
 
 class TestSystemMonitor(unittest.TestCase):
@@ -32,6 +32,14 @@ class TestSystemMonitor(unittest.TestCase):
         self.assertIsInstance(cpu_info["coreCount"], int)
         self.assertGreater(cpu_info["coreCount"], 0)
         
+        # Per-core usage and CPU time splits
+        self.assertEqual(len(cpu_info["perCore"]), cpu_info["coreCount"])
+        for usage in cpu_info["perCore"]:
+            self.assertGreaterEqual(usage, 0.0)
+            self.assertLessEqual(usage, 1.0)
+        for split in ["user", "system", "idle", "iowait", "steal"]:
+            self.assertIn(split, cpu_info["times"])
+        
         # Frequency can be None or a positive float
         if cpu_info["frequency"] is not None:
             self.assertIsInstance(cpu_info["frequency"], float)
@@ -120,6 +128,38 @@ class TestSystemMonitor(unittest.TestCase):
             self.assertGreaterEqual(net_info["packetsIn"], 0)
             self.assertGreaterEqual(net_info["packetsOut"], 0)
     
+    def test_get_network_interfaces(self):
+        """Test per-interface network breakdown"""
+        net_info = self.monitor.get_network_info()
+        
+        self.assertIn("interfaces", net_info)
+        self.assertIsInstance(net_info["interfaces"], dict)
+        self.assertGreater(len(net_info["interfaces"]), 0)
+        
+        for name, nic in net_info["interfaces"].items():
+            self.assertIsInstance(name, str)
+            for field in ["bytesIn", "bytesOut", "packetsIn", "packetsOut"]:
+                self.assertIn(field, nic)
+                self.assertIsInstance(nic[field], int)
+                self.assertGreaterEqual(nic[field], 0)
+        
+        # Totals are the sum of all interfaces
+        self.assertEqual(
+            net_info["packetsIn"],
+            sum(nic["packetsIn"] for nic in net_info["interfaces"].values())
+        )
+    
+    def test_get_disk_volumes_and_io(self):
+        """Test that all mountpoints and disk IO rates are reported"""
+        disk = self.monitor.get_disk_info()
+        self.assertIn("volumes", disk)
+        self.assertGreater(len(disk["volumes"]), 0)
+        
+        io = self.monitor.get_disk_io()
+        for field in ["readBytes", "writeBytes", "readOps", "writeOps", "serviceTime"]:
+            self.assertIn(field, io)
+        self.assertIn("diskIO", self.monitor.get_status())
+    
     def test_get_uptime(self):
         """Test uptime retrieval"""
         uptime = self.monitor.get_uptime()
@@ -195,6 +235,16 @@ class TestSystemMonitor(unittest.TestCase):
         self.assertIsInstance(status["processCount"], int)
         self.assertIsInstance(status["threadCount"], int)
     
+    def test_collect_single_collector(self):
+        """Test that collect() runs one collector and assemble_status() builds partial status"""
+        battery = self.monitor.collect("battery")
+        self.assertIn("level", battery)
+        
+        status = assemble_status({"battery": battery, "temperature": 40.0})
+        self.assertEqual(set(status), {"timestamp", "batteryLevel", "isCharging", "temperature"})
+        with self.assertRaises(KeyError):
+            self.monitor.collect("gpu")
+    
     def test_get_cpu_temperature(self):
         """Test CPU temperature retrieval"""
         temp = self.monitor.get_cpu_temperature()
@@ -5,10 +5,13 @@ class MacMonitorDashboard {
         this.devices = new Map();
         this.refreshInterval = 5000; // 5 seconds
         this.autoRefreshTimer = null;
+        this.eventSource = null;
         this.cpuThreshold = 80;
         this.memThreshold = 80;
         this.lastAlertTime = 0;
         this.alertCooldown = 30000; // 30 seconds between alerts
+        // Agent 自己评估告警规则时（通过 alert 事件推送），不再在浏览器里按阈值检查
+        this.agentAlerts = false;
 
         this.init();
     }
@@ -121,17 +124,14 @@ class MacMonitorDashboard {
     }
 
     async startDeviceDiscovery() {
-        // Simulate device discovery using Bonjour/mDNS
-        // In a real implementation, this would use the Bonjour browser API
-        
-        // For now, try to discover devices on the local network
-        // We'll try common ports and localhost first
+        // 先找到一个可用的 Agent（本机），再通过它的 /api/peers 一次性拿到局域网内的其他 Agent：
+        // Agent 持续浏览 Bonjour 并缓存探测结果，浏览器无需逐个地址探测
         const possibleHosts = [
             { name: 'localhost', host: 'localhost', port: 8080 },
             { name: '127.0.0.1', host: '127.0.0.1', port: 8080 }
         ];
 
-        // Try to discover devices
+        let entry = null;
         for (const deviceInfo of possibleHosts) {
             try {
                 const url = `http://${deviceInfo.host}:${deviceInfo.port}/api/info`;
@@ -146,6 +146,8 @@ class MacMonitorDashboard {
                         info: info
                     };
                     this.devices.set(device.id, device);
+                    entry = device;
+                    break;
                 }
             } catch (e) {
                 // Device not available
@@ -153,6 +155,10 @@ class MacMonitorDashboard {
             }
         }
 
+        if (entry) {
+            await this.loadPeers(entry);
+        }
+
         this.updateDeviceSelector();
 
         // Auto-select first device if none selected
@@ -162,6 +168,32 @@ class MacMonitorDashboard {
         }
     }
 
+    async loadPeers(entry) {
+        // 旧版本 Agent 没有 /api/peers，只使用本机
+        try {
+            const response = await fetch(`http://${entry.host}:${entry.port}/api/peers`);
+            if (!response.ok) {
+                return;
+            }
+            const data = await response.json();
+            for (const peer of data.peers) {
+                if (peer.self || peer.healthy === false) {
+                    continue;
+                }
+                const host = peer.host.includes(':') ? `[${peer.host}]` : peer.host;
+                this.devices.set(peer.id, {
+                    id: peer.id,
+                    name: peer.name,
+                    host: host,
+                    port: peer.port,
+                    txt: peer.txt
+                });
+            }
+        } catch (e) {
+            console.log('Peer discovery not available');
+        }
+    }
+
     updateDeviceSelector() {
         const selector = document.getElementById('deviceSelector');
         selector.innerHTML = '';
@@ -189,6 +221,7 @@ class MacMonitorDashboard {
         this.saveSettings();
         this.updateDeviceInfo();
         this.refreshData();
+        this.startStream();
     }
 
     updateDeviceInfo() {
@@ -201,6 +234,65 @@ class MacMonitorDashboard {
         }
     }
 
+    startStream() {
+        // 优先使用 Agent 的 SSE 推送（/api/stream），失败时回退到定时轮询
+        this.stopStream();
+        if (!this.currentDevice || !('EventSource' in window)) {
+            return;
+        }
+
+        const interval = this.refreshInterval / 1000;
+        const url = `http://${this.currentDevice.host}:${this.currentDevice.port}/api/stream?interval=${interval}`;
+        const source = new EventSource(url);
+
+        source.addEventListener('status', (event) => {
+            const data = JSON.parse(event.data);
+            this.updateUI(data);
+            if (!this.agentAlerts) {
+                this.checkAlerts(data);
+            }
+            this.updateConnectionStatus(true);
+        });
+
+        source.addEventListener('alert', (event) => {
+            this.showAgentAlert(JSON.parse(event.data));
+        });
+
+        // 旧版本 Agent 没有 /api/alerts，仍使用本地阈值
+        this.agentAlerts = false;
+        fetch(`http://${this.currentDevice.host}:${this.currentDevice.port}/api/alerts`)
+            .then((response) => {
+                if (this.eventSource === source) {
+                    this.agentAlerts = response.ok;
+                }
+            })
+            .catch(() => {});
+
+        source.onopen = () => {
+            this.stopAutoRefresh();
+        };
+
+        source.onerror = () => {
+            // 旧版本 Agent 没有 /api/stream，或连接中断：恢复轮询
+            this.stopStream();
+            this.updateConnectionStatus(false);
+            if (!this.autoRefreshTimer) {
+                this.startAutoRefresh();
+            }
+        };
+
+        this.eventSource = source;
+    }
+
+    stopStream() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+        // 轮询时收不到 alert 事件，回到本地阈值检查
+        this.agentAlerts = false;
+    }
+
     async refreshData() {
         if (!this.currentDevice) {
             return;
@@ -356,6 +448,19 @@ class MacMonitorDashboard {
         }
     }
 
+    showAgentAlert(alert) {
+        if (alert.state !== 'firing') {
+            return;
+        }
+        this.showAlert(alert.message);
+        if ('Notification' in window && Notification.permission === 'granted') {
+            new Notification('Mac Monitor 告警', {
+                body: alert.message,
+                icon: '🖥️'
+            });
+        }
+    }
+
     showAlert(message) {
         const banner = document.getElementById('alertBanner');
         const messageEl = document.getElementById('alertMessage');